@@ -0,0 +1,28 @@
+"""
+Module Summary: Contains the shared helpers of the benchmark scripts.
+
+Returns:
+    Functions:
+        timed: Returns the best wall time of a call.
+"""
+
+from time import perf_counter
+
+
+def timed(call, repeat: int = 5) -> float:
+    """
+    Returns the best wall time of a call.
+
+    Args:
+        call (Callable): The call to time.
+        repeat (int, optional): Number of runs. Defaults to 5.
+
+    Returns:
+        float: The fastest run in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        call()
+        best = min(best, perf_counter() - start)
+    return best
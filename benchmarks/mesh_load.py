@@ -0,0 +1,94 @@
+"""
+Module Summary: Benchmarks mesh loading from text OBJ, the raw array cache and
+the compact binary mesh format.
+
+The OBJ row times a plain parse of the v, vt, vn and f records into the same
+arrays the binary format stores, so only the file formats are compared and no
+textures are decoded.
+
+Run from the repository root:
+    python -m benchmarks.mesh_load [obj/african_head.obj]
+
+Returns:
+    Functions:
+        parse_obj: Parses the mesh arrays of an OBJ file.
+        main: Prints the size and load time of every format.
+"""
+
+import os
+import sys
+import tempfile
+
+from numpy import array, float64, load, ndarray, savez
+
+from benchmarks import timed
+from models.meshes import triangulate
+from models.meshfile import read_mesh, write_mesh
+from utils.streams import open_stream
+
+
+def _corner(token: str) -> list[int]:
+    """Parses a v/vt/vn face corner into zero based indices, -1 when missing."""
+    return [int(index or 0) - 1 for index in (token.split("/") + ["", ""])[:3]]
+
+
+def parse_obj(filename: str) -> tuple[ndarray, ndarray, ndarray, ndarray]:
+    """
+    Parses the mesh arrays of an OBJ file.
+
+    Args:
+        filename (str): The OBJ file, optionally compressed.
+
+    Returns:
+        tuple[ndarray, ndarray, ndarray, ndarray]: The positions, normals, uvs
+        and fan triangulated (F, 3, 3) face array of (v, vt, vn) corners.
+    """
+    records = {"v": [], "vn": [], "vt": []}
+    polygons = []
+    with open_stream(filename) as file:
+        for line in file:
+            parts = line.split()
+            if not parts:
+                continue
+            if parts[0] in records:
+                records[parts[0]].append(parts[1:4] if parts[0] != "vt" else parts[1:3])
+            elif parts[0] == "f":
+                polygons.append([_corner(corner) for corner in parts[1:]])
+    faces, _ = triangulate(polygons)
+    vertices, normals, uvs = (
+        array(records[name], dtype=float64) for name in ("v", "vn", "vt")
+    )
+    return vertices, normals, uvs, faces
+
+
+def main(filename: str = "obj/african_head.obj") -> None:
+    """
+    Prints the size and load time of every format.
+
+    Args:
+        filename (str, optional): The OBJ to benchmark.
+    """
+    arrays = parse_obj(filename)
+
+    def load_npz(path):
+        with load(path) as data:
+            return [data[name] for name in data.files]
+
+    with tempfile.TemporaryDirectory() as folder:
+        raw = os.path.join(folder, "mesh.npz")
+        packed = os.path.join(folder, "mesh.rmesh")
+        savez(raw, *arrays)
+        write_mesh(packed, *arrays)
+
+        rows = (
+            ("obj", filename, lambda: parse_obj(filename)),
+            ("npz", raw, lambda: load_npz(raw)),
+            ("rmesh", packed, lambda: read_mesh(packed)),
+        )
+        print(f"{'format':<8}{'bytes':>12}{'load ms':>12}")
+        for name, path, call in rows:
+            print(f"{name:<8}{os.path.getsize(path):>12}{timed(call) * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,79 @@
+"""
+Module Summary: Benchmarks TGA reading and writing through PIL against the
+NumPy codec.
+
+The PIL rows follow what ObjectImage did before the codec: decode, convert to
+an array and back to an image, and flip with another round trip. The codec
+rows decode in the wanted row order and write from a flipped view.
+
+Run from the repository root:
+    python -m benchmarks.tga_io [obj/african_head_diffuse.tga ...]
+
+Returns:
+    Functions:
+        main: Prints the read and write times of every file.
+"""
+
+import os
+import sys
+import tempfile
+
+from numpy import array, flipud
+from PIL import Image
+
+from benchmarks import timed
+from utils.tga import read_tga, write_tga
+
+TEXTURES = (
+    "obj/african_head_diffuse.tga",
+    "obj/african_head_nm.tga",
+    "obj/african_head_spec.tga",
+)
+
+
+def main(*filenames: str) -> None:
+    """
+    Prints the read and write times of every file.
+
+    Args:
+        *filenames (str): The TGA files to benchmark.
+    """
+
+    def pil_read(path):
+        with Image.open(path) as image:
+            pixels = Image.fromarray(array(image))
+        return Image.fromarray(flipud(array(pixels)))
+
+    def pil_write(pixels, path, **options):
+        image = Image.fromarray(pixels.swapaxes(0, 1))
+        Image.fromarray(flipud(array(image))).save(path, **options)
+
+    print(f"{'file':<32}{'operation':<16}{'PIL ms':>10}{'codec ms':>10}")
+    with tempfile.TemporaryDirectory() as folder:
+        out = os.path.join(folder, "out.tga")
+        for filename in filenames or TEXTURES:
+            # [x, y] indexed with y up, as the rasterizer leaves its buffers
+            pixels = read_tga(filename, bottom_up=True).swapaxes(0, 1)
+            rows = (
+                ("read", lambda: pil_read(filename), lambda: read_tga(filename)),
+                (
+                    "write",
+                    lambda: pil_write(pixels, out),
+                    lambda: write_tga(out, pixels[:, ::-1].swapaxes(0, 1)),
+                ),
+                (
+                    "write rle",
+                    lambda: pil_write(pixels, out, compression="tga_rle"),
+                    lambda: write_tga(out, pixels[:, ::-1].swapaxes(0, 1), rle=True),
+                ),
+            )
+            name = os.path.basename(filename)
+            for operation, pil, codec in rows:
+                print(
+                    f"{name:<32}{operation:<16}"
+                    f"{timed(pil) * 1000:>10.2f}{timed(codec) * 1000:>10.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
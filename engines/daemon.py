@@ -0,0 +1,357 @@
+"""
+Module Summary: Contains the persistent render daemon.
+
+The daemon keeps loaded models, and with them their decoded textures, in an
+LRU cache and answers render requests over a Unix socket or localhost TCP, so
+repeat renders of an asset only pay for the render itself.
+
+Requests are one JSON object per line:
+    {"model": "obj/african_head.obj", "width": 800, "height": 800,
+     "eye": [1, 1, 3], "center": [0, 0, 0], "up": [0, 1, 0],
+     "light": [1, 1, 1], "shadows": false, "engine": "raster",
+     "buffer": "color", "output": null}
+
+Every request is answered by one JSON header line. Without an output path the
+header is followed by the raw pixel bytes of the requested buffer, top row
+first. Several requests may be sent over one connection. Output paths are only
+accepted when the daemon was started with an output folder, and must lie in
+it.
+
+Raycast requests trace on one process pool started with the daemon. Its
+workers are spawned rather than forked, since forking from the threads
+serving connections can deadlock.
+
+Run from the repository root:
+    python -m engines.daemon --socket /tmp/render.sock
+    python -m engines.daemon --port 8765
+
+Returns:
+    Functions:
+        render_frame: Renders one request with the Phong shader.
+        send_request: Sends one request to a daemon and reads the reply.
+    Classes:
+        ModelCache: LRU cache of loaded models.
+        RenderDaemon: Socket server answering JSON render requests.
+"""
+
+import functools
+import json
+import os
+import socket
+import threading
+from argparse import ArgumentParser
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+
+from models.framebuffers import FramebufferPool
+from models.objects import ObjectCamera, ObjectImage, ObjectModel
+from models.shaders import ObjectPhongShader
+
+try:
+    from socketserver import ThreadingUnixStreamServer
+except ImportError:  # pragma: no cover - platforms without Unix sockets
+    ThreadingUnixStreamServer = None
+
+MODEL_CAPACITY = 8
+
+DEFAULT_REQUEST = {
+    "width": 800,
+    "height": 800,
+    "eye": [1, 1, 3],
+    "center": [0, 0, 0],
+    "up": [0, 1, 0],
+    "light": [1, 1, 1],
+    "shadows": False,
+    "engine": "raster",
+    "buffer": "color",
+    "output": None,
+}
+
+
+class ModelCache:
+    """
+    LRU cache of loaded models.
+
+    Entries are keyed by real path and modification time, so an edited asset
+    is reloaded on its next request.
+    """
+
+    def __init__(self, capacity: int = MODEL_CAPACITY, loader=ObjectModel):
+        """
+        Args:
+            capacity (int, optional): The number of models to keep.
+            loader (Callable, optional): Loads a model from a file name.
+        """
+        self.capacity = capacity
+        self.loader = loader
+        self.models = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, filename: str):
+        """
+        Returns the model of a file, loading it when it is not cached.
+
+        Args:
+            filename (str): The model file.
+
+        Returns:
+            ObjectModel: The loaded model.
+        """
+        path = os.path.realpath(filename)
+        key = (path, os.stat(path).st_mtime_ns)
+        with self.lock:
+            if key in self.models:
+                self.hits += 1
+                self.models.move_to_end(key)
+                return self.models[key]
+        model = self.loader(filename)
+        with self.lock:
+            self.misses += 1
+            for stale in [cached for cached in self.models if cached[0] == path]:
+                del self.models[stale]
+            self.models[key] = model
+            while len(self.models) > self.capacity:
+                self.models.popitem(last=False)
+        return model
+
+    def __len__(self) -> int:
+        return len(self.models)
+
+
+def render_frame(
+    model, request: dict, pool=None, executor=None, region=None
+) -> ObjectImage:
+    """
+    Renders one request with the Phong shader.
+
+    Args:
+        model (ObjectModel): The model to render.
+        request (dict): The request, see DEFAULT_REQUEST for the fields.
+        pool (FramebufferPool, optional): The pool to take the buffers from,
+            returned with the image's release_frame.
+        executor (ProcessPoolExecutor, optional): The pool raycast requests
+            trace on.
+        region (tuple[int, int, int, int], optional): Only render this
+            (x0, y0, x1, y1) part of the y up buffers, end exclusive.
+
+    Returns:
+        ObjectImage: The image holding the color and depth results.
+    """
+    camera = ObjectCamera(
+        tuple(request["eye"]), tuple(request["center"]), tuple(request["up"])
+    )
+    light = tuple(request["light"])
+    image = ObjectImage(request["width"], request["height"], light_dir=light, pool=pool)
+    shader = ObjectPhongShader(model, light)
+    image.render_model(
+        model,
+        camera,
+        shader,
+        shadows=request["shadows"],
+        engine=request["engine"],
+        output=None,
+        executor=executor,
+        region=region,
+    )
+    return image
+
+
+class _TCPServer(ThreadingTCPServer):
+    allow_reuse_address = True
+
+
+class _RequestHandler(StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                header, payload = self.server.render_daemon.render(json.loads(line))
+            except Exception as error:
+                # Reported to the client, the daemon keeps serving
+                header, payload = {"ok": False, "error": str(error)}, b""
+            self.wfile.write(json.dumps(header).encode() + b"\n")
+            self.wfile.write(payload)
+            self.wfile.flush()
+
+
+class RenderDaemon:
+    """
+    Socket server answering JSON render requests.
+
+    A string address is a Unix socket path and a (host, port) tuple listens on
+    TCP. Every connection is served on its own thread.
+    """
+
+    def __init__(
+        self,
+        address,
+        capacity: int = MODEL_CAPACITY,
+        loader=ObjectModel,
+        renderer=None,
+        output_dir: str = None,
+    ):
+        """
+        Args:
+            address (str | tuple[str, int]): The socket path or TCP address.
+            capacity (int, optional): The number of models to keep loaded.
+            loader (Callable, optional): Loads a model from a file name.
+            renderer (Callable, optional): Renders a model for a request and
+                returns an ObjectImage. Defaults to render_frame with buffers
+                from the daemon's pool and raycasts on its process pool.
+            output_dir (str, optional): The folder request output paths are
+                resolved in. Without it frames are only sent back, never
+                written.
+        """
+        self.models = ModelCache(capacity, loader)
+        self.output_dir = None if output_dir is None else os.path.realpath(output_dir)
+        self.pool = FramebufferPool()
+        # Workers start on the first raycast request and live until shutdown
+        self.executor = ProcessPoolExecutor(mp_context=get_context("spawn"))
+        # Only frames of the default renderer are known to come from the pool
+        self.pooled = renderer is None
+        if renderer is None:
+            renderer = functools.partial(
+                render_frame, pool=self.pool, executor=self.executor
+            )
+        self.renderer = renderer
+        self.thread = None
+        if isinstance(address, str):
+            if ThreadingUnixStreamServer is None:
+                raise ValueError("Unix sockets are not supported on this platform")
+            if os.path.exists(address):
+                os.unlink(address)
+            self.server = ThreadingUnixStreamServer(address, _RequestHandler)
+        else:
+            self.server = _TCPServer(address, _RequestHandler)
+        self.server.daemon_threads = True
+        self.server.render_daemon = self
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def output_path(self, output: str) -> str:
+        """
+        Resolves a request's output path in the output folder.
+
+        Args:
+            output (str): The path, relative to the output folder or inside it.
+
+        Returns:
+            str: The absolute path to write.
+
+        Raises:
+            ValueError: If the daemon has no output folder or the path leaves it.
+        """
+        if self.output_dir is None:
+            raise ValueError("this daemon does not write output files")
+        path = os.path.realpath(os.path.join(self.output_dir, output))
+        if os.path.commonpath((self.output_dir, path)) != self.output_dir:
+            raise ValueError(f"output path outside {self.output_dir}")
+        return path
+
+    def render(self, request: dict) -> tuple[dict, bytes]:
+        """
+        Renders one request.
+
+        Args:
+            request (dict): The request, missing fields take DEFAULT_REQUEST.
+
+        Returns:
+            tuple[dict, bytes]: The reply header and the pixel bytes, empty
+            when the frame was written to the request's output path.
+
+        Raises:
+            ValueError: If the output path is not allowed.
+        """
+        request = {**DEFAULT_REQUEST, **request}
+        # Checked before rendering so rejected requests cost nothing
+        output = self.output_path(request["output"]) if request["output"] else None
+        model = self.models.get(request["model"])
+        image = self.renderer(model, request)
+        frame = image.zbuffer if request["buffer"] == "depth" else image.image
+        header = {
+            "ok": True,
+            "width": frame.get_width(),
+            "height": frame.get_height(),
+            "mode": frame.mode,
+            "cache": {"hits": self.models.hits, "misses": self.models.misses},
+        }
+        try:
+            if output:
+                frame.write_file(output)
+                return {**header, "output": request["output"], "bytes": 0}, b""
+            payload = frame.tobytes()
+            return {**header, "bytes": len(payload)}, payload
+        finally:
+            if self.pooled:
+                image.release_frame()
+
+    def serve_forever(self) -> None:
+        self.server.serve_forever()
+
+    def start(self) -> threading.Thread:
+        """Serves requests on a background thread."""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def shutdown(self) -> None:
+        """Stops serving and releases the socket."""
+        if self.thread is not None:
+            self.server.shutdown()
+            self.thread.join()
+        self.server.server_close()
+        self.executor.shutdown(cancel_futures=True)
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+def send_request(address, request: dict, timeout: float = None) -> tuple[dict, bytes]:
+    """
+    Sends one request to a daemon and reads the reply.
+
+    Args:
+        address (str | tuple[str, int]): The daemon's socket path or TCP address.
+        request (dict): The render request.
+        timeout (float, optional): Socket timeout in seconds.
+
+    Returns:
+        tuple[dict, bytes]: The reply header and pixel bytes.
+    """
+    family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+    with socket.socket(family, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(address)
+        client.sendall(json.dumps(request).encode() + b"\n")
+        with client.makefile("rb") as reply:
+            header = json.loads(reply.readline())
+            return header, reply.read(header.get("bytes", 0))
+
+
+def main(argv=None) -> None:
+    parser = ArgumentParser(description="Serve render requests from warm caches.")
+    parser.add_argument("--socket", help="Unix socket path to listen on")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--capacity", type=int, default=MODEL_CAPACITY)
+    parser.add_argument("--output-dir", help="Folder request outputs are written to")
+    args = parser.parse_args(argv)
+    address = args.socket or (args.host, args.port)
+    daemon = RenderDaemon(address, args.capacity, output_dir=args.output_dir)
+    print(f"Render daemon listening on {daemon.address}")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.shutdown()
+
+
+if __name__ == "__main__":
+    main()
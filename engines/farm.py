@@ -0,0 +1,414 @@
+"""
+Module Summary: Contains the distributed render farm.
+
+A coordinator hands render tasks, whole frames or image tiles, to worker
+processes connected over TCP. Workers pull one task at a time, so fast workers
+naturally take more of the batch. Once the queue is empty an idle worker
+steals the longest running task by rendering it too, and the first result
+wins. Tasks of a worker whose connection drops are queued again up to a retry
+limit, and so are the tasks of a worker that does not answer within the worker
+timeout. Results are handed to the sink as they arrive.
+
+Messages are a 4 byte length, a JSON header of that length and the number of
+payload bytes the header announces.
+
+Run from the repository root:
+    python -m engines.farm coordinator --batch frames.json --port 9000 --output out
+    python -m engines.farm worker --connect 127.0.0.1:9000
+
+Returns:
+    Functions:
+        send_message: Sends a header and payload over a socket.
+        recv_message: Receives a header and payload from a socket.
+        render_task: Renders a frame or tile request on a worker.
+        run_worker: Connects to a coordinator and renders until stopped.
+        spawn_workers: Starts local worker processes.
+        directory_sink: Returns a sink saving every result as an image file.
+    Classes:
+        RenderFarm: The coordinator distributing tasks to workers.
+"""
+
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from argparse import ArgumentParser
+from collections import deque
+from multiprocessing import Process
+
+from PIL import Image
+
+from engines.daemon import DEFAULT_REQUEST, ModelCache, render_frame
+from models.framebuffers import FramebufferPool
+
+LENGTH = struct.Struct("!I")
+MAX_RETRIES = 2
+POLL_INTERVAL = 0.05
+WORKER_TIMEOUT = 600.0
+
+_models = None
+_frames = None
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def send_message(sock: socket.socket, header: dict, payload: bytes = b"") -> None:
+    """
+    Sends a header and payload over a socket.
+
+    Args:
+        sock (socket.socket): The connected socket.
+        header (dict): The JSON serializable header.
+        payload (bytes, optional): Raw bytes following the header.
+    """
+    data = json.dumps({**header, "bytes": len(payload)}).encode()
+    sock.sendall(LENGTH.pack(len(data)) + data + payload)
+
+
+def recv_message(sock: socket.socket) -> tuple[dict, bytes]:
+    """
+    Receives a header and payload from a socket.
+
+    Args:
+        sock (socket.socket): The connected socket.
+
+    Returns:
+        tuple[dict, bytes]: The header and payload.
+
+    Raises:
+        ConnectionError: If the peer closed the connection.
+    """
+    (size,) = LENGTH.unpack(_recv_exact(sock, LENGTH.size))
+    header = json.loads(_recv_exact(sock, size))
+    return header, _recv_exact(sock, header.get("bytes", 0))
+
+
+def render_task(request: dict) -> tuple[dict, bytes]:
+    """
+    Renders a frame or tile request on a worker.
+
+    Models and framebuffers stay with the worker between tasks.
+
+    Args:
+        request (dict): The render request, see engines.daemon.DEFAULT_REQUEST.
+            An optional "tile" of (x0, y0, x1, y1), in image coordinates with
+            the origin at the top left, end exclusive, renders only that part
+            of the frame.
+
+    Returns:
+        tuple[dict, bytes]: The image size and mode, and its raw pixel bytes.
+    """
+    global _models, _frames
+    if _models is None:
+        _models = ModelCache()
+        _frames = FramebufferPool()
+    request = {**DEFAULT_REQUEST, **request}
+    region = None
+    if request.get("tile"):
+        # The render buffers are y up, the tile counts rows from the top
+        x0, y0, x1, y1 = request["tile"]
+        height = request["height"]
+        region = (x0, height - y1, x1, height - y0)
+    model = _models.get(request["model"])
+    image = render_frame(model, request, _frames, region=region)
+    frame = image.zbuffer if request["buffer"] == "depth" else image.image
+    if request.get("tile"):
+        frame = frame.crop(tuple(request["tile"]))
+    header = {
+        "width": frame.get_width(),
+        "height": frame.get_height(),
+        "mode": frame.mode,
+    }
+    payload = frame.tobytes()
+    image.release_frame()
+    return header, payload
+
+
+def run_worker(address: tuple[str, int], render=render_task) -> int:
+    """
+    Connects to a coordinator and renders until stopped.
+
+    Args:
+        address (tuple[str, int]): The coordinator's host and port.
+        render (Callable, optional): Renders a request into a header and bytes.
+
+    Returns:
+        int: The number of tasks rendered.
+    """
+    rendered = 0
+    with socket.create_connection(address) as sock:
+        send_message(sock, {"type": "ready"})
+        while True:
+            header, _ = recv_message(sock)
+            if header["type"] == "stop":
+                return rendered
+            task = header["task"]
+            try:
+                meta, payload = render(header["request"])
+            except Exception as error:
+                # Reported so the coordinator can retry the task elsewhere
+                send_message(sock, {"type": "error", "task": task, "error": str(error)})
+                continue
+            send_message(sock, {**meta, "type": "result", "task": task}, payload)
+            rendered += 1
+
+
+def spawn_workers(address: tuple[str, int], count: int, render=render_task) -> list:
+    """
+    Starts local worker processes.
+
+    Args:
+        address (tuple[str, int]): The coordinator's host and port.
+        count (int): The number of workers.
+        render (Callable, optional): The render function, importable by name.
+
+    Returns:
+        list[Process]: The started processes.
+    """
+    workers = [
+        Process(target=run_worker, args=(address, render), daemon=True)
+        for _ in range(count)
+    ]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def directory_sink(folder: str):
+    """
+    Returns a sink saving every result as an image file.
+
+    Args:
+        folder (str): The output folder, created when missing.
+
+    Returns:
+        Callable: A sink writing <folder>/<task>.png.
+    """
+    os.makedirs(folder, exist_ok=True)
+
+    def sink(task: int, request: dict, header: dict, payload: bytes) -> None:
+        size = (header["width"], header["height"])
+        image = Image.frombytes(header["mode"], size, payload)
+        image.save(os.path.join(folder, f"{task:05d}.png"))
+
+    return sink
+
+
+class RenderFarm:
+    """
+    The coordinator distributing tasks to workers.
+
+    The listening socket is bound on construction, so workers may connect
+    before run is called.
+    """
+
+    def __init__(
+        self,
+        tasks: list,
+        sink,
+        address: tuple[str, int] = ("127.0.0.1", 0),
+        max_retries: int = MAX_RETRIES,
+        steal: bool = True,
+        worker_timeout: float = WORKER_TIMEOUT,
+    ):
+        """
+        Args:
+            tasks (list[dict]): The render requests, frames or tiles.
+            sink (Callable): Called as sink(task, request, header, payload) for
+                every finished task, in completion order.
+            address (tuple[str, int], optional): The address to listen on.
+            max_retries (int, optional): Failed attempts a task may be retried.
+            steal (bool, optional): Duplicate running tasks onto idle workers.
+            worker_timeout (float, optional): Seconds a worker may stay silent
+                before it counts as lost, None to wait forever.
+        """
+        self.tasks = list(tasks)
+        self.sink = sink
+        self.max_retries = max_retries
+        self.steal = steal
+        self.worker_timeout = worker_timeout
+        self.queue = deque(range(len(self.tasks)))
+        self.assigned = {}
+        self.started = {}
+        self.released = {}
+        self.attempts = [0] * len(self.tasks)
+        self.done = set()
+        self.failed = {}
+        self.stats = {"retries": 0, "stolen": 0, "workers": 0}
+        self.lock = threading.Condition()
+        self.sink_lock = threading.Lock()
+        self.listener = socket.create_server(address)
+        self.address = self.listener.getsockname()[:2]
+        self.accepting = None
+
+    @property
+    def finished(self) -> bool:
+        return len(self.done) + len(self.failed) == len(self.tasks)
+
+    def run(self, timeout: float = None) -> dict:
+        """
+        Serves workers until every task is done or failed.
+
+        Serving starts on the first call of start or run.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the batch.
+
+        Returns:
+            dict: The statistics, with "done" task count and "failed" errors.
+
+        Raises:
+            TimeoutError: If the batch did not finish in time.
+        """
+        self.start()
+        with self.lock:
+            if not self.lock.wait_for(lambda: self.finished, timeout):
+                raise TimeoutError(f"{len(self.done)}/{len(self.tasks)} tasks done")
+        self.listener.close()
+        return {**self.stats, "done": len(self.done), "failed": dict(self.failed)}
+
+    def start(self) -> None:
+        """Starts handing out tasks to connecting workers."""
+        if self.accepting is None:
+            self.accepting = threading.Thread(target=self._accept, daemon=True)
+            self.accepting.start()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                sock, _ = self.listener.accept()
+            except OSError:
+                return
+            with self.lock:
+                # Numbered rather than id(sock), which a later socket may reuse
+                self.stats["workers"] += 1
+                worker = self.stats["workers"]
+            threading.Thread(
+                target=self._serve, args=(sock, worker), daemon=True
+            ).start()
+
+    def _take(self, worker: int):
+        """Returns the next task for a worker, None once the batch is over."""
+        with self.lock:
+            while True:
+                if self.finished:
+                    return None
+                while self.queue:
+                    task = self.queue.popleft()
+                    if task not in self.done and task not in self.failed:
+                        self.assigned.setdefault(task, set()).add(worker)
+                        self.started.setdefault(task, time.monotonic())
+                        return task
+                running = [
+                    task
+                    for task, workers in self.assigned.items()
+                    if workers
+                    and worker not in workers
+                    and worker not in self.released.get(task, ())
+                ]
+                if self.steal and running:
+                    task = min(running, key=lambda task: self.started[task])
+                    self.assigned[task].add(worker)
+                    self.stats["stolen"] += 1
+                    return task
+                self.lock.wait(POLL_INTERVAL)
+
+    def _release(self, worker: int, task: int, error: str) -> None:
+        with self.lock:
+            workers = self.assigned.get(task, set())
+            workers.discard(worker)
+            if task in self.done or task in self.failed:
+                return
+            if workers:
+                # A stolen copy is still rendering and may yet succeed, this
+                # worker must not steal it back meanwhile
+                self.released.setdefault(task, set()).add(worker)
+                return
+            self.released.pop(task, None)
+            self.attempts[task] += 1
+            if self.attempts[task] > self.max_retries:
+                self.failed[task] = error
+                self.assigned.pop(task, None)
+            else:
+                # Nobody else is rendering it, so it goes back to the front
+                self.stats["retries"] += 1
+                self.started.pop(task, None)
+                self.queue.appendleft(task)
+            self.lock.notify_all()
+
+    def _complete(self, worker: int, task: int, header: dict, payload: bytes) -> None:
+        with self.lock:
+            self.assigned.get(task, set()).discard(worker)
+            if task in self.done or task in self.failed:
+                return
+            self.done.add(task)
+            self.assigned.pop(task, None)
+        with self.sink_lock:
+            self.sink(task, self.tasks[task], header, payload)
+        with self.lock:
+            self.lock.notify_all()
+
+    def _serve(self, sock: socket.socket, worker: int) -> None:
+        task = None
+        with sock:
+            try:
+                # A timeout is an OSError, so a silent worker counts as lost
+                sock.settimeout(self.worker_timeout)
+                recv_message(sock)
+                while True:
+                    task = self._take(worker)
+                    if task is None:
+                        send_message(sock, {"type": "stop"})
+                        return
+                    request = self.tasks[task]
+                    message = {"type": "task", "task": task, "request": request}
+                    send_message(sock, message)
+                    header, payload = recv_message(sock)
+                    if header["type"] == "result":
+                        self._complete(worker, task, header, payload)
+                    else:
+                        self._release(worker, task, header.get("error", "failed"))
+                    task = None
+            except (ConnectionError, OSError, ValueError) as error:
+                if task is not None:
+                    self._release(worker, task, f"worker lost: {error}")
+
+
+def main(argv=None) -> None:
+    parser = ArgumentParser(description="Distribute renders over TCP workers.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    coordinator = commands.add_parser("coordinator")
+    coordinator.add_argument("--batch", required=True, help="JSON list of requests")
+    coordinator.add_argument("--host", default="127.0.0.1")
+    coordinator.add_argument("--port", type=int, default=9000)
+    coordinator.add_argument("--output", default="frames")
+    coordinator.add_argument("--local-workers", type=int, default=0)
+    worker = commands.add_parser("worker")
+    worker.add_argument("--connect", required=True, help="host:port")
+    args = parser.parse_args(argv)
+
+    if args.command == "worker":
+        host, port = args.connect.rsplit(":", 1)
+        print(f"Rendered {run_worker((host, int(port)))} tasks")
+        return
+    with open(args.batch, "r") as file:
+        tasks = json.load(file)
+    farm = RenderFarm(tasks, directory_sink(args.output), (args.host, args.port))
+    print(f"Coordinator listening on {farm.address}")
+    spawn_workers(("127.0.0.1", farm.address[1]), args.local_workers)
+    print(farm.run())
+
+
+if __name__ == "__main__":
+    main()
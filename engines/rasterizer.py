@@ -0,0 +1,438 @@
+"""
+Module Summary: Contains the array based triangle rasterizer.
+
+Triangles are expanded into fragments in large chunks instead of one pixel at
+a time. Every chunk is resolved to the nearest fragment per pixel, depth tested
+against the depth buffer and only the surviving fragments are handed to the
+shader, so shading cost scales with visible pixels.
+
+Buffers are indexed [x, y] like ObjectImage.pixels.
+
+Returns:
+    Functions:
+        barycentric_coefficients: Computes per triangle barycentric planes.
+        fragments: Expands screen space triangles into fragment chunks.
+        fragment_depth: Interpolates the depth of a chunk of fragments.
+        nearest: Selects the nearest fragment for every covered pixel.
+        rasterize: Rasterizes triangles into depth and color buffers.
+        tile_bounds: Splits a buffer into square tiles.
+        rasterize_tiles: Clears and rasterizes the buffers one tile at a time.
+        pick_buffer: Resolves face ids and barycentrics for many pixels at once.
+        range_groups: Builds a face to group map from face ranges.
+        visible_counts: Counts the visible pixels per face group.
+        occlusion_query: Depth only render that returns visible pixel counts.
+"""
+
+from numpy import (
+    abs as np_abs,
+    arange,
+    asarray,
+    bincount,
+    cumsum,
+    einsum,
+    floor,
+    full,
+    inf,
+    int32,
+    int64,
+    lexsort,
+    maximum,
+    minimum,
+    nan,
+    ndarray,
+    ones,
+    repeat,
+    searchsorted,
+    stack,
+    zeros,
+)
+
+FRAGMENT_CHUNK = 1 << 18
+TILE_SIZE = 1024
+
+
+def barycentric_coefficients(screen: ndarray) -> tuple[ndarray, ndarray]:
+    """
+    Computes per triangle barycentric planes.
+
+    Args:
+        screen (ndarray): An (F, 3, 4) array of homogeneous screen coordinates.
+
+    Returns:
+        tuple[ndarray, ndarray]: An (F, 3, 3) array such that the barycentric
+        coordinates of pixel (x, y) are coefficients @ (x, y, 1), and an (F,)
+        mask of the non degenerate triangles.
+    """
+    pts = screen[..., :2] / screen[..., 3:4]
+    a, b, c = pts[:, 0], pts[:, 1], pts[:, 2]
+    area = (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1]) - (b[:, 0] - a[:, 0]) * (
+        c[:, 1] - a[:, 1]
+    )
+    valid = np_abs(area) > 1e-2
+    area = area + ~valid
+
+    coefficients = zeros((len(screen), 3, 3))
+    coefficients[:, 2] = stack(
+        (
+            b[:, 1] - a[:, 1],
+            a[:, 0] - b[:, 0],
+            (b[:, 0] - a[:, 0]) * a[:, 1] - a[:, 0] * (b[:, 1] - a[:, 1]),
+        ),
+        axis=1,
+    ) / area[:, None]
+    coefficients[:, 1] = stack(
+        (
+            a[:, 1] - c[:, 1],
+            c[:, 0] - a[:, 0],
+            a[:, 0] * (c[:, 1] - a[:, 1]) - (c[:, 0] - a[:, 0]) * a[:, 1],
+        ),
+        axis=1,
+    ) / area[:, None]
+    coefficients[:, 0] = -coefficients[:, 1] - coefficients[:, 2]
+    coefficients[:, 0, 2] += 1
+    return coefficients, valid
+
+
+def fragments(
+    screen: ndarray,
+    width: int,
+    height: int,
+    chunk: int = FRAGMENT_CHUNK,
+    bounds: tuple[int, int, int, int] = None,
+):
+    """
+    Expands screen space triangles into fragment chunks.
+
+    Args:
+        screen (ndarray): An (F, 3, 4) array of homogeneous screen coordinates.
+        width (int): The buffer width.
+        height (int): The buffer height.
+        chunk (int, optional): The rough number of candidate pixels per chunk.
+        bounds (tuple[int, int, int, int], optional): An (x0, y0, x1, y1)
+            pixel rectangle, end exclusive, to restrict rasterization to.
+
+    Yields:
+        tuple[ndarray, ndarray, ndarray, ndarray]: Triangle indices, x and y
+        pixel coordinates and (K, 3) barycentric coordinates of the fragments
+        inside their triangle.
+    """
+    x_lo, y_lo, x_hi, y_hi = bounds or (0, 0, width, height)
+    coefficients, valid = barycentric_coefficients(screen)
+    pts = screen[..., :2] / screen[..., 3:4]
+    lo = floor(pts.min(axis=1))
+    hi = floor(pts.max(axis=1))
+    x0 = maximum(lo[:, 0], x_lo).astype(int64)
+    y0 = maximum(lo[:, 1], y_lo).astype(int64)
+    x1 = minimum(hi[:, 0], x_hi - 1).astype(int64)
+    y1 = minimum(hi[:, 1], y_hi - 1).astype(int64)
+    spans = maximum(y1 - y0 + 1, 0)
+    counts = maximum(x1 - x0 + 1, 0) * spans * valid
+
+    totals = cumsum(counts)
+    start = 0
+    while start < len(counts):
+        base = totals[start - 1] if start else 0
+        stop = max(int(searchsorted(totals, base + chunk, side="right")), start + 1)
+        size = counts[start:stop]
+        if size.sum():
+            tri = repeat(arange(start, stop), size)
+            local = arange(size.sum()) - repeat(cumsum(size) - size, size)
+            x = x0[tri] + local // spans[tri]
+            y = y0[tri] + local % spans[tri]
+            bar = einsum(
+                "kij,kj->ki",
+                coefficients[tri],
+                stack((x, y, ones(len(x))), axis=1),
+            )
+            inside = (bar >= 0).all(axis=1)
+            yield tri[inside], x[inside], y[inside], bar[inside]
+        start = stop
+
+
+def fragment_depth(screen: ndarray, tri: ndarray, bar: ndarray) -> ndarray:
+    """
+    Interpolates the depth of a chunk of fragments.
+
+    Args:
+        screen (ndarray): An (F, 3, 4) array of homogeneous screen coordinates.
+        tri (ndarray): The (K,) triangle index of every fragment.
+        bar (ndarray): The (K, 3) barycentric coordinates of every fragment.
+
+    Returns:
+        ndarray: The (K,) fragment depths, larger is closer.
+    """
+    corners = screen[tri]
+    return einsum("ki,ki->k", corners[..., 2], bar) / einsum(
+        "ki,ki->k", corners[..., 3], bar
+    )
+
+
+def nearest(key: ndarray, z: ndarray) -> ndarray:
+    """
+    Selects the nearest fragment for every covered pixel.
+
+    Args:
+        key (ndarray): The (K,) flat pixel index of every fragment.
+        z (ndarray): The (K,) fragment depths, larger is closer.
+
+    Returns:
+        ndarray: Indices of the fragment with the largest depth per pixel.
+    """
+    order = lexsort((-z, key))
+    ordered = key[order]
+    first = ones(len(order), dtype=bool)
+    first[1:] = ordered[1:] != ordered[:-1]
+    return order[first]
+
+
+def rasterize(
+    screen: ndarray,
+    depth: ndarray,
+    shader=None,
+    faces: ndarray = None,
+    color: ndarray = None,
+    chunk: int = FRAGMENT_CHUNK,
+    bounds: tuple[int, int, int, int] = None,
+    face_ids: ndarray = None,
+) -> int:
+    """
+    Rasterizes triangles into depth and color buffers.
+
+    Args:
+        screen (ndarray): An (F, 3, 4) array of homogeneous screen coordinates.
+        depth (ndarray): A contiguous (W, H) float depth buffer, updated in place.
+        shader (IBatchShader, optional): The shader for visible fragments. When
+            omitted only the depth buffer is written.
+        faces (ndarray, optional): The (F,) face ids passed to the shader.
+            Defaults to 0..F-1.
+        color (ndarray, optional): A contiguous (W, H, C) color buffer, updated
+            in place. Required when a shader is given.
+        chunk (int, optional): The rough number of candidate pixels per chunk.
+        bounds (tuple[int, int, int, int], optional): An (x0, y0, x1, y1)
+            pixel rectangle, end exclusive, to restrict rasterization to.
+        face_ids (ndarray, optional): A contiguous (W, H) int32 buffer that
+            receives the face id of every written pixel.
+
+    Returns:
+        int: The number of fragments written.
+    """
+    if not all(
+        buffer.flags.c_contiguous
+        for buffer in (depth, color, face_ids)
+        if buffer is not None
+    ):
+        raise ValueError("rasterize requires contiguous buffers")
+    width, height = depth.shape
+    faces = arange(len(screen)) if faces is None else faces
+    flat_depth = depth.reshape(-1)
+    flat_color = None if color is None else color.reshape(width * height, -1)
+    flat_ids = None if face_ids is None else face_ids.reshape(-1)
+
+    written = 0
+    for tri, x, y, bar in fragments(screen, width, height, chunk, bounds):
+        z = fragment_depth(screen, tri, bar)
+        key = x * height + y
+        keep = nearest(key, z)
+        keep = keep[z[keep] >= flat_depth[key[keep]]]
+        if shader is not None:
+            colors, discard = shader.fragment(faces[tri[keep]], bar[keep])
+            keep, colors = keep[~discard], colors[~discard]
+            flat_color[key[keep]] = colors
+        flat_depth[key[keep]] = z[keep]
+        if flat_ids is not None:
+            flat_ids[key[keep]] = faces[tri[keep]]
+        written += len(keep)
+    return written
+
+
+def tile_bounds(width: int, height: int, size: int, region: tuple = None) -> list:
+    """
+    Splits a buffer into square tiles.
+
+    Args:
+        width (int): The buffer width.
+        height (int): The buffer height.
+        size (int): The tile edge in pixels.
+        region (tuple[int, int, int, int], optional): Only split this
+            (x0, y0, x1, y1) part of the buffer, end exclusive.
+
+    Returns:
+        list[tuple[int, int, int, int]]: The (x0, y0, x1, y1) bounds of every
+        tile, end exclusive. Tiles sharing columns are adjacent, so the
+        [x, y] indexed buffers are walked in memory order.
+    """
+    left, bottom, right, top = (0, 0, width, height) if region is None else region
+    left, bottom = max(left, 0), max(bottom, 0)
+    right, top = min(right, width), min(top, height)
+    return [
+        (x0, y0, min(x0 + size, right), min(y0 + size, top))
+        for x0 in range(left, right, size)
+        for y0 in range(bottom, top, size)
+    ]
+
+
+def rasterize_tiles(
+    screen: ndarray,
+    depth: ndarray,
+    shader=None,
+    faces: ndarray = None,
+    color: ndarray = None,
+    face_ids: ndarray = None,
+    size: int = TILE_SIZE,
+    chunk: int = FRAGMENT_CHUNK,
+    region: tuple = None,
+) -> int:
+    """
+    Clears and rasterizes the buffers one tile at a time.
+
+    Every tile is cleared right before it is drawn and only receives the
+    triangles whose bounding box overlaps it, so each tile's memory is touched
+    once. Memory mapped buffers are paged in a tile at a time this way.
+
+    Args:
+        screen (ndarray): An (F, 3, 4) array of homogeneous screen coordinates.
+        depth (ndarray): A contiguous (W, H) float depth buffer.
+        shader (IBatchShader, optional): The shader for visible fragments.
+        faces (ndarray, optional): The (F,) face ids passed to the shader.
+            Defaults to 0..F-1.
+        color (ndarray, optional): A contiguous (W, H, C) color buffer.
+        face_ids (ndarray, optional): A contiguous (W, H) int32 face id buffer.
+        size (int, optional): The tile edge in pixels.
+        chunk (int, optional): The rough number of candidate pixels per chunk.
+        region (tuple[int, int, int, int], optional): Only clear and draw this
+            (x0, y0, x1, y1) part of the buffers, end exclusive. The rest is
+            left as it was.
+
+    Returns:
+        int: The number of fragments written.
+    """
+    width, height = depth.shape
+    faces = arange(len(screen)) if faces is None else faces
+    pts = screen[..., :2] / screen[..., 3:4]
+    lo = floor(pts.min(axis=1))
+    hi = floor(pts.max(axis=1))
+
+    written = 0
+    for x0, y0, x1, y1 in tile_bounds(width, height, size, region):
+        depth[x0:x1, y0:y1] = -inf
+        if color is not None:
+            color[x0:x1, y0:y1] = 0
+        if face_ids is not None:
+            face_ids[x0:x1, y0:y1] = -1
+        overlap = (
+            (lo[:, 0] < x1) & (hi[:, 0] >= x0) & (lo[:, 1] < y1) & (hi[:, 1] >= y0)
+        ).nonzero()[0]
+        if len(overlap):
+            written += rasterize(
+                screen[overlap],
+                depth,
+                shader,
+                faces[overlap],
+                color,
+                chunk,
+                (x0, y0, x1, y1),
+                face_ids,
+            )
+    return written
+
+
+def pick_buffer(face_ids: ndarray, screen: ndarray, x: ndarray, y: ndarray) -> tuple:
+    """
+    Resolves face ids and barycentrics for many pixels at once.
+
+    Args:
+        face_ids (ndarray): The (W, H) face id buffer of a render, -1 where
+            nothing was drawn.
+        screen (ndarray): The (F, 3, 4) screen coordinates of that render,
+            indexed by face id.
+        x (ndarray): The (K,) pixel columns.
+        y (ndarray): The (K,) pixel rows.
+
+    Returns:
+        tuple[ndarray, ndarray]: The (K,) face ids, -1 for misses and pixels
+        outside the buffer, and the (K, 3) barycentrics, nan for misses.
+    """
+    x, y = asarray(x, dtype=int64), asarray(y, dtype=int64)
+    width, height = face_ids.shape
+    inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+    ids = full(len(x), -1, dtype=int64)
+    ids[inside] = face_ids[x[inside], y[inside]]
+
+    bar = full((len(x), 3), nan)
+    hit = ids >= 0
+    if hit.any():
+        coefficients, _ = barycentric_coefficients(screen[ids[hit]])
+        bar[hit] = einsum(
+            "kij,kj->ki",
+            coefficients,
+            stack((x[hit], y[hit], ones(int(hit.sum()))), axis=1),
+        )
+    return ids, bar
+
+
+def range_groups(ranges, count: int) -> ndarray:
+    """
+    Builds a face to group map from face ranges.
+
+    Args:
+        ranges (Sequence[tuple[int, int]]): (start, stop) face ranges, one per
+            group, end exclusive.
+        count (int): The number of faces.
+
+    Returns:
+        ndarray: The (count,) group of every face, -1 for faces in no range.
+    """
+    groups = full(count, -1, dtype=int64)
+    for group, (begin, end) in enumerate(ranges):
+        groups[begin:end] = group
+    return groups
+
+
+def visible_counts(face_ids: ndarray, groups: ndarray = None, size: int = 0) -> ndarray:
+    """
+    Counts the visible pixels per face group.
+
+    Args:
+        face_ids (ndarray): A face id buffer, -1 where nothing was drawn.
+        groups (ndarray, optional): The (F,) group of every face, -1 to skip
+            a face. Defaults to one group per face.
+        size (int, optional): The minimum number of groups to report.
+
+    Returns:
+        ndarray: The visible pixel count of every group.
+    """
+    ids = face_ids[face_ids >= 0]
+    if groups is not None:
+        ids = asarray(groups)[ids]
+        ids = ids[ids >= 0]
+    return bincount(ids, minlength=size)
+
+
+def occlusion_query(
+    screen: ndarray,
+    width: int,
+    height: int,
+    groups: ndarray = None,
+    size: int = 0,
+    chunk: int = FRAGMENT_CHUNK,
+) -> ndarray:
+    """
+    Depth only render that returns visible pixel counts.
+
+    No shader runs and no color buffer is touched.
+
+    Args:
+        screen (ndarray): An (F, 3, 4) array of homogeneous screen coordinates.
+        width (int): The buffer width.
+        height (int): The buffer height.
+        groups (ndarray, optional): The (F,) group of every face.
+        size (int, optional): The minimum number of groups to report.
+        chunk (int, optional): The rough number of candidate pixels per chunk.
+
+    Returns:
+        ndarray: The visible pixel count of every group.
+    """
+    depth = full((width, height), -inf)
+    face_ids = full((width, height), -1, dtype=int32)
+    rasterize(screen, depth, chunk=chunk, face_ids=face_ids)
+    return visible_counts(face_ids, groups, size)
@@ -0,0 +1,227 @@
+"""
+Module Summary: Contains the ray casting render engine.
+
+This is an alternative to the rasterizer. Primary rays are generated for whole
+image tiles as arrays, traced through the model BVH and the hits are shaded
+with the same batched shaders the rasterizer uses. Tiles are rendered on a
+process pool, so the cost follows the number of pixels rather than the number
+of triangles. Long running callers can pass their own pool, the scene then
+travels with the tasks instead of being set up as each worker starts.
+
+The camera framing matches camera_matrices, so both engines produce the same
+image for the same camera.
+
+Returns:
+    Functions:
+        primary_rays: Generates the camera rays for a block of pixels.
+        render_tile: Traces and shades one image tile.
+        tiles: Splits an image into tile rectangles.
+        raycast: Renders a shader's model by ray casting.
+"""
+
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+from numpy import (
+    arange,
+    cross,
+    float64,
+    full,
+    inf,
+    int32,
+    meshgrid,
+    ndarray,
+    stack,
+    uint8,
+    zeros,
+)
+from numpy.linalg import norm
+
+from models.bvh import BVH
+from models.geometry.transforms import as_vector, camera_matrices, transform
+
+TILE_SIZE = 64
+
+_scene = None
+
+
+def _set_scene(scene) -> None:
+    global _scene
+    _scene = scene
+
+
+def _render_batch(scene: bytes, batch: list) -> list:
+    _set_scene(pickle.loads(scene))
+    return [render_tile(bounds) for bounds in batch]
+
+
+def primary_rays(
+    camera, width: int, height: int, x: ndarray, y: ndarray
+) -> tuple[ndarray, ndarray]:
+    """
+    Generates the camera rays for a block of pixels.
+
+    Args:
+        camera (ObjectCamera): The camera with eye, center and up vectors.
+        width (int): The image width.
+        height (int): The image height.
+        x (ndarray): The (K,) pixel columns.
+        y (ndarray): The (K,) pixel rows.
+
+    Returns:
+        tuple[ndarray, ndarray]: The (K, 3) ray origins and unit directions.
+    """
+    eye, center, up = as_vector(camera.eye), as_vector(camera.center), as_vector(camera.up)
+    distance = norm(eye - center)
+    z_axis = (eye - center) / distance
+    x_axis = cross(up, z_axis)
+    x_axis /= norm(x_axis)
+    y_axis = cross(z_axis, x_axis)
+
+    # Inverse of the viewport, which maps [-1, 1] onto the middle 3/4 of the image
+    sx = (x - width / 2) / (width * 3 / 8)
+    sy = (y - height / 2) / (height * 3 / 8)
+    directions = sx[:, None] * x_axis + sy[:, None] * y_axis - distance * z_axis
+    directions /= norm(directions, axis=1, keepdims=True)
+    return full((len(x), 3), eye), directions
+
+
+def render_tile(bounds: tuple[int, int, int, int]) -> tuple:
+    """
+    Traces and shades one image tile.
+
+    Args:
+        bounds (tuple[int, int, int, int]): The (x0, y0, x1, y1) tile, end
+            exclusive.
+
+    Returns:
+        tuple[tuple, ndarray, ndarray, ndarray]: The bounds, the (w, h, 4)
+        colors, the (w, h) depths and the (w, h) face ids of the tile.
+    """
+    shader, bvh, camera, width, height, matrix = _scene
+    x0, y0, x1, y1 = bounds
+    x, y = meshgrid(arange(x0, x1), arange(y0, y1), indexing="ij")
+    x, y = x.ravel(), y.ravel()
+    origins, directions = primary_rays(camera, width, height, x, y)
+    t, tri, u, v = bvh.intersect(origins, directions)
+
+    color = zeros((len(x), 4), dtype=uint8)
+    depth = full(len(x), -inf)
+    face_ids = full(len(x), -1, dtype=int32)
+    hit = (tri >= 0).nonzero()[0]
+    if len(hit):
+        bar = stack((1 - u[hit] - v[hit], u[hit], v[hit]), axis=1)
+        colors, discard = shader.fragment(tri[hit], bar)
+        shown = hit[~discard]
+        color[shown] = colors[~discard]
+        face_ids[shown] = tri[shown]
+        screen = transform(matrix, origins[shown] + directions[shown] * t[shown, None])
+        depth[shown] = screen[:, 2] / screen[:, 3]
+    shape = (x1 - x0, y1 - y0)
+    return (
+        bounds,
+        color.reshape(shape + (4,)),
+        depth.reshape(shape),
+        face_ids.reshape(shape),
+    )
+
+
+def tiles(width: int, height: int, size: int = TILE_SIZE, region: tuple = None) -> list:
+    """
+    Splits an image into tile rectangles.
+
+    Args:
+        width (int): The image width.
+        height (int): The image height.
+        size (int, optional): The tile side. Defaults to 64.
+        region (tuple[int, int, int, int], optional): Only split this
+            (x0, y0, x1, y1) part of the image, end exclusive.
+
+    Returns:
+        list[tuple[int, int, int, int]]: The (x0, y0, x1, y1) tiles.
+    """
+    left, bottom, right, top = (0, 0, width, height) if region is None else region
+    left, bottom = max(left, 0), max(bottom, 0)
+    right, top = min(right, width), min(top, height)
+    return [
+        (x, y, min(x + size, right), min(y + size, top))
+        for x in range(left, right, size)
+        for y in range(bottom, top, size)
+    ]
+
+
+def raycast(
+    shader,
+    camera,
+    width: int,
+    height: int,
+    bvh: BVH = None,
+    tile: int = TILE_SIZE,
+    processes: int = None,
+    executor: ProcessPoolExecutor = None,
+    region: tuple = None,
+) -> tuple[ndarray, ndarray, ndarray]:
+    """
+    Renders a shader's model by ray casting.
+
+    The shader's camera and matrices are set and its vertex stage is run over
+    every face before any ray is traced, like the rasterizer would.
+
+    Args:
+        shader (IBatchShader): The shader, its faces are the traced triangles.
+        camera (ObjectCamera): The camera with eye, center and up vectors.
+        width (int): The image width.
+        height (int): The image height.
+        bvh (BVH, optional): A BVH over the shader's faces. Built when omitted.
+        tile (int, optional): The tile side. Defaults to 64.
+        processes (int, optional): Worker processes, 1 renders in process.
+            Defaults to one per core.
+        executor (ProcessPoolExecutor, optional): A long lived pool to trace
+            on instead of starting one. The tiles are split into one batch
+            per process, each carrying the pickled scene.
+        region (tuple[int, int, int, int], optional): Only trace this
+            (x0, y0, x1, y1) part of the image, end exclusive. The rest of
+            the buffers stays cleared.
+
+    Returns:
+        tuple[ndarray, ndarray, ndarray]: The (W, H, 4) color, (W, H) depth and
+        (W, H) int32 face id buffers, indexed [x, y].
+    """
+    matrices = camera_matrices(camera, width, height)
+    shader.set_camera(camera)
+    shader.set_matrices(*matrices)
+    # Per vertex state like Gouraud intensities is filled by the vertex stage
+    shader.vertex(arange(len(shader.faces)))
+    model_view, projection, viewport = matrices
+    if bvh is None:
+        bvh = BVH.from_model(shader.model, shader.faces)
+    scene = (shader, bvh, camera, width, height, viewport @ projection @ model_view)
+
+    color = zeros((width, height, 4), dtype=uint8)
+    depth = full((width, height), -inf, dtype=float64)
+    face_ids = full((width, height), -1, dtype=int32)
+
+    def gather(results):
+        for (x0, y0, x1, y1), tile_color, tile_depth, tile_ids in results:
+            color[x0:x1, y0:y1] = tile_color
+            depth[x0:x1, y0:y1] = tile_depth
+            face_ids[x0:x1, y0:y1] = tile_ids
+
+    todo = tiles(width, height, tile, region)
+    if processes == 1:
+        _set_scene(scene)
+        gather(map(render_tile, todo))
+    elif executor is not None:
+        # Pickled once here rather than once per task by the executor
+        payload = pickle.dumps(scene)
+        parts = min(processes or os.cpu_count() or 1, len(todo))
+        batches = [todo[i::parts] for i in range(parts)]
+        results = executor.map(_render_batch, [payload] * parts, batches)
+        gather(result for batch in results for result in batch)
+    else:
+        with ProcessPoolExecutor(
+            max_workers=processes, initializer=_set_scene, initargs=(scene,)
+        ) as executor:
+            gather(executor.map(render_tile, todo))
+    return color, depth, face_ids
@@ -1,11 +1,335 @@
-import math
-import numpy as np
-from typing import List
+"""
+Module Summary: Contains the line and wireframe renderer.
 
+Segments are expanded into pixels with a vectorized DDA: every segment takes
+one step per pixel along its major axis, and the steps of all segments in a
+chunk are generated as one array. Segments are clipped to the buffer first,
+so the work scales with the visible pixels. Antialiased lines split every
+step over the two pixels straddling the line, weighted by coverage.
+
+Buffers are indexed [x, y] like ObjectImage.pixels.
+
+Returns:
+    Functions:
+        embed: Embeds a vector into a Vector4, padding with ones.
+        clip_segments: Clips segments to a rectangle.
+        line_fragments: Expands segments into pixel fragment chunks.
+        draw_lines: Draws segments into color and optional depth buffers.
+        render_triangle_outline: Draws lines into a new RGB frame buffer.
+        file_writer: Writes an RGB frame buffer as a binary PPM file.
+"""
+
+import os
+
+from numpy import (
+    abs as np_abs,
+    arange,
+    argsort,
+    array,
+    ascontiguousarray,
+    asarray,
+    ceil,
+    concatenate,
+    cumsum,
+    errstate,
+    float64,
+    floor,
+    int64,
+    isfinite,
+    maximum,
+    minimum,
+    ndarray,
+    ones,
+    repeat,
+    searchsorted,
+    stack,
+    uint8,
+    where,
+    zeros,
+)
+
+from engines.rasterizer import FRAGMENT_CHUNK
 from models.vectors import Vector4
+from utils.generators import HEIGHT, WIDTH, frame_buffer
 
 
 def embed(v, dim):
     ret = [v[i] if i < len(v) else 1.0 for i in range(dim)]
     return Vector4(*ret)
 
+
+def clip_segments(points: ndarray, bounds: tuple) -> tuple[ndarray, ndarray]:
+    """
+    Clips segments to a rectangle.
+
+    Args:
+        points (ndarray): An (N, 2, 2) array of segment end points.
+        bounds (tuple[float, float, float, float]): The (x0, y0, x1, y1)
+            rectangle, inclusive.
+
+    Returns:
+        tuple[ndarray, ndarray]: The (N, 2) segment parameters the visible
+        part starts and ends at, and the (N,) mask of segments with one.
+    """
+    x0, y0 = points[:, 0, 0], points[:, 0, 1]
+    dx, dy = points[:, 1, 0] - x0, points[:, 1, 1] - y0
+    enter, leave = zeros(len(points)), ones(len(points))
+    visible = isfinite(x0 + y0 + dx + dy)
+    # Liang-Barsky: every side limits the parameter range from one end
+    with errstate(divide="ignore", invalid="ignore"):
+        for direction, distance in (
+            (-dx, x0 - bounds[0]),
+            (dx, bounds[2] - x0),
+            (-dy, y0 - bounds[1]),
+            (dy, bounds[3] - y0),
+        ):
+            ratio = distance / direction
+            visible &= (direction != 0) | (distance >= 0)
+            enter = where(direction < 0, maximum(enter, ratio), enter)
+            leave = where(direction > 0, minimum(leave, ratio), leave)
+    visible &= enter <= leave
+    return stack((enter, leave), axis=1), visible
+
+
+def _line_steps(seg: ndarray, local: ndarray, lines: tuple, antialias: bool) -> tuple:
+    """Places the local step of every fragment of a chunk on its segment."""
+    x0, y0, dx, dy, steps, enter, leave = lines
+    step = local / maximum(steps[seg], 1)
+    x = x0[seg] + step * dx[seg]
+    y = y0[seg] + step * dy[seg]
+    t = enter[seg] + step * (leave[seg] - enter[seg])
+    if not antialias:
+        return seg, floor(x + 0.5).astype(int64), floor(y + 0.5).astype(int64), t, None
+
+    steep = np_abs(dy[seg]) > np_abs(dx[seg])
+    along = floor(where(steep, y, x) + 0.5).astype(int64)
+    across = where(steep, x, y)
+    below = floor(across)
+    coverage = across - below
+    below = below.astype(int64)
+    x = concatenate((where(steep, below, along), where(steep, below + 1, along)))
+    y = concatenate((where(steep, along, below), where(steep, along, below + 1)))
+    alpha = concatenate((1 - coverage, coverage))
+    keep = alpha > 0
+    seg, t = concatenate((seg, seg))[keep], concatenate((t, t))[keep]
+    return seg, x[keep], y[keep], t, alpha[keep]
+
+
+def line_fragments(
+    points: ndarray,
+    antialias: bool = False,
+    chunk: int = FRAGMENT_CHUNK,
+    bounds: tuple = None,
+):
+    """
+    Expands segments into pixel fragment chunks.
+
+    Args:
+        points (ndarray): An (N, 2, 2) array of segment end points.
+        antialias (bool, optional): Split every step over the two pixels
+            straddling the line, weighted by coverage.
+        chunk (int, optional): The rough number of fragments per chunk.
+        bounds (tuple[int, int], optional): The (width, height) of the buffer
+            to clip the segments to. Fragments may still fall one pixel
+            outside it and are left for the caller to drop.
+
+    Yields:
+        tuple[ndarray, ndarray, ndarray, ndarray, ndarray]: The segment index,
+        x and y pixel, and position along the segment from 0 to 1 of every
+        fragment, and its coverage, None without antialiasing.
+    """
+    points = asarray(points, dtype=float64)
+    x0, y0 = points[:, 0, 0], points[:, 0, 1]
+    dx, dy = points[:, 1, 0] - x0, points[:, 1, 1] - y0
+    if bounds is None:
+        enter, leave = zeros(len(points)), ones(len(points))
+        visible = isfinite(x0 + y0 + dx + dy)
+    else:
+        width, height = bounds
+        span, visible = clip_segments(points, (-0.5, -0.5, width - 0.5, height - 0.5))
+        enter, leave = span[:, 0], span[:, 1]
+        x0, y0 = x0 + enter * dx, y0 + enter * dy
+        dx, dy = dx * (leave - enter), dy * (leave - enter)
+    dx, dy = where(visible, dx, 0), where(visible, dy, 0)
+    steps = ceil(maximum(np_abs(dx), np_abs(dy))).astype(int64)
+    counts = where(visible, steps + 1, 0)
+    lines = (x0, y0, dx, dy, steps, enter, leave)
+
+    totals = cumsum(counts)
+    begin = 0
+    while begin < len(counts):
+        base = totals[begin - 1] if begin else 0
+        stop = max(int(searchsorted(totals, base + chunk, side="right")), begin + 1)
+        size = counts[begin:stop]
+        if size.sum():
+            seg = repeat(arange(begin, stop), size)
+            local = arange(size.sum()) - repeat(cumsum(size) - size, size)
+            yield _line_steps(seg, local, lines, antialias)
+        begin = stop
+
+
+def _strongest(key: ndarray, value: ndarray) -> ndarray:
+    """Selects the fragment with the largest value for every pixel."""
+    low, high = value.min(), value.max()
+    scaled = (value - low) * (0.5 / (high - low)) if high > low else value * 0
+    # One float sort key instead of a two key lexsort, the values only order
+    # fragments within a pixel so their precision barely matters
+    order = argsort(key * 2.0 - scaled)
+    ordered = key[order]
+    first = ones(len(order), dtype=bool)
+    first[1:] = ordered[1:] != ordered[:-1]
+    return order[first]
+
+
+def _write(buffer: ndarray, x: ndarray, y: ndarray, values, alpha) -> None:
+    """Writes or, with coverage, blends values into buffer pixels."""
+    if alpha is not None:
+        old = buffer[x, y].astype(float64)
+        alpha = alpha.reshape((-1,) + (1,) * (buffer.ndim - 2))
+        values = old + (asarray(values, dtype=float64) - old) * alpha + 0.5
+    buffer[x, y] = values
+
+
+def draw_lines(
+    points: ndarray,
+    color: ndarray,
+    colors,
+    depth: ndarray = None,
+    antialias: bool = False,
+    bias: float = 0.0,
+    chunk: int = FRAGMENT_CHUNK,
+) -> int:
+    """
+    Draws segments into color and optional depth buffers.
+
+    Args:
+        points (ndarray): An (N, 2, 2) array of segment end points, or (N, 2, 4)
+            homogeneous screen coordinates like the rasterizer's.
+        color (ndarray): A (W, H[, C]) color buffer, any view of one included,
+            updated in place.
+        colors (array-like): One color for every segment or (N, C) colors.
+        depth (ndarray, optional): A (W, H) float depth buffer, larger is
+            closer. Only fragments at least as close are drawn and they update
+            it. Requires homogeneous points.
+        antialias (bool, optional): Blend the lines by pixel coverage.
+        bias (float, optional): Added to the line depth before the test, so
+            lines lying on a rendered surface are not hidden by it.
+        chunk (int, optional): The rough number of fragments per chunk.
+
+    Returns:
+        int: The number of fragments written.
+
+    Raises:
+        ValueError: If a depth buffer is given with two dimensional points.
+    """
+    points = asarray(points, dtype=float64)
+    homogeneous = points.shape[-1] == 4
+    if depth is not None and not homogeneous:
+        raise ValueError("depth testing needs (N, 2, 4) homogeneous points")
+    xy = points[..., :2] / points[..., 3:4] if homogeneous else points[..., :2]
+    colors = asarray(colors)
+    per_segment = colors.ndim == color.ndim - 1 and len(colors) == len(points)
+    width, height = color.shape[:2]
+
+    written = 0
+    for seg, x, y, t, alpha in line_fragments(xy, antialias, chunk, (width, height)):
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        if not inside.all():
+            seg, x, y, t = seg[inside], x[inside], y[inside], t[inside]
+            alpha = None if alpha is None else alpha[inside]
+        if depth is not None:
+            ends = points[seg]
+            z = ends[:, 0, 2] + t * (ends[:, 1, 2] - ends[:, 0, 2])
+            w = ends[:, 0, 3] + t * (ends[:, 1, 3] - ends[:, 0, 3])
+            z = z / w + bias
+            keep = isfinite(z).nonzero()[0]
+            keep = keep[_strongest(x[keep] * height + y[keep], z[keep])]
+            keep = keep[z[keep] >= depth[x[keep], y[keep]]]
+            depth[x[keep], y[keep]] = z[keep]
+        elif alpha is not None:
+            # The strongest coverage of a chunk wins where lines cross
+            keep = _strongest(x * height + y, alpha)
+        else:
+            keep = slice(None)
+        seg, x, y = seg[keep], x[keep], y[keep]
+        values = colors[seg] if per_segment else colors
+        _write(color, x, y, values, None if alpha is None else alpha[keep])
+        written += len(seg)
+    return written
+
+
+def render_triangle_outline(
+    lines: list,
+    filename: str = None,
+    width: int = WIDTH,
+    height: int = HEIGHT,
+    antialias: bool = False,
+    clip: bool = False,
+) -> ndarray:
+    """
+    Draws lines into a new RGB frame buffer.
+
+    Coordinates index the frame like Python sequences: y counts rows from the
+    top and negative positions count from the right and bottom edges.
+
+    Args:
+        lines (list[Line]): The lines to draw.
+        filename (str, optional): Write the frame to this PPM file, the .ppm
+            suffix is added when missing.
+        width (int, optional): The frame width. Defaults to 800.
+        height (int, optional): The frame height. Defaults to 600.
+        antialias (bool, optional): Blend the lines by pixel coverage.
+        clip (bool, optional): Clip the lines to the frame instead, leaving
+            out the parts outside it. Negative positions are then off-screen.
+
+    Returns:
+        ndarray: The (height, width, 3) uint8 frame.
+
+    Raises:
+        IndexError: If a line leaves the frame without clip.
+    """
+    frame = frame_buffer(width, height)
+    if lines:
+        points = array([[line.start, line.end] for line in lines], dtype=float64)
+        colors = array([line.color for line in lines], dtype=uint8)
+        pixels = frame.swapaxes(0, 1)
+        if clip:
+            fragments = line_fragments(points, antialias, bounds=(width, height))
+        else:
+            x, y = points[..., 0], points[..., 1]
+            if ((x < -width) | (x >= width) | (y < -height) | (y >= height)).any():
+                raise IndexError("line outside the frame")
+            fragments = line_fragments(points, antialias)
+        for seg, x, y, _, alpha in fragments:
+            if clip:
+                inside = ((x >= 0) & (x < width) & (y >= 0) & (y < height)).nonzero()[0]
+                seg, x, y = seg[inside], x[inside], y[inside]
+                alpha = None if alpha is None else alpha[inside]
+            _write(pixels, x % width, y % height, colors[seg], alpha)
+    if filename is not None:
+        file_writer(frame, filename)
+    return frame
+
+
+def file_writer(image, filename: str) -> str:
+    """
+    Writes an RGB frame buffer as a binary PPM file.
+
+    Args:
+        image (array-like): The (height, width, 3) frame, top row first.
+        filename (str): The file name, the .ppm suffix is added when missing.
+            Missing folders are created.
+
+    Returns:
+        str: The written file name.
+    """
+    path = filename if filename.endswith(".ppm") else filename + ".ppm"
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    rows = ascontiguousarray(asarray(image)[..., :3], dtype=uint8)
+    height, width = rows.shape[:2]
+    with open(path, "wb") as file:
+        file.write(f"P6\n{width} {height}\n255\n".encode())
+        file.write(rows.data)
+    return path
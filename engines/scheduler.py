@@ -0,0 +1,321 @@
+"""
+Module Summary: Contains the asyncio scheduler for render jobs.
+
+Jobs are queued by priority and then by deadline, and dispatched to a process
+pool while the estimated memory of the running jobs stays within a limit.
+Identical requests that are queued or running at the same time are coalesced
+into one render whose result every caller receives.
+
+Batch jobs may occupy every worker. The pool holds one process more than that,
+which only interactive jobs may use, so a preview never queues behind a batch
+while the cores stay saturated with batch work. Interactive jobs are not held
+back by the memory limit either.
+
+Returns:
+    Functions:
+        job_key: Returns the coalescing key of a render request.
+        frame_bytes: Estimates the memory a render request needs.
+        render_request: Renders a request in a worker process.
+    Classes:
+        DeadlineExceeded: Raised when a job misses its deadline.
+        RenderJob: A queued or running render.
+        RenderScheduler: Priority scheduler with backpressure and coalescing.
+"""
+
+import asyncio
+import heapq
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count
+from math import inf
+
+from numpy import ndarray
+
+from engines.daemon import DEFAULT_REQUEST, ModelCache, render_frame
+
+INTERACTIVE = 0
+BATCH = 10
+
+MEMORY_LIMIT = 1 << 30
+MAX_PENDING = 256
+BYTES_PER_PIXEL = 16
+
+KEY_FIELDS = (
+    "model",
+    "width",
+    "height",
+    "eye",
+    "center",
+    "up",
+    "light",
+    "shadows",
+    "engine",
+)
+
+_models = None
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a job misses its deadline."""
+
+
+def job_key(request: dict) -> str:
+    """
+    Returns the coalescing key of a render request.
+
+    Args:
+        request (dict): The render request.
+
+    Returns:
+        str: A key equal for requests that render the same frame.
+    """
+    fields = {field: request.get(field) for field in KEY_FIELDS}
+    return json.dumps(fields, sort_keys=True)
+
+
+def frame_bytes(request: dict) -> int:
+    """
+    Estimates the memory a render request needs.
+
+    Args:
+        request (dict): The render request.
+
+    Returns:
+        int: The bytes of the color, depth and face id buffers.
+    """
+    return request.get("width", 800) * request.get("height", 800) * BYTES_PER_PIXEL
+
+
+def render_request(request: dict) -> tuple[ndarray, ndarray]:
+    """
+    Renders a request in a worker process.
+
+    Models stay loaded in the worker between jobs.
+
+    Args:
+        request (dict): The render request, see engines.daemon.DEFAULT_REQUEST.
+
+    Returns:
+        tuple[ndarray, ndarray]: The color and depth images, top row first.
+    """
+    global _models
+    if _models is None:
+        _models = ModelCache()
+    request = {**DEFAULT_REQUEST, **request}
+    image = render_frame(_models.get(request["model"]), request)
+    return image.image.rows(), image.zbuffer.rows()
+
+
+class RenderJob:
+    """
+    A queued or running render.
+    """
+
+    def __init__(
+        self, key: str, request: dict, priority: int, deadline: float, future
+    ):
+        self.key = key
+        self.request = request
+        self.priority = priority
+        self.deadline = deadline
+        self.size = frame_bytes(request)
+        self.future = future
+        self.started = False
+
+
+class RenderScheduler:
+    """
+    Priority scheduler with backpressure and coalescing.
+
+    Use as an async context manager, or call start and close.
+    """
+
+    def __init__(
+        self,
+        render=render_request,
+        workers: int = None,
+        memory_limit: int = MEMORY_LIMIT,
+        max_pending: int = MAX_PENDING,
+        executor=None,
+    ):
+        """
+        Args:
+            render (Callable, optional): Renders a request, run in the executor.
+            workers (int, optional): Processes for batch jobs. Defaults to one
+                per core.
+            memory_limit (int, optional): The estimated bytes of running jobs.
+                A single job larger than the limit still runs alone, and
+                interactive jobs may go over it.
+            max_pending (int, optional): Queued batch jobs before submit waits.
+            executor (Executor, optional): The executor to render on. Defaults
+                to a process pool with workers + 1 processes.
+        """
+        self.render = render
+        self.workers = workers or os.cpu_count() or 1
+        self.memory_limit = memory_limit
+        self.max_pending = max_pending
+        self.executor = executor
+        self.owns_executor = executor is None
+        self.queue = []
+        self.jobs = {}
+        self.pending = 0
+        self.running = 0
+        self.memory = 0
+        self.order = count()
+        self.waiters = []
+        self.task = None
+        self.stats = {"submitted": 0, "coalesced": 0, "rendered": 0, "expired": 0}
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def start(self) -> None:
+        """Starts dispatching jobs on the running event loop."""
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers + 1)
+        self.task = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def close(self) -> None:
+        """Stops dispatching and shuts down an owned executor."""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.owns_executor and self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    async def submit(
+        self, request: dict, priority: int = BATCH, deadline: float = None
+    ):
+        """
+        Schedules a render and waits for its result.
+
+        Args:
+            request (dict): The render request.
+            priority (int, optional): Lower runs first, INTERACTIVE or BATCH.
+            deadline (float, optional): Seconds the caller is willing to wait.
+
+        Returns:
+            Any: The result of the render function.
+
+        Raises:
+            DeadlineExceeded: If the result is not ready within the deadline.
+        """
+        loop = asyncio.get_running_loop()
+        expires = inf if deadline is None else loop.time() + deadline
+        key = job_key(request)
+        self.stats["submitted"] += 1
+
+        job = self.jobs.get(key)
+        # Backpressure, interactive jobs are never held back
+        while job is None and priority > INTERACTIVE and self._saturated():
+            await self._wait()
+            job = self.jobs.get(key)
+        if job is not None:
+            self.stats["coalesced"] += 1
+            job.deadline = max(job.deadline, expires)
+            if not job.started and priority < job.priority:
+                job.priority = priority
+                self._push(job)
+        else:
+            job = RenderJob(key, request, priority, expires, loop.create_future())
+            self.jobs[key] = job
+            self.pending += 1
+            self._push(job)
+        self._notify()
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(job.future), None if deadline is None else deadline
+            )
+        except asyncio.TimeoutError as error:
+            raise DeadlineExceeded(f"render missed its {deadline}s deadline") from error
+
+    def _saturated(self) -> bool:
+        return self.pending >= self.max_pending
+
+    def _push(self, job: RenderJob) -> None:
+        entry = (job.priority, job.deadline, next(self.order), job.priority, job)
+        heapq.heappush(self.queue, entry)
+
+    async def _wait(self) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        await waiter
+
+    def _notify(self) -> None:
+        waiters, self.waiters = self.waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _next(self, now: float):
+        while self.queue:
+            _, _, _, priority, job = self.queue[0]
+            if job.started or job.future.done() or priority != job.priority:
+                heapq.heappop(self.queue)
+                continue
+            if job.deadline <= now:
+                # Every caller has given up on it
+                heapq.heappop(self.queue)
+                self._drop(job)
+                self.stats["expired"] += 1
+                continue
+            interactive = job.priority <= INTERACTIVE
+            slots = self.workers + interactive
+            # Batch jobs filling the memory budget must not hold a preview back
+            fits = not self.running or self.memory + job.size <= self.memory_limit
+            if self.running >= slots or not (fits or interactive):
+                return None
+            heapq.heappop(self.queue)
+            return job
+        return None
+
+    def _drop(self, job: RenderJob) -> None:
+        self.pending -= 1
+        del self.jobs[job.key]
+        job.future.cancel()
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = self._next(loop.time())
+            if job is None:
+                deadlines = [entry[1] for entry in self.queue if entry[1] < inf]
+                timeout = min(deadlines) - loop.time() if deadlines else None
+                try:
+                    await asyncio.wait_for(self._wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            job.started = True
+            self.pending -= 1
+            self.running += 1
+            self.memory += job.size
+            self._notify()
+            result = loop.run_in_executor(self.executor, self.render, job.request)
+            result.add_done_callback(lambda done, job=job: self._finish(job, done))
+
+    def _finish(self, job: RenderJob, done) -> None:
+        self.running -= 1
+        self.memory -= job.size
+        del self.jobs[job.key]
+        self.stats["rendered"] += 1
+        if done.cancelled():
+            job.future.cancel()
+        elif done.exception() is not None:
+            job.future.set_exception(done.exception())
+            # Callers that timed out never retrieve it
+            job.future.exception()
+        else:
+            job.future.set_result(done.result())
+        self._notify()
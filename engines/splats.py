@@ -0,0 +1,119 @@
+"""
+Module Summary: Contains the point cloud splatting renderer.
+
+Points are projected in one batch and every point covers a disc of pixels
+around its projection. Overlapping splats are resolved with a scatter max into
+the depth buffer instead of sorting the fragments: every fragment writes its
+depth with maximum.at, and the fragments whose depth survived are the visible
+ones, so only they write a color.
+
+Buffers are indexed [x, y] like ObjectImage.pixels, and larger depths are
+closer like the rasterizer's.
+
+Returns:
+    Functions:
+        splat_offsets: Returns the pixel offsets covered by a disc.
+        splat: Splats points into depth and color buffers.
+"""
+
+from numpy import (
+    arange,
+    asarray,
+    errstate,
+    float64,
+    floor,
+    int64,
+    isfinite,
+    maximum,
+    meshgrid,
+    ndarray,
+    repeat,
+)
+
+from engines.rasterizer import FRAGMENT_CHUNK
+
+
+def splat_offsets(radius: float) -> ndarray:
+    """
+    Returns the pixel offsets covered by a disc.
+
+    Args:
+        radius (float): The disc radius in pixels, 0 for single pixels.
+
+    Returns:
+        ndarray: The (K, 2) int64 (dx, dy) offsets within the radius.
+    """
+    reach = int(floor(radius))
+    steps = arange(-reach, reach + 1)
+    dx, dy = meshgrid(steps, steps, indexing="ij")
+    inside = dx * dx + dy * dy <= radius * radius
+    return asarray([dx[inside], dy[inside]], dtype=int64).T
+
+
+def splat(
+    screen: ndarray,
+    depth: ndarray,
+    color: ndarray = None,
+    colors=None,
+    radius: float = 0.0,
+    chunk: int = FRAGMENT_CHUNK,
+) -> int:
+    """
+    Splats points into depth and color buffers.
+
+    Args:
+        screen (ndarray): An (N, 4) array of homogeneous screen coordinates.
+        depth (ndarray): A contiguous (W, H) float depth buffer, updated in
+            place.
+        color (ndarray, optional): A contiguous (W, H, C) color buffer,
+            updated in place. When omitted only the depth buffer is written.
+        colors (array-like, optional): One color for every point or (N, C)
+            colors. Required with a color buffer.
+        radius (float, optional): The disc radius of every splat in pixels.
+        chunk (int, optional): The rough number of fragments per chunk.
+
+    Returns:
+        int: The number of fragments that ended up visible in their chunk.
+    """
+    if not all(
+        buffer.flags.c_contiguous for buffer in (depth, color) if buffer is not None
+    ):
+        raise ValueError("splat requires contiguous buffers")
+    screen = asarray(screen, dtype=float64)
+    width, height = depth.shape
+    flat_depth = depth.reshape(-1)
+    flat_color = None if color is None else color.reshape(width * height, -1)
+    colors = None if colors is None else asarray(colors)
+    per_point = colors is not None and colors.ndim == 2
+
+    with errstate(divide="ignore", invalid="ignore"):
+        points = screen[:, :3] / screen[:, 3:4]
+    pixel = floor(points[:, :2] + 0.5)
+    offsets = splat_offsets(radius)
+    step = max(chunk // len(offsets), 1)
+
+    written = 0
+    for start in range(0, len(points), step):
+        center = pixel[start : start + step]
+        z = points[start : start + step, 2]
+        finite = isfinite(center).all(axis=1) & isfinite(z)
+        index = arange(start, start + len(center))[finite]
+        center, z = center[finite].astype(int64), z[finite]
+
+        # Every point covers the same disc of offsets
+        x = (center[:, :1] + offsets[:, 0]).reshape(-1)
+        y = (center[:, 1:] + offsets[:, 1]).reshape(-1)
+        point = repeat(index, len(offsets))
+        z = repeat(z, len(offsets))
+        inside = ((x >= 0) & (x < width) & (y >= 0) & (y < height)).nonzero()[0]
+        key = x[inside] * height + y[inside]
+        z, point = z[inside], point[inside]
+
+        maximum.at(flat_depth, key, z)
+        visible = (z >= flat_depth[key]).nonzero()[0]
+        if flat_color is not None:
+            values = colors[point[visible]] if per_point else colors
+            flat_color[key[visible]] = values
+        written += len(visible)
+    return written
+
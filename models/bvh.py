@@ -0,0 +1,383 @@
+"""
+Module Summary: Contains a flat, array backed bounding volume hierarchy.
+
+The hierarchy is built with binned surface area heuristic splits and stored as
+plain arrays, so it can be written to the mesh cache and shipped to worker
+processes. Queries walk the tree one level at a time for every (node, ray) or
+node pair at once instead of recursing per ray.
+
+Returns:
+    Classes:
+        BVH: Bounding volume hierarchy over a set of triangles.
+    Functions:
+        mesh_bvh: Returns the cached BVH of a model, building it when missing.
+"""
+
+from numpy import (
+    arange,
+    argmin,
+    asarray,
+    bincount,
+    concatenate,
+    cumsum,
+    empty,
+    float64,
+    full,
+    inf,
+    int64,
+    lexsort,
+    maximum,
+    minimum,
+    ndarray,
+    ones,
+    repeat,
+    unique,
+    where,
+    zeros,
+)
+
+from models.geometry.rays import EPSILON, intersect, triangle_edges
+
+PAIR_CHUNK = 1 << 21
+
+
+def _area(extent: ndarray) -> ndarray:
+    extent = maximum(extent, 0)
+    return extent[..., 0] * extent[..., 1] + extent[..., 1] * extent[..., 2] + (
+        extent[..., 2] * extent[..., 0]
+    )
+
+
+class BVH:
+    """
+    Bounding volume hierarchy over a set of triangles.
+
+    Nodes are stored in flat arrays. Internal nodes reference their two
+    children, leaves reference a contiguous range of the triangle order.
+
+    Attributes:
+        triangles (ndarray): The (T, 3, 3) triangle corners.
+        lower (ndarray): The (N, 3) node bounds minimum.
+        upper (ndarray): The (N, 3) node bounds maximum.
+        left (ndarray): The (N,) left child, -1 for leaves.
+        right (ndarray): The (N,) right child, -1 for leaves.
+        start (ndarray): The (N,) first slot of a leaf in order.
+        count (ndarray): The (N,) number of triangles of a leaf, 0 for inner nodes.
+        order (ndarray): The (T,) triangle indices sorted by leaf.
+
+    Methods:
+        intersect: Closest or any hit of a batch of rays.
+        occluded: Whether each ray hits anything before t_max.
+        query_box: Triangles whose bounds overlap a box.
+        query_point: Triangles whose bounds contain a point.
+        to_arrays: Returns the node arrays for the mesh cache.
+        from_arrays: Rebuilds a BVH from cached node arrays.
+    """
+
+    ARRAYS = ("lower", "upper", "left", "right", "start", "count", "order")
+
+    def __init__(
+        self, triangles: ndarray, leaf_size: int = 4, bins: int = 16, build: bool = True
+    ) -> None:
+        self.triangles = asarray(triangles, dtype=float64).reshape(-1, 3, 3)
+        self.edges = triangle_edges(self.triangles)
+        if build:
+            self.build(leaf_size, bins)
+
+    @classmethod
+    def from_model(cls, model, faces: ndarray = None, **kwargs) -> "BVH":
+        """
+        Builds a BVH over the faces of a model.
+
+        Args:
+            model (ObjectModel): The model.
+            faces (ndarray, optional): The face array. Defaults to the model's.
+
+        Returns:
+            BVH: The hierarchy, triangle ids are face ids.
+        """
+        faces = model.face_array if faces is None else faces
+        return cls(model.vertex_array[faces[..., 0]], **kwargs)
+
+    def build(self, leaf_size: int, bins: int) -> None:
+        """Builds the hierarchy with binned SAH splits."""
+        tri_lower = self.triangles.min(axis=1)
+        tri_upper = self.triangles.max(axis=1)
+        centroids = (tri_lower + tri_upper) / 2
+        order = arange(len(self.triangles))
+
+        lower, upper, left, right, start, count = [], [], [], [], [], []
+        stack = [(0, len(order), -1, 0)] if len(order) else []
+        while stack:
+            begin, end, parent, side = stack.pop()
+            node = len(lower)
+            if parent >= 0:
+                (left if side == 0 else right)[parent] = node
+            ids = order[begin:end]
+            lo, hi = tri_lower[ids].min(axis=0), tri_upper[ids].max(axis=0)
+            lower.append(lo)
+            upper.append(hi)
+            left.append(-1)
+            right.append(-1)
+            start.append(begin)
+            count.append(end - begin)
+
+            split = self._split(centroids[ids], tri_lower[ids], tri_upper[ids], bins)
+            if end - begin <= leaf_size and (
+                split is None or split[1] >= (end - begin) * _area(hi - lo)
+            ):
+                continue
+            if split is None:
+                # Identical centroids, split by index to bound the leaf size
+                mask = arange(end - begin) < (end - begin) // 2
+            else:
+                mask = split[0]
+            order[begin:end] = concatenate((ids[mask], ids[~mask]))
+            middle = begin + int(mask.sum())
+            count[node] = 0
+            stack.append((middle, end, node, 1))
+            stack.append((begin, middle, node, 0))
+
+        self.lower = asarray(lower, dtype=float64).reshape(-1, 3)
+        self.upper = asarray(upper, dtype=float64).reshape(-1, 3)
+        self.left = asarray(left, dtype=int64)
+        self.right = asarray(right, dtype=int64)
+        self.start = asarray(start, dtype=int64)
+        self.count = asarray(count, dtype=int64)
+        self.order = order
+
+    @staticmethod
+    def _split(centroids, tri_lower, tri_upper, bins):
+        lo, hi = centroids.min(axis=0), centroids.max(axis=0)
+        axis = int((hi - lo).argmax())
+        if hi[axis] - lo[axis] <= EPSILON:
+            return None
+        slot = minimum(
+            ((centroids[:, axis] - lo[axis]) * (bins / (hi[axis] - lo[axis]))).astype(int64),
+            bins - 1,
+        )
+        bin_lower = full((bins, 3), inf)
+        bin_upper = full((bins, 3), -inf)
+        minimum.at(bin_lower, slot, tri_lower)
+        maximum.at(bin_upper, slot, tri_upper)
+        bin_count = bincount(slot, minlength=bins)
+
+        left_count = cumsum(bin_count)[:-1]
+        right_count = cumsum(bin_count[::-1])[::-1][1:]
+        left_area = _area(
+            maximum.accumulate(bin_upper)[:-1] - minimum.accumulate(bin_lower)[:-1]
+        )
+        right_area = _area(
+            maximum.accumulate(bin_upper[::-1])[::-1][1:]
+            - minimum.accumulate(bin_lower[::-1])[::-1][1:]
+        )
+        cost = where(
+            (left_count > 0) & (right_count > 0),
+            left_area * left_count + right_area * right_count,
+            inf,
+        )
+        best = int(argmin(cost))
+        if cost[best] == inf:
+            return None
+        return slot <= best, cost[best]
+
+    def to_arrays(self) -> dict:
+        """
+        Returns the node arrays for the mesh cache.
+
+        Returns:
+            dict[str, ndarray]: The arrays keyed as bvh_<name>.
+        """
+        return {f"bvh_{name}": getattr(self, name) for name in self.ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, triangles: ndarray, arrays: dict) -> "BVH":
+        """
+        Rebuilds a BVH from cached node arrays.
+
+        Args:
+            triangles (ndarray): The (T, 3, 3) triangle corners.
+            arrays (dict[str, ndarray]): Arrays as returned by to_arrays.
+
+        Returns:
+            BVH: The hierarchy.
+        """
+        bvh = cls(triangles, build=False)
+        for name in cls.ARRAYS:
+            setattr(bvh, name, asarray(arrays[f"bvh_{name}"]))
+        return bvh
+
+    def _slabs(self, nodes, origins, inverse):
+        t0 = (self.lower[nodes] - origins) * inverse
+        t1 = (self.upper[nodes] - origins) * inverse
+        near = minimum(t0, t1).max(axis=1)
+        far = maximum(t0, t1).min(axis=1)
+        return near, far
+
+    def intersect(
+        self,
+        origins: ndarray,
+        directions: ndarray,
+        t_max: float = inf,
+        any_hit: bool = False,
+    ) -> tuple[ndarray, ndarray, ndarray, ndarray]:
+        """
+        Closest or any hit of a batch of rays.
+
+        Args:
+            origins (ndarray): An (R, 3) array of ray origins.
+            directions (ndarray): An (R, 3) array of ray directions.
+            t_max (float, optional): The farthest accepted distance.
+            any_hit (bool, optional): Stop each ray at its first hit found
+                instead of the closest. Defaults to False.
+
+        Returns:
+            tuple[ndarray, ndarray, ndarray, ndarray]: The (R,) hit distances
+            (inf on a miss), triangle ids (-1 on a miss) and u, v barycentric
+            coordinates of the hits.
+        """
+        origins = asarray(origins, dtype=float64).reshape(-1, 3)
+        directions = asarray(directions, dtype=float64).reshape(-1, 3)
+        rays = len(origins)
+        best = full(rays, float(t_max))
+        tri = full(rays, -1, dtype=int64)
+        hit_u, hit_v = zeros(rays), zeros(rays)
+        if not len(self.lower) or not rays:
+            return where(tri >= 0, best, inf), tri, hit_u, hit_v
+
+        with_zeros = where(directions == 0, EPSILON, directions)
+        inverse = 1.0 / with_zeros
+        pair_node = zeros(rays, dtype=int64)
+        pair_ray = arange(rays)
+        while len(pair_node):
+            near, far = self._slabs(pair_node, origins[pair_ray], inverse[pair_ray])
+            keep = (near <= far) & (far >= 0) & (near < best[pair_ray])
+            if any_hit:
+                keep &= tri[pair_ray] < 0
+            pair_node, pair_ray = pair_node[keep], pair_ray[keep]
+
+            leaf = self.count[pair_node] > 0
+            self._leaf_hits(
+                pair_node[leaf], pair_ray[leaf], origins, directions, best, tri, hit_u, hit_v
+            )
+            inner_node, inner_ray = pair_node[~leaf], pair_ray[~leaf]
+            pair_node = concatenate((self.left[inner_node], self.right[inner_node]))
+            pair_ray = concatenate((inner_ray, inner_ray))
+        return where(tri >= 0, best, inf), tri, hit_u, hit_v
+
+    def _leaf_hits(self, nodes, rays, origins, directions, best, tri, hit_u, hit_v):
+        counts = self.count[nodes]
+        step = max(1, PAIR_CHUNK // max(1, counts.max(initial=1)))
+        for begin in range(0, len(nodes), step):
+            chunk_nodes = nodes[begin : begin + step]
+            chunk_rays = rays[begin : begin + step]
+            chunk_counts = counts[begin : begin + step]
+            ray = repeat(chunk_rays, chunk_counts)
+            local = arange(chunk_counts.sum()) - repeat(
+                cumsum(chunk_counts) - chunk_counts, chunk_counts
+            )
+            ids = self.order[repeat(self.start[chunk_nodes], chunk_counts) + local]
+            t, u, v = intersect(
+                origins[ray],
+                directions[ray],
+                self.edges[0][ids],
+                self.edges[1][ids],
+                self.edges[2][ids],
+                t_max=inf,
+            )
+            hit = t < best[ray]
+            ray, ids, t, u, v = ray[hit], ids[hit], t[hit], u[hit], v[hit]
+            if not len(ray):
+                continue
+            # Keep the closest of the new hits per ray
+            order = lexsort((t, ray))
+            first = ones(len(order), dtype=bool)
+            first[1:] = ray[order][1:] != ray[order][:-1]
+            order = order[first]
+            ray = ray[order]
+            best[ray], tri[ray], hit_u[ray], hit_v[ray] = t[order], ids[order], u[order], v[order]
+
+    def occluded(self, origins: ndarray, directions: ndarray, t_max: float = inf) -> ndarray:
+        """
+        Whether each ray hits anything before t_max.
+
+        Args:
+            origins (ndarray): An (R, 3) array of ray origins.
+            directions (ndarray): An (R, 3) array of ray directions.
+            t_max (float, optional): The farthest accepted distance.
+
+        Returns:
+            ndarray: An (R,) boolean array.
+        """
+        return self.intersect(origins, directions, t_max, any_hit=True)[1] >= 0
+
+    def query_box(self, lower, upper) -> ndarray:
+        """
+        Triangles whose bounds overlap a box.
+
+        Args:
+            lower (Sequence[float]): The box minimum.
+            upper (Sequence[float]): The box maximum.
+
+        Returns:
+            ndarray: The sorted triangle ids.
+        """
+        lower, upper = asarray(lower, dtype=float64), asarray(upper, dtype=float64)
+        found = []
+        nodes = zeros(1 if len(self.lower) else 0, dtype=int64)
+        while len(nodes):
+            overlap = ((self.lower[nodes] <= upper) & (self.upper[nodes] >= lower)).all(axis=1)
+            nodes = nodes[overlap]
+            leaves = nodes[self.count[nodes] > 0]
+            if len(leaves):
+                counts = self.count[leaves]
+                local = arange(counts.sum()) - repeat(cumsum(counts) - counts, counts)
+                found.append(self.order[repeat(self.start[leaves], counts) + local])
+            inner = nodes[self.count[nodes] == 0]
+            nodes = concatenate((self.left[inner], self.right[inner]))
+        if not found:
+            return empty(0, dtype=int64)
+        ids = concatenate(found)
+        corners = self.triangles[ids]
+        overlap = ((corners.min(axis=1) <= upper) & (corners.max(axis=1) >= lower)).all(axis=1)
+        return unique(ids[overlap])
+
+    def query_point(self, point) -> ndarray:
+        """
+        Triangles whose bounds contain a point.
+
+        Args:
+            point (Sequence[float]): The point.
+
+        Returns:
+            ndarray: The sorted triangle ids.
+        """
+        return self.query_box(point, point)
+
+
+def mesh_bvh(model, faces: ndarray = None) -> BVH:
+    """
+    Returns the cached BVH of a model, building it when missing.
+
+    The node arrays are stored in the model's mesh cache and the hierarchy is
+    set as model.bvh.
+
+    Args:
+        model (ObjectModel): The model.
+        faces (ndarray, optional): The face array. Defaults to the model's.
+
+    Returns:
+        BVH: The hierarchy over the model's faces.
+    """
+    faces = model.face_array if faces is None else faces
+    triangles = model.vertex_array[faces[..., 0]]
+    cache = getattr(model, "cache", None)
+    order = cache.get("bvh_order") if cache is not None else None
+    if order is not None and len(order) == len(triangles) and faces is model.face_array:
+        bvh = BVH.from_arrays(triangles, cache.arrays)
+    else:
+        bvh = BVH(triangles)
+        if cache is not None and faces is model.face_array:
+            cache.put(**bvh.to_arrays())
+    model.bvh = bvh
+    return bvh
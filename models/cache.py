@@ -0,0 +1,308 @@
+"""
+Module Summary: Contains the on disk array cache kept next to a mesh file.
+
+Derived per mesh data (baked occlusion, detail levels, spatial indices, ...) is
+stored as named arrays in a single .npz file beside the source. The cache is
+tied to the size and modification time of the source and is dropped as soon
+as the source changes.
+
+Finished renders are cached by content: the key hashes the mesh arrays, the
+shader state including its textures, the camera, light and resolution, so an
+identical request is answered from disk whichever file or process it came from.
+
+Returns:
+    Functions:
+        render_key: Returns the content hash of a render.
+    Classes:
+        MeshCache: Named array cache for a single mesh file.
+        RenderCache: Size bounded LRU cache of finished render buffers.
+"""
+
+import threading
+from hashlib import sha256
+from os import fdopen, makedirs, remove, replace, scandir, stat, utime
+from os.path import dirname, exists, join
+from tempfile import mkstemp
+from zipfile import BadZipFile
+
+from numpy import array, ascontiguousarray, load, ndarray, savez
+
+RENDER_CACHE_BYTES = 1 << 28
+
+MODEL_ARRAYS = (
+    "vertex_array",
+    "normal_array",
+    "uv_array",
+    "face_array",
+    "occlusion_array",
+)
+
+
+def _save_atomic(path: str, **arrays) -> None:
+    """Saves arrays to an .npz file through a temporary file unique to the call."""
+    handle, temp = mkstemp(suffix=".tmp", dir=dirname(path) or ".")
+    try:
+        with fdopen(handle, "wb") as file:
+            savez(file, **arrays)
+        replace(temp, path)
+    except BaseException:
+        remove(temp)
+        raise
+
+
+class MeshCache:
+    """
+    Named array cache for a single mesh file.
+
+    Attributes:
+        filename (str): The source mesh file.
+        path (str): The cache file, filename + ".cache.npz".
+        arrays (dict[str, ndarray]): The cached arrays.
+
+    Methods:
+        get: Returns a cached array or None.
+        put: Stores one or more arrays and writes the cache file.
+        clear: Drops every cached array.
+    """
+
+    SUFFIX = ".cache.npz"
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.path = filename + self.SUFFIX
+        self.arrays = {}
+        self.signature = self.source_signature()
+        self.read()
+
+    def source_signature(self):
+        """Returns the size and modification time of the source file."""
+        try:
+            info = stat(self.filename)
+        except FileNotFoundError:
+            return array([0, 0])
+        return array([info.st_size, info.st_mtime_ns])
+
+    def read(self) -> None:
+        """Loads the cache file if it matches the current source."""
+        if not exists(self.path):
+            return
+        try:
+            with load(self.path) as data:
+                arrays = {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            return
+        signature = arrays.pop("__signature__", None)
+        if signature is not None and (signature == self.signature).all():
+            self.arrays = arrays
+
+    def write(self) -> None:
+        """Writes the cache file atomically."""
+        _save_atomic(self.path, __signature__=self.signature, **self.arrays)
+
+    def get(self, name: str):
+        """
+        Returns a cached array or None.
+
+        Args:
+            name (str): The array name.
+
+        Returns:
+            ndarray | None: The cached array.
+        """
+        return self.arrays.get(name)
+
+    def put(self, **arrays) -> None:
+        """
+        Stores one or more arrays and writes the cache file.
+
+        Args:
+            **arrays (ndarray): The arrays to store by name.
+        """
+        self.arrays.update(arrays)
+        self.write()
+
+    def clear(self) -> None:
+        """Drops every cached array."""
+        self.arrays = {}
+        self.write()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.arrays
+
+
+def _digest(hasher, value) -> None:
+    """Feeds a value into a hash, recursing into containers and shaders."""
+    if isinstance(value, ndarray):
+        hasher.update(f"array{value.dtype.str}{value.shape}".encode())
+        hasher.update(ascontiguousarray(value).data)
+    elif isinstance(value, dict):
+        hasher.update(b"dict")
+        for name in sorted(value):
+            hasher.update(str(name).encode())
+            _digest(hasher, value[name])
+    elif isinstance(value, (list, tuple)):
+        hasher.update(f"seq{len(value)}".encode())
+        for item in value:
+            _digest(hasher, item)
+    elif hasattr(value, "__dict__"):
+        # Shader state, the model and the camera matrices are keyed separately
+        # and the per frame state a shader declares is scratch space
+        skip = ("model",) + tuple(getattr(value, "frame_state", ()))
+        hasher.update(type(value).__qualname__.encode())
+        _digest(
+            hasher,
+            {
+                name: item
+                for name, item in vars(value).items()
+                if name not in skip and not name.endswith("_matrix")
+            },
+        )
+    else:
+        hasher.update(repr(value).encode())
+
+
+def render_key(model, shader, **settings) -> str:
+    """
+    Returns the content hash of a render.
+
+    Args:
+        model (ObjectModel): The rendered model, hashed by its mesh arrays.
+        shader (IBatchShader): The shader, hashed by its class and state, which
+            includes the textures and vertex buffers it samples.
+        **settings: Camera, light, resolution and render flags.
+
+    Returns:
+        str: The hex digest identifying the render.
+    """
+    hasher = sha256()
+    _digest(hasher, [getattr(model, name, None) for name in MODEL_ARRAYS])
+    _digest(hasher, shader)
+    _digest(hasher, settings)
+    return hasher.hexdigest()
+
+
+class RenderCache:
+    """
+    Size bounded LRU cache of finished render buffers.
+
+    Every entry is an .npz file named by its render key. Reading an entry
+    touches its modification time, and the least recently used entries are
+    removed once the folder grows beyond max_bytes.
+
+    Attributes:
+        folder (str): The cache folder.
+        max_bytes (int): The size the entries are trimmed to.
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that found no entry.
+        evictions (int): Entries removed to stay within max_bytes.
+
+    Methods:
+        get: Returns the cached arrays of a key or None.
+        put: Stores the arrays of a key and evicts old entries.
+        stats: Returns the hit, miss and size statistics.
+        clear: Removes every entry.
+    """
+
+    SUFFIX = ".npz"
+
+    def __init__(self, folder: str, max_bytes: int = RENDER_CACHE_BYTES) -> None:
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        makedirs(folder, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return join(self.folder, key + self.SUFFIX)
+
+    def entries(self) -> list:
+        """Returns the cache files, least recently used first."""
+        files = [
+            entry
+            for entry in scandir(self.folder)
+            if entry.is_file() and entry.name.endswith(self.SUFFIX)
+        ]
+        return sorted(files, key=lambda entry: entry.stat().st_mtime_ns)
+
+    def get(self, key: str):
+        """
+        Returns the cached arrays of a key or None.
+
+        Args:
+            key (str): The render key.
+
+        Returns:
+            dict[str, ndarray] | None: The stored arrays.
+        """
+        path = self.path(key)
+        try:
+            with load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+            utime(path)
+        except FileNotFoundError:
+            arrays = None
+        except (OSError, ValueError, BadZipFile):
+            # A truncated entry is dropped and rendered again
+            arrays = None
+            try:
+                remove(path)
+            except OSError:
+                pass
+        with self.lock:
+            if arrays is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return arrays
+
+    def put(self, key: str, **arrays) -> None:
+        """
+        Stores the arrays of a key and evicts old entries.
+
+        Args:
+            key (str): The render key.
+            **arrays (ndarray): The buffers to store by name.
+        """
+        _save_atomic(self.path(key), **arrays)
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used entries beyond max_bytes."""
+        sizes = [(entry.path, entry.stat().st_size) for entry in self.entries()]
+        total = sum(size for _, size in sizes)
+        for path, size in sizes:
+            if total <= self.max_bytes:
+                break
+            try:
+                remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            with self.lock:
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        """
+        Returns the hit, miss and size statistics.
+
+        Returns:
+            dict: The hits, misses, evictions, entries and bytes.
+        """
+        entries = self.entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(entry.stat().st_size for entry in entries),
+        }
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        for entry in self.entries():
+            remove(entry.path)
+
+    def __contains__(self, key: str) -> bool:
+        return exists(self.path(key))
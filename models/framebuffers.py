@@ -0,0 +1,130 @@
+"""
+Module Summary: Contains a pool of reusable render buffers.
+
+Rendering a sequence of frames allocates the same color, depth and face id
+buffers over and over. The pool keeps released buffers by shape and dtype and
+hands them out again cleared with a single fill, so memory stays flat across
+long renders instead of churning through the allocator every frame.
+
+Returns:
+    Classes:
+        FramebufferPool: Thread safe free lists of buffers by shape and dtype.
+"""
+
+import threading
+from contextlib import contextmanager
+
+from numpy import dtype as as_dtype, empty, ndarray
+
+POOL_DEPTH = 4
+
+
+class FramebufferPool:
+    """
+    Thread safe free lists of buffers by shape and dtype.
+
+    Attributes:
+        depth (int): The number of free buffers kept per shape and dtype.
+            Buffers released beyond it are left to the garbage collector.
+        allocations (int): Buffers that had to be allocated.
+        reuses (int): Buffers handed out again from a free list.
+
+    Methods:
+        acquire: Returns a cleared buffer, reusing a released one if possible.
+        release: Returns a buffer to its free list.
+        frame: Context manager acquiring a buffer and releasing it on exit.
+        stats: Returns the allocation, reuse and size statistics.
+        clear: Drops every free buffer.
+    """
+
+    def __init__(self, depth: int = POOL_DEPTH) -> None:
+        self.depth = depth
+        self.free = {}
+        self.allocations = 0
+        self.reuses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(shape, dtype) -> tuple:
+        return tuple(shape), as_dtype(dtype).str
+
+    def acquire(self, shape, dtype, fill=0) -> ndarray:
+        """
+        Returns a cleared buffer, reusing a released one if possible.
+
+        Args:
+            shape (tuple[int, ...]): The buffer shape, e.g. (W, H, 4).
+            dtype (type): The buffer dtype.
+            fill (scalar, optional): The value every element is set to, or None
+                to hand the buffer out with whatever it held.
+
+        Returns:
+            ndarray: A C contiguous buffer owned by the caller until released.
+        """
+        with self.lock:
+            free = self.free.get(self.key(shape, dtype))
+            buffer = free.pop() if free else None
+            if buffer is None:
+                self.allocations += 1
+            else:
+                self.reuses += 1
+        if buffer is None:
+            buffer = empty(shape, dtype=dtype)
+        if fill is not None:
+            buffer.fill(fill)
+        return buffer
+
+    def release(self, buffer: ndarray) -> None:
+        """
+        Returns a buffer to its free list.
+
+        Args:
+            buffer (ndarray): A buffer handed out by acquire. It must not be
+                used by the caller afterwards.
+
+        Raises:
+            ValueError: If the buffer is a view or already released.
+        """
+        if buffer.base is not None or not buffer.flags.c_contiguous:
+            raise ValueError("only whole buffers can be returned to the pool")
+        with self.lock:
+            free = self.free.setdefault(self.key(buffer.shape, buffer.dtype), [])
+            if any(item is buffer for item in free):
+                raise ValueError("buffer was already returned to the pool")
+            if len(free) < self.depth:
+                free.append(buffer)
+
+    @contextmanager
+    def frame(self, shape, dtype, fill=0):
+        """
+        Context manager acquiring a buffer and releasing it on exit.
+
+        Args:
+            shape (tuple[int, ...]): The buffer shape.
+            dtype (type): The buffer dtype.
+            fill (scalar, optional): See acquire.
+
+        Yields:
+            ndarray: The buffer.
+        """
+        buffer = self.acquire(shape, dtype, fill)
+        try:
+            yield buffer
+        finally:
+            self.release(buffer)
+
+    def stats(self) -> dict:
+        """Returns the allocation, reuse and size statistics."""
+        with self.lock:
+            buffers = [item for free in self.free.values() for item in free]
+            return {
+                "allocations": self.allocations,
+                "reuses": self.reuses,
+                "free": len(buffers),
+                "bytes": sum(item.nbytes for item in buffers),
+            }
+
+    def clear(self) -> None:
+        """Drops every free buffer."""
+        with self.lock:
+            self.free = {}
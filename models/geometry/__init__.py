@@ -0,0 +1,74 @@
+"""
+Module Summary: Contains the fixed function camera and screen transforms.
+
+lookat, viewport and projection set the module level ModelView, Viewport and
+Projection matrices used by the per face renderer. The array based versions
+for whole vertex buffers live in models.geometry.transforms.
+
+Returns:
+    Functions:
+        cross: Calculates the cross product of two vectors.
+        proj: Drops the trailing components of a vector.
+        lookat: Sets ModelView for a camera.
+        viewport: Sets Viewport for a screen rectangle.
+        projection: Sets Projection for a perspective coefficient.
+        barycentric: Calculates the barycentric coordinates of a point.
+"""
+
+from numpy import eye
+
+from models.geometry.vectors_2d import Vector2
+from models.geometry.vectors_3d import Vector3
+
+ModelView = eye(4)
+Viewport = eye(4)
+Projection = eye(4)
+
+
+def cross(v1, v2):
+    return Vector3(
+        v1.y * v2.z - v1.z * v2.y, v1.z * v2.x - v1.x * v2.z, v1.x * v2.y - v1.y * v2.x
+    )
+
+
+def proj(dim, v):
+    return Vector2(v[0], v[1]) if dim == 2 else Vector3(v[0], v[1], v[2])
+
+
+def lookat(eye_pos, center, up):
+    global ModelView
+    z = (eye_pos - center).normalize()
+    x = cross(up, z).normalize()
+    y = cross(z, x).normalize()
+
+    ModelView = eye(4)
+    for i in range(3):
+        ModelView[0, i] = x[i]
+        ModelView[1, i] = y[i]
+        ModelView[2, i] = z[i]
+        ModelView[i, 3] = -center[i]
+
+
+def viewport(x, y, w, h):
+    global Viewport
+    Viewport = eye(4)
+    Viewport[0, 3] = x + w / 2
+    Viewport[1, 3] = y + h / 2
+    Viewport[2, 3] = 255 / 2
+    Viewport[0, 0] = w / 2
+    Viewport[1, 1] = h / 2
+    Viewport[2, 2] = 255 / 2
+
+
+def projection(coeff):
+    global Projection
+    Projection = eye(4)
+    Projection[3, 2] = coeff
+
+
+def barycentric(A, B, C, P):
+    s = [Vector3(C[i] - A[i], B[i] - A[i], A[i] - P[i]) for i in range(2)]
+    u = cross(s[0], s[1])
+    if abs(u[2]) > 1e-2:
+        return Vector3(1 - (u.x + u.y) / u.z, u.y / u.z, u.x / u.z)
+    return Vector3(-1, 1, 1)
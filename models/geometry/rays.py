@@ -0,0 +1,117 @@
+"""
+Module Summary: Contains batched ray and triangle helpers.
+
+Returns:
+    Functions:
+        triangle_edges: Precomputes the origin corner and edges of triangles.
+        intersect: Möller-Trumbore intersection of rays against triangles.
+        hemisphere: Cosine weighted directions around a set of normals.
+"""
+
+from numpy import (
+    abs as np_abs,
+    arange,
+    cos,
+    cross,
+    einsum,
+    inf,
+    ndarray,
+    newaxis,
+    pi,
+    sin,
+    sqrt,
+    stack,
+    where,
+)
+from numpy.random import default_rng
+
+EPSILON = 1e-9
+
+
+def triangle_edges(triangles: ndarray) -> tuple[ndarray, ndarray, ndarray]:
+    """
+    Precomputes the origin corner and edges of triangles.
+
+    Args:
+        triangles (ndarray): An (T, 3, 3) array of triangle corners.
+
+    Returns:
+        tuple[ndarray, ndarray, ndarray]: The first corners and the two edges
+        leaving them, each (T, 3).
+    """
+    return (
+        triangles[:, 0],
+        triangles[:, 1] - triangles[:, 0],
+        triangles[:, 2] - triangles[:, 0],
+    )
+
+
+def intersect(
+    origins: ndarray,
+    directions: ndarray,
+    v0: ndarray,
+    e1: ndarray,
+    e2: ndarray,
+    t_min: float = EPSILON,
+    t_max: float = inf,
+) -> tuple[ndarray, ndarray, ndarray]:
+    """
+    Möller-Trumbore intersection of rays against triangles.
+
+    Rays and triangles are broadcast against each other, so (R, 1, 3) rays and
+    (T, 3) triangles give (R, T) results.
+
+    Args:
+        origins (ndarray): Ray origins.
+        directions (ndarray): Ray directions.
+        v0 (ndarray): Triangle first corners.
+        e1 (ndarray): Triangle edges from the first to the second corner.
+        e2 (ndarray): Triangle edges from the first to the third corner.
+        t_min (float, optional): The closest accepted distance.
+        t_max (float, optional): The farthest accepted distance.
+
+    Returns:
+        tuple[ndarray, ndarray, ndarray]: The hit distances (inf on a miss) and
+        the u and v barycentric coordinates of the hits.
+    """
+    p = cross(directions, e2)
+    det = einsum("...i,...i->...", e1, p)
+    ok = np_abs(det) > EPSILON
+    inv = 1.0 / where(ok, det, 1.0)
+    s = origins - v0
+    u = einsum("...i,...i->...", s, p) * inv
+    q = cross(s, e1)
+    v = einsum("...i,...i->...", directions, q) * inv
+    t = einsum("...i,...i->...", e2, q) * inv
+    hit = ok & (u >= 0) & (v >= 0) & (u + v <= 1) & (t > t_min) & (t < t_max)
+    return where(hit, t, inf), u, v
+
+
+def hemisphere(normals: ndarray, samples: int, seed: int = 0) -> ndarray:
+    """
+    Cosine weighted directions around a set of normals.
+
+    The same stratified sample pattern is rotated onto every normal.
+
+    Args:
+        normals (ndarray): An (N, 3) array of unit normals.
+        samples (int): The number of directions per normal.
+        seed (int, optional): The random seed for the jitter. Defaults to 0.
+
+    Returns:
+        ndarray: An (N, samples, 3) array of unit directions.
+    """
+    rng = default_rng(seed)
+    r1 = (arange(samples) + rng.random(samples)) / samples
+    r2 = rng.random(samples)
+    radius = sqrt(r1)
+    local = stack(
+        (radius * cos(2 * pi * r2), radius * sin(2 * pi * r2), sqrt(1 - r1)), axis=1
+    )
+
+    helper = where(np_abs(normals[:, :1]) > 0.9, [[0.0, 1.0, 0.0]], [[1.0, 0.0, 0.0]])
+    tangent = cross(helper, normals)
+    tangent /= sqrt(einsum("ij,ij->i", tangent, tangent))[:, newaxis]
+    bitangent = cross(normals, tangent)
+    basis = stack((tangent, bitangent, normals), axis=1)
+    return einsum("sk,nkj->nsj", local, basis)
@@ -0,0 +1,140 @@
+"""
+Module Summary: Contains array based camera and screen transforms.
+
+These mirror lookat, viewport and projection from the geometry module but
+return the matrices as NumPy arrays instead of mutating module globals, so
+they can be applied to whole vertex buffers at once.
+
+Returns:
+    Functions:
+        as_vector: Converts a Vector3 or sequence into a float array.
+        lookat: Builds the model view matrix for a camera.
+        viewport: Builds the viewport matrix for a screen rectangle.
+        projection: Builds the perspective projection matrix.
+        camera_matrices: Builds all three matrices for a camera and image size.
+        transform: Applies a 4x4 matrix to an array of 3D points.
+"""
+
+from numpy import asarray, cross, eye, float64, hstack, ndarray, ones
+from numpy.linalg import norm
+
+
+def as_vector(v, dim: int = 3) -> ndarray:
+    """
+    Converts a Vector3 or sequence into a float array.
+
+    Args:
+        v (Vector3 | Sequence[float]): The vector to convert.
+        dim (int, optional): The number of components. Defaults to 3.
+
+    Returns:
+        ndarray: The vector components as float64.
+    """
+    if hasattr(v, "x"):
+        v = [getattr(v, name) for name in "xyzw"[:dim]]
+    return asarray(v, dtype=float64)[:dim]
+
+
+def _normalize(v: ndarray) -> ndarray:
+    length = norm(v)
+    return v / length if length else v
+
+
+def lookat(eye_pos, center, up) -> ndarray:
+    """
+    Builds the model view matrix for a camera.
+
+    Args:
+        eye_pos (Vector3): The camera position.
+        center (Vector3): The point the camera looks at.
+        up (Vector3): The camera up direction.
+
+    Returns:
+        ndarray: A 4x4 model view matrix.
+    """
+    eye_pos, center, up = as_vector(eye_pos), as_vector(center), as_vector(up)
+    z = _normalize(eye_pos - center)
+    x = _normalize(cross(up, z))
+    y = _normalize(cross(z, x))
+
+    model_view = eye(4)
+    model_view[0, :3] = x
+    model_view[1, :3] = y
+    model_view[2, :3] = z
+    model_view[:3, 3] = -center
+    return model_view
+
+
+def viewport(x: float, y: float, w: float, h: float, depth: float = 255) -> ndarray:
+    """
+    Builds the viewport matrix for a screen rectangle.
+
+    Args:
+        x (float): The left edge of the viewport.
+        y (float): The bottom edge of the viewport.
+        w (float): The viewport width.
+        h (float): The viewport height.
+        depth (float, optional): The depth range. Defaults to 255.
+
+    Returns:
+        ndarray: A 4x4 viewport matrix.
+    """
+    matrix = eye(4)
+    matrix[0, 3] = x + w / 2
+    matrix[1, 3] = y + h / 2
+    matrix[2, 3] = depth / 2
+    matrix[0, 0] = w / 2
+    matrix[1, 1] = h / 2
+    matrix[2, 2] = depth / 2
+    return matrix
+
+
+def projection(coeff: float) -> ndarray:
+    """
+    Builds the perspective projection matrix.
+
+    Args:
+        coeff (float): The perspective coefficient, usually -1 / camera distance.
+
+    Returns:
+        ndarray: A 4x4 projection matrix.
+    """
+    matrix = eye(4)
+    matrix[3, 2] = coeff
+    return matrix
+
+
+def camera_matrices(camera, width: int, height: int) -> tuple[ndarray, ndarray, ndarray]:
+    """
+    Builds all three matrices for a camera and image size.
+
+    Args:
+        camera (ObjectCamera): The camera with eye, center and up vectors.
+        width (int): The image width.
+        height (int): The image height.
+
+    Returns:
+        tuple[ndarray, ndarray, ndarray]: The model view, projection and
+        viewport matrices.
+    """
+    distance = norm(as_vector(camera.eye) - as_vector(camera.center))
+    return (
+        lookat(camera.eye, camera.center, camera.up),
+        projection(-1 / distance if distance else 0.0),
+        viewport(width // 8, height // 8, width * 3 // 4, height * 3 // 4),
+    )
+
+
+def transform(matrix: ndarray, points: ndarray) -> ndarray:
+    """
+    Applies a 4x4 matrix to an array of 3D points.
+
+    Args:
+        matrix (ndarray): The 4x4 transform.
+        points (ndarray): An (N, 3) array of points.
+
+    Returns:
+        ndarray: An (N, 4) array of homogeneous coordinates.
+    """
+    points = asarray(points, dtype=float64).reshape(-1, 3)
+    return hstack((points, ones((len(points), 1)))) @ matrix.T
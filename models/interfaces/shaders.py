@@ -17,4 +17,40 @@ class IShader:
 
     def viewport_projection(self, vertex):
         gl_vertex = self.viewport_matrix @ self.projection_matrix @ self.model_view_matrix @ vertex
-        return gl_vertex
\ No newline at end of file
+        return gl_vertex
+
+
+class IBatchShader:
+    """
+    Shader interface that works on arrays of faces and fragments.
+
+    The vertex stage transforms every corner of a batch of faces at once and
+    the fragment stage shades a batch of fragments given their face ids and
+    barycentric coordinates. Attributes named in frame_state only hold
+    results of the current frame and are left out of render keys.
+    """
+
+    frame_state = ()
+
+    def __init__(self, model, light_dir):
+        self.model = model
+        self.light_dir = light_dir
+        self.model_view_matrix = None
+        self.projection_matrix = None
+        self.viewport_matrix = None
+
+    def set_matrices(self, model_view, projection, viewport):
+        self.model_view_matrix = model_view
+        self.projection_matrix = projection
+        self.viewport_matrix = viewport
+
+    def set_camera(self, camera):
+        """Receive the camera of a render before its vertex stage."""
+
+    def vertex(self, faces):
+        """Return the (F, 3, 4) screen coordinates for the given face ids."""
+        raise NotImplementedError
+
+    def fragment(self, faces, bar):
+        """Return (K, 4) uint8 colors and a (K,) discard mask for the fragments."""
+        raise NotImplementedError
@@ -95,6 +95,16 @@ class Vector:
         """
         return self.length() <= other.length()
 
+    def __getitem__(self, index: int) -> Union[IndexError, int, float]:
+        """Get the value at the specified index."""
+        return self._get_component(index)
+
+    def __setitem__(
+        self, index: int, value: Union[int, float, "Vector"]
+    ) -> Union[None, IndexError]:
+        """Set the value at the specified index."""
+        return self._set_component(index, value)
+
     def _get_component(self, index: int) -> Union[IndexError, int, float]:
         """Get the value at the specified index."""
         if 0 <= index < len(self.__dict__):
@@ -0,0 +1,248 @@
+"""
+Module Summary: Contains quadric error mesh decimation and level of detail selection.
+
+Meshes are decimated with quadric error metrics using vertex pair collapses
+onto one of the two endpoints. Every round evaluates all edges at once and
+collapses a vertex disjoint set of the cheapest ones, so the work is done in
+array operations rather than one collapse at a time. Since collapses keep
+existing vertices, a level is just a face array over the original vertex,
+uv and normal arrays and shaders can render any level unchanged.
+
+Returns:
+    Functions:
+        face_quadrics: Computes the area weighted plane quadric of every face.
+        boundary_quadrics: Computes penalty quadrics that keep open borders in place.
+        decimate: Decimates a face array down to a target face count.
+        detail_levels: Returns the cached detail levels of a model, building
+        them when missing.
+        screen_size: Returns the projected pixel size of a set of points.
+        select_level: Picks the coarsest level fine enough for a screen size.
+"""
+
+from numpy import (
+    add,
+    arange,
+    argsort,
+    asarray,
+    concatenate,
+    cross,
+    einsum,
+    full,
+    hstack,
+    inf,
+    int64,
+    minimum,
+    ndarray,
+    ones,
+    sort,
+    unique,
+    where,
+    zeros,
+)
+from numpy.linalg import norm
+
+from models.geometry.transforms import transform
+
+LEVEL_RATIOS = (0.5, 0.25, 0.1)
+BOUNDARY_WEIGHT = 1000.0
+
+
+def face_quadrics(vertices: ndarray, triangles: ndarray) -> ndarray:
+    """
+    Computes the area weighted plane quadric of every face.
+
+    Args:
+        vertices (ndarray): An (V, 3) array of positions.
+        triangles (ndarray): An (F, 3) array of vertex indices.
+
+    Returns:
+        ndarray: An (F, 4, 4) array of quadrics.
+    """
+    corners = vertices[triangles]
+    normals = cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    area = norm(normals, axis=1)
+    normals = normals / where(area > 0, area, 1)[:, None]
+    planes = hstack((normals, -einsum("ij,ij->i", normals, corners[:, 0])[:, None]))
+    return einsum("fi,fj->fij", planes, planes) * (area / 2)[:, None, None]
+
+
+def boundary_quadrics(vertices: ndarray, triangles: ndarray) -> tuple[ndarray, ndarray]:
+    """
+    Computes penalty quadrics that keep open borders in place.
+
+    Every edge used by a single face gets a heavily weighted plane through the
+    edge and perpendicular to its face.
+
+    Args:
+        vertices (ndarray): An (V, 3) array of positions.
+        triangles (ndarray): An (F, 3) array of vertex indices.
+
+    Returns:
+        tuple[ndarray, ndarray]: The (B, 2) boundary edges and their (B, 4, 4)
+        quadrics.
+    """
+    directed = concatenate((triangles[:, :2], triangles[:, 1:], triangles[:, ::-2]))
+    owner = concatenate([arange(len(triangles))] * 3)
+    _, inverse, counts = unique(
+        sort(directed, axis=1), axis=0, return_inverse=True, return_counts=True
+    )
+    border = counts[inverse.ravel()] == 1
+    edges, owner = directed[border], owner[border]
+
+    corners = vertices[triangles[owner]]
+    face_normals = cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    along = vertices[edges[:, 1]] - vertices[edges[:, 0]]
+    normals = cross(along, face_normals)
+    length = norm(normals, axis=1)
+    normals = normals / where(length > 0, length, 1)[:, None]
+    planes = hstack(
+        (normals, -einsum("ij,ij->i", normals, vertices[edges[:, 0]])[:, None])
+    )
+    weight = BOUNDARY_WEIGHT * einsum("ij,ij->i", along, along)
+    return edges, einsum("fi,fj->fij", planes, planes) * weight[:, None, None]
+
+
+def _collapse_costs(quadrics: ndarray, points: ndarray, edges: ndarray) -> tuple:
+    combined = quadrics[edges[:, 0]] + quadrics[edges[:, 1]]
+    to_b = einsum("ei,eij,ej->e", points[edges[:, 1]], combined, points[edges[:, 1]])
+    to_a = einsum("ei,eij,ej->e", points[edges[:, 0]], combined, points[edges[:, 0]])
+    # Collapse the endpoint that costs least onto the other one
+    source = where(to_b <= to_a, edges[:, 0], edges[:, 1])
+    target = where(to_b <= to_a, edges[:, 1], edges[:, 0])
+    return minimum(to_a, to_b), source, target
+
+
+def decimate(vertices: ndarray, faces: ndarray, target: int) -> ndarray:
+    """
+    Decimates a face array down to a target face count.
+
+    Args:
+        vertices (ndarray): An (V, 3) array of positions.
+        faces (ndarray): An (F, 3, 3) face array of (v, vt, vn) corners.
+        target (int): The wanted number of faces.
+
+    Returns:
+        ndarray: The decimated (F', 3, 3) face array. Corners keep their uv
+        and normal indices while their vertex index follows the collapses.
+    """
+    faces = asarray(faces).copy()
+    points = hstack((vertices, ones((len(vertices), 1))))
+    quadrics = zeros((len(vertices), 4, 4))
+    add.at(
+        quadrics,
+        faces[..., 0].ravel(),
+        face_quadrics(vertices, faces[..., 0]).repeat(3, axis=0),
+    )
+    edges, penalties = boundary_quadrics(vertices, faces[..., 0])
+    add.at(quadrics, edges[:, 0], penalties)
+    add.at(quadrics, edges[:, 1], penalties)
+
+    while len(faces) > target:
+        triangles = faces[..., 0]
+        edges = concatenate((triangles[:, :2], triangles[:, 1:], triangles[:, ::2]))
+        edges = unique(sort(edges, axis=1), axis=0)
+        costs, source, target_vertex = _collapse_costs(quadrics, points, edges)
+
+        # Keep the edges that are the cheapest at both of their endpoints,
+        # which makes the selected collapses vertex disjoint
+        order = argsort(costs, kind="stable")
+        rank = zeros(len(order), dtype=int64)
+        rank[order] = arange(len(order))
+        best = full(len(vertices), len(order), dtype=int64)
+        minimum.at(best, edges[:, 0], rank)
+        minimum.at(best, edges[:, 1], rank)
+        chosen = (best[edges[:, 0]] == rank) & (best[edges[:, 1]] == rank)
+        chosen = where(chosen)[0]
+        chosen = chosen[argsort(costs[chosen], kind="stable")]
+        chosen = chosen[: max(1, (len(faces) - target) // 2)]
+        if not len(chosen):
+            break
+
+        remap = arange(len(vertices))
+        remap[source[chosen]] = target_vertex[chosen]
+        quadrics[target_vertex[chosen]] += quadrics[source[chosen]]
+        faces[..., 0] = remap[faces[..., 0]]
+        triangles = faces[..., 0]
+        keep = (
+            (triangles[:, 0] != triangles[:, 1])
+            & (triangles[:, 1] != triangles[:, 2])
+            & (triangles[:, 0] != triangles[:, 2])
+        )
+        if keep.all():
+            break
+        faces = faces[keep]
+    return faces
+
+
+def detail_levels(model, ratios=LEVEL_RATIOS) -> list:
+    """
+    Returns the cached detail levels of a model, building them when missing.
+
+    Each level is decimated from the previous one and the chain is stored in
+    the model's mesh cache and set as model.lod_levels.
+
+    Args:
+        model (ObjectModel): The model.
+        ratios (tuple[float, ...], optional): Face count ratios of the levels.
+            Defaults to 50%, 25% and 10%.
+
+    Returns:
+        list[ndarray]: The full face array followed by one face array per ratio.
+    """
+    cache = getattr(model, "cache", None)
+    cached = cache.get("lod_ratios") if cache is not None else None
+    if cached is not None and tuple(cached) == tuple(ratios):
+        levels = [cache.get(f"lod_{i}") for i in range(len(ratios))]
+    else:
+        levels, faces = [], model.face_array
+        for ratio in ratios:
+            target = int(len(model.face_array) * ratio)
+            faces = decimate(model.vertex_array, faces, target)
+            levels.append(faces)
+        if cache is not None:
+            cache.put(
+                lod_ratios=asarray(ratios),
+                **{f"lod_{i}": level for i, level in enumerate(levels)},
+            )
+    model.lod_levels = [model.face_array] + levels
+    return model.lod_levels
+
+
+def screen_size(matrix: ndarray, points: ndarray) -> float:
+    """
+    Returns the projected pixel size of a set of points.
+
+    Only the corners of the bounding box of the points are projected.
+
+    Args:
+        matrix (ndarray): The 4x4 world to screen transform.
+        points (ndarray): An (N, 3) array of positions.
+
+    Returns:
+        float: The larger side of the projected bounding rectangle in pixels.
+    """
+    lo, hi = points.min(axis=0), points.max(axis=0)
+    corners = asarray([[(lo, hi)[(i >> k) & 1][k] for k in range(3)] for i in range(8)])
+    screen = transform(matrix, corners)
+    screen = screen[:, :2] / screen[:, 3:]
+    return float((screen.max(axis=0) - screen.min(axis=0)).max())
+
+
+def select_level(levels: list, size: float, pixels_per_face: float = 4.0) -> ndarray:
+    """
+    Picks the coarsest level fine enough for a screen size.
+
+    Args:
+        levels (list[ndarray]): Face arrays ordered from finest to coarsest.
+        size (float): The projected size of the model in pixels.
+        pixels_per_face (float, optional): The screen area budget per face.
+            Defaults to 4.
+
+    Returns:
+        ndarray: The selected face array.
+    """
+    needed = size * size / pixels_per_face if size < inf else inf
+    for faces in reversed(levels):
+        if len(faces) >= needed:
+            return faces
+    return levels[0]
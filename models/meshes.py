@@ -0,0 +1,205 @@
+"""
+Module Summary: Contains the triangle and vertex buffers built from OBJ faces.
+
+OBJ polygons are fan triangulated into a dense triangle array that keeps the
+index of its source polygon. OBJ faces index positions, uvs and normals
+separately, so every distinct (v, vt, vn) triple is then collapsed into one
+vertex of a packed attribute buffer and triangles become a uint32 index array
+into it. Per vertex work is done once per unique vertex instead of once per
+face corner. Meshes exported without normals get smooth normals generated
+from their faces.
+
+Returns:
+    Functions:
+        triangulate: Fan triangulates polygons into a dense triangle array.
+        smooth_normals: Generates area weighted vertex normals for a mesh.
+        index_vertices: Collapses face corners into unique vertices.
+        vertex_attributes: Packs the attributes of unique vertices into one array.
+        mesh_edges: Returns the unique edges of a polygon mesh.
+"""
+
+from numpy import (
+    arange,
+    array,
+    add,
+    argsort,
+    asarray,
+    cos,
+    cross,
+    cumsum,
+    einsum,
+    float64,
+    hstack,
+    int64,
+    maximum,
+    minimum,
+    ndarray,
+    radians,
+    repeat,
+    round as np_round,
+    searchsorted,
+    stack,
+    uint32,
+    unique,
+    where,
+    zeros,
+)
+from numpy.linalg import norm
+
+POSITION = slice(0, 3)
+UV = slice(3, 5)
+NORMAL = slice(5, 8)
+
+
+def triangulate(polygons: list) -> tuple[ndarray, ndarray]:
+    """
+    Fan triangulates polygons into a dense triangle array.
+
+    A polygon with n corners becomes n - 2 triangles sharing its first corner,
+    which is exact for the convex faces OBJ exporters write. Polygons with
+    fewer than three corners are dropped.
+
+    Args:
+        polygons (list[list[tuple[int, int, int]]]): The (v, vt, vn) corners of
+            every polygon.
+
+    Returns:
+        tuple[ndarray, ndarray]: The (F, 3, 3) int64 triangle array and the
+        (F,) index of the polygon every triangle came from.
+    """
+    counts = array([len(polygon) for polygon in polygons], dtype=int64)
+    corners = array(
+        [corner for polygon in polygons for corner in polygon], dtype=int64
+    ).reshape(-1, 3)
+    fans = maximum(counts - 2, 0)
+    polygon = repeat(arange(len(counts)), fans)
+    step = arange(fans.sum()) - repeat(cumsum(fans) - fans, fans)
+    first = (cumsum(counts) - counts)[polygon]
+    triangles = stack((first, first + step + 1, first + step + 2), axis=1)
+    return corners[triangles].reshape(-1, 3, 3), polygon
+
+
+def _unit(vectors: ndarray) -> ndarray:
+    lengths = norm(vectors, axis=-1, keepdims=True)
+    return vectors / where(lengths > 0, lengths, 1)
+
+
+def smooth_normals(
+    vertices: ndarray, triangles: ndarray, crease_angle: float = None
+) -> tuple[ndarray, ndarray]:
+    """
+    Generates area weighted vertex normals for a mesh.
+
+    Face normals are left unnormalized so their length weights them by area,
+    and they are scatter added onto the vertices of every face. With a crease
+    angle a corner only averages the faces around its vertex that are within
+    the angle of its own face, so hard edges keep split normals.
+
+    Args:
+        vertices (ndarray): An (V, 3) array of positions.
+        triangles (ndarray): An (F, 3) array of vertex indices.
+        crease_angle (float, optional): The largest angle in degrees between
+            faces that are smoothed together. Defaults to smoothing all faces.
+
+    Returns:
+        tuple[ndarray, ndarray]: The (N, 3) unit normals and the (F, 3) normal
+        index of every face corner.
+    """
+    triangles = asarray(triangles, dtype=int64)
+    corners = vertices[triangles]
+    weighted = cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    if crease_angle is None:
+        normals = zeros(vertices.shape)
+        add.at(normals, triangles.ravel(), weighted.repeat(3, axis=0))
+        return _unit(normals), triangles
+
+    # Pair every corner with every corner sharing its vertex
+    flat = triangles.ravel()
+    order = argsort(flat, kind="stable")
+    start = searchsorted(flat[order], flat, side="left")
+    degree = searchsorted(flat[order], flat, side="right") - start
+    corner = repeat(arange(len(flat)), degree)
+    step = arange(degree.sum()) - repeat(cumsum(degree) - degree, degree)
+    other = order[repeat(start, degree) + step]
+    face, neighbour = corner // 3, other // 3
+    unit = _unit(weighted)
+    smooth = einsum("ij,ij->i", unit[face], unit[neighbour]) >= cos(
+        radians(crease_angle)
+    )
+
+    sums = zeros((len(flat), 3))
+    add.at(sums, corner[smooth], weighted[neighbour[smooth]])
+    # Corners smoothing over the same faces get the same normal
+    normals, indices = unique(
+        np_round(_unit(sums), 9), axis=0, return_inverse=True
+    )
+    return _unit(normals), indices.reshape(-1, 3)
+
+
+def index_vertices(faces: ndarray) -> tuple[ndarray, ndarray]:
+    """
+    Collapses face corners into unique vertices.
+
+    Args:
+        faces (ndarray): An (F, 3, 3) face array of (v, vt, vn) corners.
+
+    Returns:
+        tuple[ndarray, ndarray]: The (U, 3) unique (v, vt, vn) corners and the
+        (F, 3) uint32 index of every face corner into them.
+    """
+    faces = asarray(faces)
+    corners, inverse = unique(faces.reshape(-1, 3), axis=0, return_inverse=True)
+    return corners, inverse.reshape(-1, 3).astype(uint32)
+
+
+def _gather(values: ndarray, indices: ndarray, width: int) -> ndarray:
+    if values is None or not len(values):
+        return zeros((len(indices), width))
+    # Corners without the attribute have index -1
+    return where((indices >= 0)[:, None], asarray(values, dtype=float64)[indices], 0)
+
+
+def vertex_attributes(model, corners: ndarray) -> ndarray:
+    """
+    Packs the attributes of unique vertices into one array.
+
+    Args:
+        model (ObjectModel): The model owning the vertex, uv and normal arrays.
+        corners (ndarray): The (U, 3) unique (v, vt, vn) corners.
+
+    Returns:
+        ndarray: An (U, 8) array holding the position, uv and normal of every
+        vertex in the POSITION, UV and NORMAL columns. Missing uvs or normals
+        are zero.
+    """
+    return hstack(
+        (
+            _gather(model.vertex_array, corners[:, 0], 3),
+            _gather(getattr(model, "uv_array", None), corners[:, 1], 2),
+            _gather(getattr(model, "normal_array", None), corners[:, 2], 3),
+        )
+    )
+
+
+def mesh_edges(faces: ndarray) -> ndarray:
+    """
+    Returns the unique edges of a polygon mesh.
+
+    Args:
+        faces (ndarray): An (F, K) array of vertex indices, e.g. the
+            face_array[..., 0] of a model.
+
+    Returns:
+        ndarray: The (E, 2) int64 edges, smaller vertex index first, sorted.
+        An edge shared by several faces appears once.
+    """
+    faces = asarray(faces, dtype=int64)
+    if not faces.size:
+        return zeros((0, 2), dtype=int64)
+    first = faces.reshape(-1)
+    second = faces[:, list(range(1, faces.shape[1])) + [0]].reshape(-1)
+    low, high = minimum(first, second), maximum(first, second)
+    # One int64 per edge keeps unique on a flat array instead of rows
+    count = int(high.max()) + 1
+    packed = unique(low * count + high)
+    return stack((packed // count, packed % count), axis=1)
@@ -0,0 +1,294 @@
+"""
+Module Summary: Contains the compact binary mesh format.
+
+Meshes are stored quantized: positions as int16 inside their bounding box,
+unit normals as int16 in [-1, 1] and uvs as float16. Face indices are written
+per attribute stream as zigzag coded deltas packed into varints, which keeps
+the mostly increasing index sequences of OBJ exports to one or two bytes each.
+Everything is encoded and decoded with array operations.
+
+Layout, little endian:
+    header: magic, version, vertex, normal, uv and face counts
+    bounds: six float32, the lower and upper corners of the positions
+    positions: (V, 3) int16
+    normals: (N, 3) int16
+    uvs: (T, 2) float16
+    indices: uint32 byte length followed by the varint stream
+
+Returns:
+    Functions:
+        quantize: Maps values inside a box onto the int16 range.
+        dequantize: Maps int16 values back into their box.
+        zigzag_encode: Interleaves signed integers into unsigned ones.
+        zigzag_decode: Reverses zigzag_encode.
+        varint_encode: Packs unsigned integers into 7 bit groups.
+        varint_decode: Unpacks a varint byte stream.
+        encode_mesh: Encodes mesh arrays into bytes.
+        decode_mesh: Decodes bytes produced by encode_mesh.
+        write_mesh: Writes mesh arrays to a file.
+        read_mesh: Reads mesh arrays from a file.
+"""
+
+from struct import Struct
+
+from numpy import (
+    add,
+    arange,
+    asarray,
+    concatenate,
+    cumsum,
+    diff,
+    float16,
+    float32,
+    float64,
+    flatnonzero,
+    frombuffer,
+    int16,
+    inf,
+    int64,
+    ndarray,
+    nextafter,
+    ones,
+    rint,
+    uint8,
+    uint64,
+    where,
+    zeros,
+)
+
+from utils.streams import open_stream
+
+SUFFIX = ".rmesh"
+MAGIC = b"RMSH"
+VERSION = 1
+
+HEADER = Struct("<4sHIIII")
+BOUNDS = Struct("<6f")
+LENGTH = Struct("<I")
+
+
+def quantize(values: ndarray, lower: ndarray, upper: ndarray) -> ndarray:
+    """
+    Maps values inside a box onto the int16 range.
+
+    Args:
+        values (ndarray): An (N, D) array of values.
+        lower (ndarray): The (D,) lower corner of the box.
+        upper (ndarray): The (D,) upper corner of the box.
+
+    Returns:
+        ndarray: The (N, D) int16 quantized values, values outside the box
+        clamped to its faces.
+    """
+    extent = where(upper > lower, upper - lower, 1)
+    scaled = rint((values - lower) / extent * 65535) - 32768
+    return scaled.clip(-32768, 32767).astype(int16)
+
+
+def dequantize(values: ndarray, lower: ndarray, upper: ndarray) -> ndarray:
+    """
+    Maps int16 values back into their box.
+
+    Args:
+        values (ndarray): An (N, D) array of int16 values.
+        lower (ndarray): The (D,) lower corner of the box.
+        upper (ndarray): The (D,) upper corner of the box.
+
+    Returns:
+        ndarray: The (N, D) float64 values.
+    """
+    extent = where(upper > lower, upper - lower, 1)
+    return (values.astype(float64) + 32768) / 65535 * extent + lower
+
+
+def zigzag_encode(values: ndarray) -> ndarray:
+    """
+    Interleaves signed integers into unsigned ones.
+
+    Args:
+        values (ndarray): An array of int64 values.
+
+    Returns:
+        ndarray: The uint64 values 0, -1, 1, -2, ... mapped to 0, 1, 2, 3, ...
+    """
+    values = asarray(values, dtype=int64)
+    return ((values << 1) ^ (values >> 63)).view(uint64)
+
+
+def zigzag_decode(values: ndarray) -> ndarray:
+    """
+    Reverses zigzag_encode.
+
+    Args:
+        values (ndarray): An array of uint64 values.
+
+    Returns:
+        ndarray: The int64 values.
+    """
+    values = asarray(values, dtype=uint64)
+    return (values >> uint64(1)).view(int64) ^ -(values & uint64(1)).view(int64)
+
+
+def varint_encode(values: ndarray) -> ndarray:
+    """
+    Packs unsigned integers into 7 bit groups.
+
+    Every byte holds 7 bits of a value, lowest first, with the high bit set on
+    all but the last byte of the value.
+
+    Args:
+        values (ndarray): An array of uint64 values.
+
+    Returns:
+        ndarray: The uint8 byte stream.
+    """
+    values = asarray(values, dtype=uint64)
+    if not len(values):
+        return zeros(0, dtype=uint8)
+    count = ones(len(values), dtype=int64)
+    rest = values >> uint64(7)
+    while rest.any():
+        count += rest > 0
+        rest >>= uint64(7)
+    position = arange(count.max())
+    groups = ((values[:, None] >> (position * 7).astype(uint64)) & uint64(0x7F)).astype(
+        uint8
+    )
+    groups[position < count[:, None] - 1] |= 0x80
+    return groups[position < count[:, None]]
+
+
+def varint_decode(data) -> ndarray:
+    """
+    Unpacks a varint byte stream.
+
+    Args:
+        data (bytes | ndarray): The bytes written by varint_encode.
+
+    Returns:
+        ndarray: The uint64 values.
+    """
+    data = frombuffer(data, dtype=uint8) if isinstance(data, bytes) else data
+    if not len(data):
+        return zeros(0, dtype=uint64)
+    ends = (data & 0x80) == 0
+    starts = flatnonzero(concatenate(([True], ends[:-1])))
+    value = cumsum(ends) - ends
+    shift = (arange(len(data)) - starts[value]) * 7
+    payload = (data & 0x7F).astype(uint64) << shift.astype(uint64)
+    return add.reduceat(payload, starts)
+
+
+def encode_mesh(
+    vertices: ndarray, normals: ndarray, uvs: ndarray, faces: ndarray
+) -> bytes:
+    """
+    Encodes mesh arrays into bytes.
+
+    Args:
+        vertices (ndarray): An (V, 3) array of positions.
+        normals (ndarray): An (N, 3) array of unit normals.
+        uvs (ndarray): A (T, 2) array of uv coordinates.
+        faces (ndarray): An (F, 3, 3) face array of (v, vt, vn) corners, -1
+            for missing indices.
+
+    Returns:
+        bytes: The encoded mesh.
+    """
+    vertices = asarray(vertices, dtype=float64).reshape(-1, 3)
+    normals = asarray(normals, dtype=float64).reshape(-1, 3)
+    uvs = asarray(uvs, dtype=float64).reshape(-1, 2)
+    faces = asarray(faces, dtype=int64).reshape(-1, 3, 3)
+    lower = vertices.min(axis=0) if len(vertices) else zeros(3)
+    upper = vertices.max(axis=0) if len(vertices) else zeros(3)
+    # The stored float32 box is rounded outward so it still holds every vertex
+    lower32, upper32 = lower.astype(float32), upper.astype(float32)
+    lower32 = where(lower32 > lower, nextafter(lower32, float32(-inf)), lower32)
+    upper32 = where(upper32 < upper, nextafter(upper32, float32(inf)), upper32)
+
+    # One stream per attribute, corners in face order
+    streams = faces.transpose(2, 0, 1).reshape(3, -1)
+    deltas = diff(streams, axis=1, prepend=0)
+    indices = varint_encode(zigzag_encode(deltas.ravel()))
+
+    counts = (len(vertices), len(normals), len(uvs), len(faces))
+    return b"".join(
+        (
+            HEADER.pack(MAGIC, VERSION, *counts),
+            BOUNDS.pack(*lower32, *upper32),
+            quantize(vertices, lower32, upper32).tobytes(),
+            quantize(normals, -1.0, 1.0).tobytes(),
+            uvs.astype(float16).tobytes(),
+            LENGTH.pack(len(indices)),
+            indices.tobytes(),
+        )
+    )
+
+
+def decode_mesh(data: bytes) -> tuple[ndarray, ndarray, ndarray, ndarray]:
+    """
+    Decodes bytes produced by encode_mesh.
+
+    Args:
+        data (bytes): The encoded mesh.
+
+    Returns:
+        tuple[ndarray, ndarray, ndarray, ndarray]: The (V, 3) positions, (N, 3)
+        normals, (T, 2) uvs and (F, 3, 3) int64 face array.
+
+    Raises:
+        ValueError: If the data is not a mesh of a supported version.
+    """
+    magic, version, nv, nn, nt, nf = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a supported mesh file")
+    offset = HEADER.size
+    bounds = asarray(BOUNDS.unpack_from(data, offset), dtype=float64)
+    offset += BOUNDS.size
+
+    def take(dtype, count):
+        nonlocal offset
+        values = frombuffer(data, dtype=dtype, count=count, offset=offset)
+        offset += values.nbytes
+        return values
+
+    vertices = dequantize(take(int16, nv * 3).reshape(-1, 3), bounds[:3], bounds[3:])
+    normals = dequantize(take(int16, nn * 3).reshape(-1, 3), -1.0, 1.0)
+    uvs = take(float16, nt * 2).reshape(-1, 2).astype(float64)
+    (length,) = LENGTH.unpack_from(data, offset)
+    offset += LENGTH.size
+    deltas = zigzag_decode(varint_decode(take(uint8, length))).reshape(3, -1)
+    faces = cumsum(deltas, axis=1).reshape(3, nf, 3).transpose(1, 2, 0)
+    return vertices, normals, uvs, faces.copy()
+
+
+def write_mesh(
+    filename: str, vertices: ndarray, normals: ndarray, uvs: ndarray, faces: ndarray
+) -> None:
+    """
+    Writes mesh arrays to a file.
+
+    Args:
+        filename (str): The destination, usually ending in SUFFIX.
+        vertices (ndarray): An (V, 3) array of positions.
+        normals (ndarray): An (N, 3) array of unit normals.
+        uvs (ndarray): A (T, 2) array of uv coordinates.
+        faces (ndarray): An (F, 3, 3) face array of (v, vt, vn) corners.
+    """
+    with open(filename, "wb") as file:
+        file.write(encode_mesh(vertices, normals, uvs, faces))
+
+
+def read_mesh(filename: str) -> tuple[ndarray, ndarray, ndarray, ndarray]:
+    """
+    Reads mesh arrays from a file.
+
+    Args:
+        filename (str): The mesh file, optionally gzip, bz2 or xz compressed.
+
+    Returns:
+        tuple[ndarray, ndarray, ndarray, ndarray]: The positions, normals, uvs
+        and face array, see decode_mesh.
+    """
+    with open_stream(filename, "rb") as file:
+        return decode_mesh(file.read())
@@ -1,19 +1,3 @@
-from math import isclose
-from PIL import UnidentifiedImageError, Image
-from numpy import array, dot, fliplr, flipud, uint8, zeros
-from engines.renders import embed
-from models.geometry import (
-    ModelView,
-    Projection,
-    Viewport,
-    lookat,
-    proj,
-    projection,
-    viewport,
-)
-from models.interfaces.exceptions import ObjectImageError
-from models.vectors import Matrix, Vector2, Vector3
-
 """
 imaging Module
 
@@ -40,10 +24,40 @@ image.flip_horizontally()
 image.write_file("output.ext")
 """
 
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
 from math import isclose
+from tempfile import TemporaryFile
 from PIL import Image, UnidentifiedImageError
-from numpy import array, fliplr, flipud, zeros, uint8
-from engines.renders import embed
+from numpy import (
+    arange,
+    array,
+    ascontiguousarray,
+    asarray,
+    copyto,
+    dot,
+    float64,
+    full,
+    int32,
+    inf,
+    int64,
+    memmap,
+    nan,
+    ndarray,
+    zeros,
+    uint8,
+    uint32,
+)
+from engines.rasterizer import (
+    TILE_SIZE,
+    occlusion_query,
+    pick_buffer,
+    rasterize_tiles,
+    visible_counts,
+)
+from engines.raycast import raycast
+from engines.renders import draw_lines, embed
+from engines.splats import splat
 from models.geometry import (
     ModelView,
     Projection,
@@ -54,8 +68,34 @@ from models.geometry import (
     viewport,
 )
 from models.interfaces.exceptions import ObjectImageError
-from models.interfaces.shaders import IShader
+from models.geometry.transforms import as_vector, camera_matrices, transform
+from models.interfaces.shaders import IBatchShader, IShader
+from models.bvh import mesh_bvh
+from models.cache import MeshCache, render_key
+from models.meshfile import SUFFIX as MESH_SUFFIX, read_mesh, write_mesh
+from models.meshes import index_vertices, mesh_edges, smooth_normals, triangulate
+from models.lod import detail_levels, screen_size, select_level
+from models.shaders import (
+    SHADOW_BIAS,
+    SHADOW_PCF,
+    SHADOW_SIZE,
+    ObjectDepthShader,
+    ObjectGouraudShader,
+    ObjectOcclusionShader,
+    ObjectShadowShader,
+    interpolate,
+    normalize_rows,
+    shadow_map,
+)
 from models.vectors import Matrix, Vector2, Vector3
+from utils.streams import find_asset, open_stream, strip_compression
+from utils.tga import read_tga, write_tga
+
+RENDER_OUTPUT = ("output.tga", "zbuffer.tga")
+
+
+def is_tga(filename: str) -> bool:
+    return strip_compression(filename).lower().endswith(".tga")
 
 
 class ObjectCamera:
@@ -111,28 +151,167 @@ class ObjectImage:
     """
 
     def __init__(
-        self, width, height, color_format=ObjectColor, light_dir=Vector3(1, 1, 1)
+        self,
+        width,
+        height,
+        color_format=ObjectColor,
+        light_dir=Vector3(1, 1, 1),
+        pixels=None,
+        storage=None,
+        tile_size=None,
+        pool=None,
     ) -> None:
         """
         Initialize ObjectImage object.
+
+        The pixels are one [x, y] indexed array. Flips, crops and channel
+        selections replace it by views of the same memory, which are only
+        resolved when the image is encoded or materialized.
+
+        Parameters:
+        - pixels (ndarray): An existing (width, height[, channels]) array to
+        wrap instead of allocating a blank RGBA one.
+        - storage (str): A folder to keep the pixels and every render buffer
+        in as memory mapped files, for images larger than memory.
+        - tile_size (int): The tile edge renders are rasterized in. Defaults to
+        TILE_SIZE with storage and to the whole image without.
+        - pool (FramebufferPool): Take the render buffers from this pool. They
+        are returned to it by the next render or release_frame, so a result is
+        only valid until then.
         """
         self.width = width
         self.height = height
         self.color_format = color_format
-        self.pixels = zeros((width, height, 4), dtype=uint8)
+        self.storage = storage
+        if tile_size is None:
+            tile_size = TILE_SIZE if storage is not None else max(width, height, 1)
+        self.tile_size = tile_size
+        self.pool = pool
+        self.frame_buffers = []
+        if pixels is None:
+            pixels = self.allocate("pixels", (width, height, 4), uint8)
+        self.pixels = pixels
         self.model_view_matrix = Matrix.identity()
         self.projection_matrix = Matrix.identity()
         self.viewport_matrix = Matrix.identity()
         self.light_dir = light_dir
+        self.depth = None
+        self.face_ids = None
+        self.screen_coords = None
+        self.pick_faces = None
+        self.visible_counts = None
 
     def set_matrices(self, model_view, projection, viewport):
         self.model_view_matrix = model_view
         self.projection_matrix = projection
         self.viewport_matrix = viewport
 
-    def render_model(self, model, camera) -> None:
+    def allocate(self, name, shape, dtype) -> ndarray:
+        """
+        Allocate a zeroed buffer, memory mapped when the image has storage.
+
+        The mapped file is anonymous and sparse: it is removed as soon as it is
+        closed and only the pages written to take up disk space.
+
+        Parameters:
+        - name (str): The file name prefix of the buffer.
+        - shape (tuple): The buffer shape.
+        - dtype (type): The buffer dtype.
+
+        Returns:
+        - ndarray: The buffer.
+        """
+        if self.storage is None:
+            return zeros(shape, dtype=dtype)
+        with TemporaryFile(prefix=f"{name}-", dir=self.storage) as file:
+            return memmap(file, dtype=dtype, mode="w+", shape=shape)
+
+    def frame_buffer(self, name, shape, dtype, fill=0) -> ndarray:
+        """
+        Allocate a cleared render buffer, from the pool when the image has one.
+
+        Disk backed images never use the pool.
+
+        Parameters:
+        - name (str): The file name prefix of the buffer.
+        - shape (tuple): The buffer shape.
+        - dtype (type): The buffer dtype.
+        - fill (scalar): The value every element is set to, or None when the
+        caller overwrites the whole buffer itself. Pooled buffers then keep
+        whatever they held.
+
+        Returns:
+        - ndarray: The buffer, held until the next release_frame.
+        """
+        if self.pool is None or self.storage is not None:
+            buffer = self.allocate(name, shape, dtype)
+            if fill not in (None, 0):
+                buffer.fill(fill)
+            return buffer
+        buffer = self.pool.acquire(shape, dtype, fill)
+        self.frame_buffers.append(buffer)
+        return buffer
+
+    def release_frame(self) -> None:
+        """
+        Return the buffers of the last render to the pool.
+
+        The image, zbuffer, depth and face ids of that render are dropped, copy
+        them first to keep them.
+        """
+        if not self.frame_buffers:
+            return
+        self.image = self.zbuffer = self.depth = self.face_ids = None
+        for buffer in self.frame_buffers:
+            self.pool.release(buffer)
+        self.frame_buffers = []
+
+    def render_model(
+        self,
+        model,
+        camera,
+        shader=None,
+        shadows=False,
+        lod=False,
+        engine="raster",
+        picking=False,
+        groups=None,
+        output=RENDER_OUTPUT,
+        cache=None,
+        shadow_size=SHADOW_SIZE,
+        pcf=SHADOW_PCF,
+        bias=SHADOW_BIAS,
+        executor=None,
+        region=None,
+    ):
         self.model = model
 
+        if not len(model.face_array) and len(model.vertex_array):
+            # Point clouds have nothing for a shader to fill
+            self.render_points(model, camera, output=output)
+            return None
+
+        if shader is None:
+            shader = ObjectGouraudShader(model, self.light_dir)
+        if isinstance(shader, IBatchShader):
+            return self.render_batched(
+                model,
+                camera,
+                shader,
+                shadows,
+                lod,
+                engine,
+                picking,
+                groups,
+                output,
+                cache,
+                shadow_size=shadow_size,
+                pcf=pcf,
+                bias=bias,
+                executor=executor,
+                region=region,
+            )
+
         # Set up transformation matrices
         lookat(camera.eye, camera.center, camera.up)
         viewport(
@@ -165,8 +344,365 @@ class ObjectImage:
         self.zbuffer.flip_vertically()
 
         # Write to files
-        self.image.write_file("output.tga")
-        self.zbuffer.write_file("zbuffer.tga")
+        if output is not None:
+            self.image.write_file(output[0])
+            self.zbuffer.write_file(output[1])
+
+    def render_batched(
+        self,
+        model,
+        camera,
+        shader,
+        shadows=False,
+        lod=False,
+        engine="raster",
+        picking=False,
+        groups=None,
+        output=RENDER_OUTPUT,
+        cache=None,
+        shadow_size=SHADOW_SIZE,
+        pcf=SHADOW_PCF,
+        bias=SHADOW_BIAS,
+        executor=None,
+        region=None,
+    ):
+        """
+        Render the model with a batched shader through the array rasterizer.
+
+        Parameters:
+        - model (ObjectModel): The model to render.
+        - camera (ObjectCamera): The camera to render from.
+        - shader (IBatchShader): The shader for the vertex and fragment stages.
+        - shadows (bool): Render a depth only pass from the light first and
+        shadow the fragments hidden from it.
+        - lod (bool): Render the coarsest detail level that still matches the
+        projected size of the model. The shader's faces are replaced by it.
+        - engine (str): "raster" for the array rasterizer or "raycast" to
+        trace primary rays through the model BVH instead.
+        - picking (bool): Also keep an int32 face id buffer so pick can
+        resolve screen positions without rendering again.
+        - groups (array-like): The group of every rendered face, e.g.
+        model.object_array or model.material_array, -1 to leave a face out.
+        Visible pixels are counted per group from the final face id buffer.
+        - output (tuple): The color and depth image files to write, or None to
+        only keep the result in self.image and self.zbuffer.
+        - cache (RenderCache): Look the render up by its content key first and
+        only rasterize on a miss, storing the finished buffers for next time.
+        - shadow_size (int): The side of the square shadow map. Smaller maps
+        are cheaper to render and give softer, blockier shadow edges.
+        - pcf (int): The radius of the kernel shadow lookups are filtered over,
+        0 for hard shadows.
+        - bias (float): The depth offset that keeps surfaces from shadowing
+        themselves.
+        - executor (ProcessPoolExecutor): A long lived pool raycast renders
+        trace on instead of starting their own.
+        - region (tuple): Only render the (x0, y0, x1, y1) pixels of the y up
+        buffers, end exclusive, e.g. one tile of a larger frame. The rest of
+        the buffers is left cleared. Renders of a region are never cached.
+
+        Baked occlusion found on the model is multiplied in automatically.
+
+        Returns:
+        - ndarray: The visible pixel count of every group when groups is given,
+        otherwise None. The counts are also kept as visible_counts.
+        """
+        self.release_frame()
+        shader.set_camera(camera)
+        matrices = camera_matrices(camera, self.width, self.height)
+        if lod:
+            levels = model.lod_levels or detail_levels(model)
+            model_view, projection_matrix, viewport_matrix = matrices
+            size = screen_size(
+                viewport_matrix @ projection_matrix @ model_view, model.vertex_array
+            )
+            shader.faces = select_level(levels, size)
+
+        if engine == "raycast" and self.storage is not None:
+            raise ValueError("raycast renders are not supported with storage")
+        # Disk backed buffers are too large to be worth a cache entry and a
+        # region leaves the rest of the frame undrawn
+        cache = cache if self.storage is None and region is None else None
+        key = cached = None
+        if cache is not None:
+            key = render_key(
+                model,
+                shader,
+                camera=[as_vector(v) for v in (camera.eye, camera.center, camera.up)],
+                light=as_vector(self.light_dir),
+                size=(self.width, self.height),
+                shadows=(shadow_size, pcf, bias) if shadows else False,
+                engine=engine,
+                face_ids=picking or groups is not None,
+            )
+            cached = cache.get(key)
+
+        occlusion = getattr(model, "occlusion_array", None)
+        if occlusion is not None:
+            shader = ObjectOcclusionShader(shader, occlusion)
+        if shadows and cached is None:
+            shadow, light_matrix = shadow_map(
+                model,
+                self.light_dir,
+                camera.center,
+                shadow_size,
+                shadow_size,
+                shader.faces,
+            )
+            shader = ObjectShadowShader(shader, shadow, light_matrix, pcf, bias)
+        shader.set_matrices(*matrices)
+        self.set_matrices(
+            shader.model_view_matrix, shader.projection_matrix, shader.viewport_matrix
+        )
+
+        faces = arange(len(shader.faces))
+        # raycast runs the vertex stage itself
+        rasterized = cached is None and engine != "raycast"
+        screen = shader.vertex(faces) if rasterized or picking else None
+        if cached is not None:
+            color, depth = cached["color"], cached["depth"]
+            face_ids = cached.get("face_ids")
+        elif engine == "raycast":
+            bvh = mesh_bvh(model, shader.faces)
+            color, depth, face_ids = raycast(
+                shader,
+                camera,
+                self.width,
+                self.height,
+                bvh,
+                executor=executor,
+                region=region,
+            )
+        else:
+            size = (self.width, self.height)
+            # rasterize_tiles clears every tile it draws, only the pixels
+            # outside a region have to be cleared up front
+            clear = region is not None
+            color = self.frame_buffer("color", (*size, 4), uint8, 0 if clear else None)
+            depth = self.frame_buffer("depth", size, float64, -inf if clear else None)
+            face_ids = None
+            if picking or groups is not None:
+                face_ids = self.frame_buffer(
+                    "face_ids", size, int32, -1 if clear else None
+                )
+            rasterize_tiles(
+                screen,
+                depth,
+                shader,
+                faces,
+                color,
+                face_ids,
+                self.tile_size,
+                region=region,
+            )
+        if cache is not None and cached is None:
+            buffers = {"color": color, "depth": depth}
+            if face_ids is not None:
+                buffers["face_ids"] = face_ids
+            cache.put(key, **buffers)
+
+        self.depth = depth
+        self.face_ids = face_ids if picking else None
+        self.screen_coords = screen if picking else None
+        self.pick_faces = shader.faces if picking else None
+        self.visible_counts = None
+        if groups is not None:
+            size = int(asarray(groups).max(initial=-1)) + 1
+            self.visible_counts = visible_counts(face_ids, groups, size)
+
+        self.store_frame(color, depth, output)
+        return self.visible_counts
+
+    def store_frame(self, color, depth, output=RENDER_OUTPUT):
+        """
+        Keep rendered buffers as self.image and self.zbuffer and write them.
+
+        Parameters:
+        - color (ndarray): The (width, height, 4) color buffer, y up.
+        - depth (ndarray): The (width, height) depth buffer, y up.
+        - output (tuple): The color and depth image files to write, or None.
+        """
+        self.image = ObjectImage(self.width, self.height, ObjectColor, pixels=color)
+        gray = self.frame_buffer("zbuffer", depth.shape, uint8, None)
+        for start in range(0, self.width, self.tile_size):
+            stripe = slice(start, start + self.tile_size)
+            gray[stripe] = depth[stripe].clip(0, 255)
+        self.zbuffer = ObjectImage(self.width, self.height, ObjectColor, pixels=gray)
+
+        # Views only, the row order is resolved when the files are encoded
+        self.image.flip_vertically()
+        self.zbuffer.flip_vertically()
+
+        if output is not None:
+            self.image.write_file(output[0])
+            self.zbuffer.write_file(output[1])
+
+    def render_points(
+        self, model, camera, radius=1.0, color=None, output=RENDER_OUTPUT
+    ):
+        """
+        Render the vertices of the model as a depth tested point cloud.
+
+        All vertices are projected in one batch and splatted as discs. Models
+        read from OBJ files without faces are rendered this way automatically.
+
+        Parameters:
+        - model (ObjectModel): The model whose vertices are drawn.
+        - camera (ObjectCamera): The camera to render from.
+        - radius (float): The splat radius in pixels, 0 for single pixels.
+        - color (ObjectColor | array-like): The point color. Defaults to the
+        model's vertex colors, or white when it has none.
+        - output (tuple): The color and depth image files to write, or None to
+        only keep the result in self.image and self.zbuffer.
+
+        Returns:
+        - int: The number of visible splat fragments.
+        """
+        self.release_frame()
+        model_view, projection_matrix, viewport_matrix = camera_matrices(
+            camera, self.width, self.height
+        )
+        self.set_matrices(model_view, projection_matrix, viewport_matrix)
+        screen = transform(
+            viewport_matrix @ projection_matrix @ model_view, model.vertex_array
+        )
+        vertex_colors = getattr(model, "color_array", None)
+        if color is not None or vertex_colors is None:
+            white = self.color_format(255, 255, 255)
+            colors = self.pixel_values(white if color is None else color)
+        else:
+            colors = full((len(vertex_colors), 4), 255, dtype=uint8)
+            colors[:, :3] = (vertex_colors.clip(0, 1) * 255 + 0.5).astype(uint8)
+
+        size = (self.width, self.height)
+        color_buffer = self.frame_buffer("color", (*size, 4), uint8)
+        depth = self.frame_buffer("depth", size, float64, -inf)
+        written = splat(screen, depth, color_buffer, colors, radius)
+
+        self.depth = depth
+        self.face_ids = self.screen_coords = self.pick_faces = None
+        self.visible_counts = None
+        self.store_frame(color_buffer, depth, output)
+        return written
+
+    def render_wireframe(
+        self,
+        model,
+        camera,
+        color=None,
+        faces=None,
+        hidden=False,
+        antialias=False,
+        bias=1.0,
+        output=None,
+    ):
+        """
+        Draw the unique edges of the model as lines.
+
+        The lines are drawn over the last render, or into a new black image
+        when there is none, so a wireframe can be overlaid on a shaded frame.
+
+        Parameters:
+        - model (ObjectModel): The model whose edges are drawn.
+        - camera (ObjectCamera): The camera to draw from.
+        - color (ObjectColor | array-like): The line color. Defaults to white.
+        - faces (ndarray): The face array to take the edges from. Defaults to
+        the model's.
+        - hidden (bool): Depth test the lines against the last render's depth
+        buffer and against each other, hiding the edges behind surfaces.
+        - antialias (bool): Blend the lines by pixel coverage.
+        - bias (float): The depth a line may lie behind a surface and still be
+        drawn, so edges on the rendered surface stay visible.
+        - output (str): The image file to write, or None.
+
+        Returns:
+        - int: The number of line fragments written.
+        """
+        model_view, projection_matrix, viewport_matrix = camera_matrices(
+            camera, self.width, self.height
+        )
+        screen = transform(
+            viewport_matrix @ projection_matrix @ model_view, model.vertex_array
+        )
+        faces = model.face_array if faces is None else faces
+        edges = mesh_edges(asarray(faces)[..., 0])
+
+        size = (self.width, self.height)
+        if getattr(self, "image", None) is None:
+            pixels = self.frame_buffer("color", (*size, 4), uint8)
+            self.image = ObjectImage(*size, self.color_format, pixels=pixels)
+            self.image.flip_vertically()
+            self.depth = None
+        depth = None
+        if hidden:
+            if self.depth is None:
+                self.depth = self.frame_buffer("depth", size, float64, -inf)
+            depth = self.depth
+        color = self.color_format(255, 255, 255) if color is None else color
+        written = draw_lines(
+            screen[edges],
+            # The buffers are y up, the image is a flipped view of them
+            self.image.pixels[:, ::-1],
+            self.image.pixel_values(color),
+            depth,
+            antialias,
+            bias,
+        )
+        if output is not None:
+            self.image.write_file(output)
+        return written
+
+    def query_visibility(self, model, camera, groups=None, faces=None):
+        """
+        Count the visible pixels of face groups without shading anything.
+
+        Only the vertex stage and the depth test run, no color buffer is
+        allocated and no files are written.
+
+        Parameters:
+        - model (ObjectModel): The model to test.
+        - camera (ObjectCamera): The camera to test from.
+        - groups (array-like): The group of every face, -1 to leave a face out.
+        Defaults to one group per face.
+        - faces (ndarray): The face array to test. Defaults to the model's.
+
+        Returns:
+        - ndarray: The visible pixel count of every group, hidden trailing
+        faces and groups included.
+        """
+        shader = ObjectDepthShader(model, faces)
+        shader.set_matrices(*camera_matrices(camera, self.width, self.height))
+        screen = shader.vertex(arange(len(shader.faces)))
+        if groups is None:
+            size = len(shader.faces)
+        else:
+            size = int(asarray(groups).max(initial=-1)) + 1
+        return occlusion_query(screen, self.width, self.height, groups, size)
+
+    def pick(self, xy):
+        """
+        Resolve many screen positions against the last picking render.
+
+        Parameters:
+        - xy (array-like): A (K, 2) array of pixel positions in the written
+        image, origin at the top left.
+
+        Returns:
+        - tuple: The (K,) face ids (-1 where nothing was drawn), the (K, 3)
+        barycentric coordinates and the (K, 3) world positions, nan for misses.
+        Face ids index the face array that was rendered.
+        """
+        if self.face_ids is None:
+            raise ObjectImageError("render with picking=True before picking")
+        xy = asarray(xy).reshape(-1, 2)
+        ids, bar = pick_buffer(
+            self.face_ids, self.screen_coords, xy[:, 0], self.height - 1 - xy[:, 1]
+        )
+        world = full((len(ids), 3), nan)
+        hit = ids >= 0
+        world[hit] = interpolate(
+            self.model.vertex_array, self.pick_faces[ids[hit]][..., 0], bar[hit]
+        )
+        return ids, bar, world
 
     def shader_triangle(self, shader):
         for i in range(self.model.nfaces()):
@@ -213,14 +749,132 @@ class ObjectImage:
                     self.image.set(P.x, P.y, color)
 
     def set(self, x, y, color):
-        self.pixels[x, y] = [color.r, color.g, color.b, color.a]
+        self.pixels[x, y] = self.pixel_values(color)
 
     def get(self, x, y):
         return self.pixels[x, y]
 
+    def pixel_values(self, colors) -> ndarray:
+        """
+        Convert colors to pixel values of this image.
+
+        Parameters:
+        - colors (ObjectColor | array-like): One color, or an array whose last
+        axis holds the channels of this image.
+
+        Returns:
+        - ndarray: The values in the dtype of the pixels.
+        """
+        if isinstance(colors, (ObjectColor, self.color_format)):
+            colors = (colors.r, colors.g, colors.b, colors.a)
+            channels = 1 if self.pixels.ndim == 2 else self.pixels.shape[2]
+            colors = colors[0] if channels == 1 else colors[:channels]
+        return asarray(colors, dtype=self.pixels.dtype)
+
+    def set_span(self, y, x0, x1, colors) -> None:
+        """
+        Write a horizontal run of pixels.
+
+        Parameters:
+        - y (int): The row.
+        - x0 (int): The first column.
+        - x1 (int): The column after the last one.
+        - colors (ObjectColor | array-like): One color for the whole run or
+        (x1 - x0, channels) colors.
+        """
+        self.pixels[x0:x1, y] = self.pixel_values(colors)
+
+    def scatter(self, xs, ys, colors, clip=False) -> None:
+        """
+        Write many single pixels at once.
+
+        Where a position repeats, the last of its colors is kept.
+
+        Parameters:
+        - xs (array-like): The (N,) columns.
+        - ys (array-like): The (N,) rows.
+        - colors (ObjectColor | array-like): One color for every pixel or
+        (N, channels) colors.
+        - clip (bool): Skip positions outside the image instead of raising an
+        IndexError.
+        """
+        xs, ys = asarray(xs, dtype=int64), asarray(ys, dtype=int64)
+        colors = self.pixel_values(colors)
+        width, height = self.pixels.shape[:2]
+        if clip:
+            inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+            if not inside.all():
+                xs, ys = xs[inside], ys[inside]
+                if colors.ndim == self.pixels.ndim - 1:
+                    colors = colors[inside]
+        elif len(xs) and (
+            xs.min() < 0 or ys.min() < 0 or xs.max() >= width or ys.max() >= height
+        ):
+            raise IndexError("pixel position outside the image")
+        if self.pixels.flags.c_contiguous:
+            # One flat index instead of two fancy indices
+            flat = self.pixels.reshape(width * height, -1)
+            flat[xs * height + ys] = colors.reshape(-1, flat.shape[1])
+        else:
+            self.pixels[xs, ys] = colors
+
+    def blit(self, mask, colors, origin=(0, 0)) -> None:
+        """
+        Write the pixels selected by a mask.
+
+        Parameters:
+        - mask (ndarray): A (w, h) [x, y] indexed bool array.
+        - colors (ObjectColor | array-like): One color, a (w, h, channels)
+        image to copy the masked pixels from, or (K, channels) colors, one per
+        set mask pixel in [x, y] order.
+        - origin (tuple): The (x, y) of the mask's first pixel in the image.
+        """
+        mask = asarray(mask, dtype=bool)
+        x, y = origin
+        region = self.pixels[x : x + mask.shape[0], y : y + mask.shape[1]]
+        if region.shape[:2] != mask.shape:
+            raise IndexError("mask does not fit inside the image")
+        colors = self.pixel_values(colors)
+        if colors.ndim == region.ndim - 1:
+            region[mask] = colors
+        else:
+            # Single colors and whole images are copied without a gather
+            copyto(region, colors, where=mask if region.ndim == 2 else mask[..., None])
+
+    def packed(self) -> ndarray:
+        """
+        View RGBA pixels as one uint32 per pixel.
+
+        The channels are in memory order, so on little endian machines red is
+        the lowest byte. Writes go straight to the pixels.
+
+        Returns:
+        - ndarray: A (width, height) uint32 view of the pixels.
+        """
+        if self.mode != "RGBA" or self.pixels.dtype != uint8:
+            raise ValueError("only uint8 RGBA images can be packed")
+        if self.pixels.strides[2] != 1:
+            raise ValueError("the channels of the pixels are not contiguous")
+        return self.pixels.view(uint32)[..., 0]
+
+    def get_width(self) -> int:
+        return self.pixels.shape[0]
+
+    def get_height(self) -> int:
+        return self.pixels.shape[1]
+
+    @property
+    def mode(self) -> str:
+        """The PIL mode matching the channels of the pixels."""
+        channels = 1 if self.pixels.ndim == 2 else self.pixels.shape[2]
+        return {1: "L", 3: "RGB", 4: "RGBA"}[channels]
+
     def read_file(self, filename: str) -> bool:
         """
-        Read a Object image file and store it as a PIL Image.
+        Read a Object image file into the pixel array.
+
+        TGA files are decoded straight into the array, other formats are
+        decoded by PIL and converted once.
 
         Parameters:
         - filename (str): The path to the Object image file.
@@ -229,25 +883,36 @@ class ObjectImage:
         - bool: True if successful, False otherwise.
         """
         try:
-            with Image.open(filename) as img:
-                data = array(img)
-                self.pixels = Image.fromarray(data)
-            return True
+            if is_tga(filename):
+                data = read_tga(filename)
+            else:
+                with open_stream(filename, "rb") as stream, Image.open(stream) as img:
+                    data = array(img)
         except (TypeError, ValueError, FileNotFoundError, UnidentifiedImageError) as e:
             raise ObjectImageError(str(e)) from e
+        self.pixels = data.swapaxes(0, 1)
+        self.width, self.height = self.pixels.shape[:2]
+        return True
 
-    def write_file(self, filename: str) -> bool:
+    def write_file(self, filename: str, rle: bool = False) -> bool:
         """
         Write the current image to a Object image file.
 
+        Flips, crops and channel selections are resolved while encoding, TGA
+        files are encoded straight from the view.
+
         Parameters:
         - filename (str): The path to save the Object image file.
+        - rle (bool): Run length encode a TGA file.
 
         Returns:
         - bool: True if successful, False otherwise.
         """
         try:
-            self.pixels.save(filename)
+            if is_tga(filename):
+                write_tga(filename, self.rows(), rle)
+            else:
+                self.to_image().save(filename)
             return True
         except (TypeError, ValueError, FileNotFoundError, UnidentifiedImageError) as e:
             raise ObjectImageError(str(e)) from e
@@ -256,62 +921,266 @@ class ObjectImage:
         """
         Flip the image horizontally.
 
+        The flip only changes the view of the pixel array, nothing is copied.
+
         Returns:
         - bool: True if successful, False if no image loaded.
         """
-        if self.pixels:
-            self.pixels = Image.fromarray(fliplr(array(self.pixels)))
-            return True
-        return False
+        if self.pixels is None:
+            return False
+        self.pixels = self.pixels[::-1]
+        return True
 
     def flip_vertically(self) -> bool:
         """
         Flip the image vertically.
 
+        The flip only changes the view of the pixel array, nothing is copied.
+
         Returns:
         - bool: True if successful, False if no image loaded.
         """
-        if self.pixels:
-            self.pixels = Image.fromarray(flipud(array(self.pixels)))
-            return True
-        return False
+        if self.pixels is None:
+            return False
+        self.pixels = self.pixels[:, ::-1]
+        return True
+
+    def crop(self, box) -> "ObjectImage":
+        """
+        Return a region of the image sharing its pixel array.
+
+        Parameters:
+        - box (tuple): The (left, upper, right, lower) pixel bounds, as
+        shown, with the origin at the top left.
+
+        Returns:
+        - ObjectImage: A view of the region.
+        """
+        left, upper, right, lower = box
+        return self.view(self.pixels[left:right, upper:lower])
+
+    def channels(self, index) -> "ObjectImage":
+        """
+        Return some channels of the image sharing its pixel array.
+
+        Parameters:
+        - index (int | slice): The channel, e.g. 3 for alpha, or a slice of
+        channels such as slice(0, 3) for RGB.
+
+        Returns:
+        - ObjectImage: A view of the channels.
+        """
+        return self.view(self.pixels[..., index])
+
+    def view(self, pixels: ndarray) -> "ObjectImage":
+        """
+        Return an image over a view of the pixel array.
+
+        Parameters:
+        - pixels (ndarray): The [x, y] indexed view.
+
+        Returns:
+        - ObjectImage: An image sharing the memory of the view.
+        """
+        width, height = pixels.shape[:2]
+        return ObjectImage(width, height, self.color_format, self.light_dir, pixels)
+
+    def materialize(self) -> "ObjectImage":
+        """
+        Copy the current view into a new contiguous array owned by the image.
+
+        Returns:
+        - ObjectImage: The image itself.
+        """
+        self.pixels = self.rows().copy().swapaxes(0, 1)
+        return self
+
+    def rows(self) -> ndarray:
+        """
+        Return the pixels as (height, width, channels) rows, top row first.
+
+        Returns:
+        - ndarray: A view of the pixel array, (height, width) for one channel.
+        """
+        return self.pixels.swapaxes(0, 1)
+
+    def to_image(self) -> Image.Image:
+        """
+        Return the pixels as a PIL image, resolving the view.
+
+        Returns:
+        - Image.Image: The image, in mode.
+        """
+        return Image.fromarray(ascontiguousarray(self.rows()), self.mode)
+
+    def tobytes(self) -> bytes:
+        """
+        Return the raw pixel bytes, top row first, as PIL would.
+
+        Returns:
+        - bytes: The pixels in mode.
+        """
+        return ascontiguousarray(self.rows()).tobytes()
 
 
 class ObjectModel:
-    def __init__(self, filename: str):
+    LOADER_THREADS = 4
+    _loader = None
+
+    def __init__(
+        self, filename: str, crease_angle: float = None, concurrent: bool = False
+    ):
         self.verts: list[Vector3] = []
         self.faces: list[list[tuple[int, int, int]]] = []
+        self.polygons: list[list[tuple[int, int, int]]] = []
+        self.polygon_array = None
         self.norms: list[Vector3] = []
         self.uv: list[Vector2] = []
+        self.vertex_colors: list[tuple[float, float, float]] = []
+        self.color_array = None
         self.diffusemap = ObjectImage(800, 600)
         self.normalmap = ObjectImage(800, 600)
         self.specularmap = ObjectImage(800, 600)
+        self.cache = None
+        self.occlusion_array = None
+        self.lod_levels = None
+        self.bvh = None
+        self.corner_array = None
+        self.index_array = None
+        self.object_names: list[str] = []
+        self.material_names: list[str] = []
+        self.object_array = None
+        self.material_array = None
+        self.crease_angle = crease_angle
+        self.concurrent = concurrent
 
         # Load model data from the .obj file
         self.load_model_data(filename)
 
+    @classmethod
+    def load_async(cls, filename: str, **kwargs) -> Future:
+        """
+        Load a model on a background thread.
+
+        The textures of the model are decoded concurrently with its mesh. Use
+        asyncio.wrap_future to await the result from a coroutine.
+
+        Parameters:
+        - filename (str): The model file.
+        - kwargs: Further ObjectModel arguments.
+
+        Returns:
+        - Future: Resolves to the loaded ObjectModel.
+        """
+        if cls._loader is None:
+            cls._loader = ThreadPoolExecutor(
+                max_workers=cls.LOADER_THREADS, thread_name_prefix="model-loader"
+            )
+        kwargs.setdefault("concurrent", True)
+        return cls._loader.submit(cls, filename, **kwargs)
+
     def load_model_data(self, filename: str):
-        vertices, normals, tex_coords, faces = self.load_obj(filename)
+        textures = (
+            ("_diffuse.tga", self.diffusemap),
+            ("_nm.tga", self.normalmap),
+            ("_spec.tga", self.specularmap),
+        )
+        if not self.concurrent:
+            self.load_mesh_data(filename)
+            for suffix, img in textures:
+                self.load_texture(filename, suffix, img)
+            return
+
+        # Texture decoding releases the GIL, so it overlaps the mesh parse
+        with ThreadPoolExecutor(max_workers=len(textures)) as pool:
+            pending = [
+                pool.submit(self.load_texture, filename, suffix, img)
+                for suffix, img in textures
+            ]
+            self.load_mesh_data(filename)
+            for future in pending:
+                future.result()
+
+    def load_mesh_data(self, filename: str):
+        if strip_compression(filename).endswith(MESH_SUFFIX):
+            # Binary meshes are stored already triangulated
+            vertices, normals, tex_coords, self.face_array = read_mesh(filename)
+            self.polygons = self.face_array.tolist()
+            self.polygon_array = arange(len(self.face_array))
+            self.face_objects = self.face_materials = [""] * len(self.face_array)
+        else:
+            vertices, normals, tex_coords, faces = self.load_obj(filename)
+
+            # Load faces, polygons are split into triangles
+            self.polygons = faces
+            self.face_array, self.polygon_array = triangulate(faces)
+
+        # Array views used by the batched shaders
+        self.vertex_array = array(vertices, dtype=float64).reshape(-1, 3)
+        self.normal_array = array(normals, dtype=float64).reshape(-1, 3)
+        self.uv_array = array(tex_coords, dtype=float64).reshape(-1, 2)
+        self.color_array = None
+        if self.vertex_colors and len(self.vertex_colors) == len(vertices):
+            # Scanners write either 0..1 or 0..255 vertex colors
+            self.color_array = array(self.vertex_colors, dtype=float64)
+            if self.color_array.max() > 1:
+                self.color_array /= 255
 
         # Load vertices
-        self.verts = [Vector3(*vertex) for vertex in vertices]
-
-        # Load normals
-        self.norms = [Vector3(*normal) for normal in normals]
+        self.verts = [Vector3(*vertex) for vertex in self.vertex_array.tolist()]
 
         # Load texture coordinates
-        self.uv = [Vector2(*tex_coord) for tex_coord in tex_coords]
-
-        # Load faces
-        self.faces = faces
+        self.uv = [Vector2(*tex_coord) for tex_coord in self.uv_array.tolist()]
+
+        # Load normals, generating them when the file lacks some, stored unit
+        # length so nothing normalizes them again
+        if (self.face_array[..., 2] < 0).any() or self.crease_angle is not None:
+            self.normal_array, self.face_array[..., 2] = smooth_normals(
+                self.vertex_array, self.face_array[..., 0], self.crease_angle
+            )
+        else:
+            self.normal_array = normalize_rows(self.normal_array)
+        self.norms = [Vector3(*normal) for normal in self.normal_array.tolist()]
+        self.faces = [
+            [tuple(corner) for corner in face] for face in self.face_array.tolist()
+        ]
+        self.corner_array, self.index_array = index_vertices(self.face_array)
+
+        # Face groups for visibility queries
+        self.object_names, self.object_array = self.group_faces(self.face_objects)
+        self.material_names, self.material_array = self.group_faces(
+            self.face_materials
+        )
+        self.object_array = self.object_array[self.polygon_array]
+        self.material_array = self.material_array[self.polygon_array]
+
+        # Derived data baked for this mesh by earlier runs
+        self.cache = MeshCache(filename)
+        self.occlusion_array = self.cache.get("occlusion")
+        ratios = self.cache.get("lod_ratios")
+        if ratios is not None:
+            self.lod_levels = [self.face_array] + [
+                self.cache.get(f"lod_{i}") for i in range(len(ratios))
+            ]
+
+    def save_mesh(self, filename: str) -> None:
+        """
+        Write the triangulated model in the compact binary mesh format.
 
-        # Load textures
-        self.load_texture(filename, "_diffuse.tga", self.diffusemap)
-        self.load_texture(filename, "_nm.tga", self.normalmap)
-        self.load_texture(filename, "_spec.tga", self.specularmap)
+        Parameters:
+        - filename (str): The destination, ending in .rmesh so ObjectModel
+        loads it back through read_mesh.
+        """
+        write_mesh(
+            filename, self.vertex_array, self.normal_array, self.uv_array, self.face_array
+        )
 
     def load_texture(self, filename: str, suffix: str, img: ObjectImage):
-        texfile = filename.split(".")[0] + suffix
+        texfile = find_asset(filename.split(".")[0] + suffix)
+        if not os.path.exists(texfile):
+            # Scans and point clouds come without textures, keep the blank one
+            print(f"Texture file {texfile} missing")
+            return
         print(
             f"Texture file {texfile} loading {'ok' if img.read_file(texfile) else 'failed'}"
         )
@@ -329,8 +1198,12 @@ class ObjectModel:
         normals = []
         tex_coords = []
         faces = []
+        self.face_objects = []
+        self.face_materials = []
+        self.vertex_colors = []
+        current_object = current_material = ""
 
-        with open(filename, "r") as file:
+        with open_stream(filename) as file:
             for line in file:
                 tokens = line.split()
 
@@ -339,23 +1212,61 @@ class ObjectModel:
 
                 if tokens[0] == "v":
                     vertices.append(tuple(map(float, tokens[1:4])))
+                    if len(tokens) >= 7:
+                        self.vertex_colors.append(tuple(map(float, tokens[4:7])))
                 elif tokens[0] == "vn":
                     normals.append(tuple(map(float, tokens[1:4])))
                 elif tokens[0] == "vt":
                     tex_coords.append(tuple(map(float, tokens[1:3])))
                 elif tokens[0] == "f":
-                    face = [
-                        (
-                            int(v.split("/")[0]) - 1,
-                            int(v.split("/")[1]) - 1,
-                            int(v.split("/")[2]) - 1,
-                        )
-                        for v in tokens[1:]
-                    ]
+                    sizes = (len(vertices), len(tex_coords), len(normals))
+                    face = [self.parse_corner(v, sizes) for v in tokens[1:]]
                     faces.append(face)
+                    self.face_objects.append(current_object)
+                    self.face_materials.append(current_material)
+                elif tokens[0] in ("o", "g"):
+                    current_object = " ".join(tokens[1:])
+                elif tokens[0] == "usemtl":
+                    current_material = " ".join(tokens[1:])
 
         return vertices, normals, tex_coords, faces
 
+    @staticmethod
+    def parse_corner(token: str, sizes: tuple[int, int, int]) -> tuple[int, int, int]:
+        """
+        Parse one v, v/vt, v//vn or v/vt/vn face corner.
+
+        Parameters:
+        - token (str): The corner as written in the file.
+        - sizes (tuple): The number of positions, uvs and normals read so far,
+        used to resolve negative relative indices.
+
+        Returns:
+        - tuple: The zero based (v, vt, vn) indices, -1 where one is missing.
+        """
+        parts = (token.split("/") + ["", ""])[:3]
+        return tuple(
+            -1 if not part else int(part) - 1 if int(part) > 0 else size + int(part)
+            for part, size in zip(parts, sizes)
+        )
+
+    @staticmethod
+    def group_faces(names: list[str]) -> tuple[list[str], ndarray]:
+        """
+        Number face group names in order of first appearance.
+
+        Parameters:
+        - names (list[str]): The group name of every face.
+
+        Returns:
+        - tuple: The distinct names and the (F,) int64 group of every face.
+        """
+        index = {}
+        groups = array(
+            [index.setdefault(name, len(index)) for name in names], dtype=int64
+        )
+        return list(index), groups
+
     def nverts(self) -> int:
         return len(self.verts)
 
@@ -364,7 +1275,7 @@ class ObjectModel:
 
     def normal(self, iface: int, nthvert: int) -> Vector3:
         idx = self.faces[iface][nthvert][2]
-        return self.norms[idx].normalize()
+        return self.norms[idx]
 
     def vert(self, i: int) -> Vector3:
         return self.verts[i]
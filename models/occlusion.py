@@ -0,0 +1,140 @@
+"""
+Module Summary: Contains the ambient occlusion baker.
+
+Occlusion is baked per vertex by casting a cosine weighted hemisphere of rays
+from every vertex against the mesh BVH. Vertices are split into chunks that
+are traced on a process pool, and the result is kept in the mesh cache so the
+bake is paid once per asset.
+
+Returns:
+    Functions:
+        vertex_normals: Averages the corner normals of a model per vertex.
+        bake_occlusion: Bakes per vertex ambient occlusion for a model.
+        ambient_occlusion: Returns cached occlusion, baking it when missing.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from numpy import add, array, concatenate, float32, ndarray, zeros
+from numpy.linalg import norm
+
+from models.bvh import mesh_bvh
+from models.geometry.rays import hemisphere
+from models.shaders import normalize_rows
+
+_bvh = None
+
+
+def _set_bvh(bvh) -> None:
+    global _bvh
+    _bvh = bvh
+
+
+def _trace_chunk(origins: ndarray, directions: ndarray, max_distance: float) -> ndarray:
+    samples = directions.shape[1]
+    blocked = _bvh.occluded(
+        origins.repeat(samples, axis=0), directions.reshape(-1, 3), max_distance
+    )
+    return 1.0 - blocked.reshape(-1, samples).mean(axis=1)
+
+
+def vertex_normals(model) -> ndarray:
+    """
+    Averages the corner normals of a model per vertex.
+
+    Vertices no face references, or whose corner normals cancel out, get +z
+    so a hemisphere can still be built around them.
+
+    Args:
+        model (ObjectModel): The model.
+
+    Returns:
+        ndarray: An (V, 3) array of unit vertex normals.
+    """
+    normals = zeros(model.vertex_array.shape)
+    corners = model.face_array.reshape(-1, 3)
+    add.at(normals, corners[:, 0], model.normal_array[corners[:, 2]])
+    normals = normalize_rows(normals)
+    normals[~normals.any(axis=1)] = (0.0, 0.0, 1.0)
+    return normals
+
+
+def bake_occlusion(
+    model,
+    samples: int = 64,
+    max_distance: float = None,
+    processes: int = None,
+    chunk: int = 256,
+) -> ndarray:
+    """
+    Bakes per vertex ambient occlusion for a model.
+
+    Args:
+        model (ObjectModel): The model to bake.
+        samples (int, optional): Rays per vertex. Defaults to 64.
+        max_distance (float, optional): Occluders farther than this are
+            ignored. Defaults to a quarter of the bounding box diagonal.
+        processes (int, optional): Worker processes, 1 traces in process.
+            Defaults to one per core.
+        chunk (int, optional): Vertices per task. Defaults to 256.
+
+    Returns:
+        ndarray: An (V,) float32 array, 1 for fully open and 0 for fully
+        occluded vertices.
+    """
+    vertices = model.vertex_array
+    if max_distance is None:
+        max_distance = 0.25 * norm(vertices.max(axis=0) - vertices.min(axis=0))
+    bvh = mesh_bvh(model)
+    normals = vertex_normals(model)
+    origins = vertices + normals * (1e-4 * max_distance)
+    directions = hemisphere(normals, samples)
+
+    tasks = [
+        (origins[i : i + chunk], directions[i : i + chunk], max_distance)
+        for i in range(0, len(vertices), chunk)
+    ]
+    if not tasks:
+        return zeros(0, dtype=float32)
+    if processes == 1:
+        _set_bvh(bvh)
+        results = [_trace_chunk(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=processes, initializer=_set_bvh, initargs=(bvh,)
+        ) as executor:
+            results = list(executor.map(_trace_chunk, *zip(*tasks)))
+    return concatenate(results).astype(float32)
+
+
+def ambient_occlusion(model, samples: int = 64, processes: int = None) -> ndarray:
+    """
+    Returns cached occlusion, baking it when missing.
+
+    The baked array is stored in the model's mesh cache with its sample
+    count and set as model.occlusion_array. A bake with a different sample
+    count is baked again.
+
+    Args:
+        model (ObjectModel): The model.
+        samples (int, optional): Rays per vertex when baking. Defaults to 64.
+        processes (int, optional): Worker processes when baking.
+
+    Returns:
+        ndarray: The (V,) per vertex occlusion.
+    """
+    cache = getattr(model, "cache", None)
+    occlusion = baked = None
+    if cache is not None:
+        occlusion, baked = cache.get("occlusion"), cache.get("occlusion_samples")
+    if (
+        occlusion is None
+        or len(occlusion) != len(model.vertex_array)
+        or baked is None
+        or int(baked) != samples
+    ):
+        occlusion = bake_occlusion(model, samples, processes=processes)
+        if cache is not None:
+            cache.put(occlusion=occlusion, occlusion_samples=array(samples))
+    model.occlusion_array = occlusion
+    return occlusion
@@ -0,0 +1,115 @@
+"""
+Module Summary: Contains the drawing primitives handed to the line renderer.
+
+Returns:
+    Classes:
+        Line: A colored line segment between two pixel positions.
+"""
+
+from numbers import Integral, Real
+
+
+def _point(point) -> tuple:
+    """Validates an (x, y) pixel position."""
+    if isinstance(point, (str, bytes)):
+        raise TypeError("line ends must be (x, y) number pairs")
+    try:
+        x, y = point
+    except (TypeError, ValueError) as error:
+        raise TypeError("line ends must be (x, y) number pairs") from error
+    if not isinstance(x, Real) or not isinstance(y, Real):
+        raise TypeError("line ends must be (x, y) number pairs")
+    return x, y
+
+
+def _color(color) -> tuple:
+    """Validates an RGB color."""
+    color = tuple(color)
+    if len(color) != 3 or not all(
+        isinstance(value, Integral) and 0 <= value <= 255 for value in color
+    ):
+        raise ValueError("line colors must be three integers from 0 to 255")
+    return color
+
+
+class Line:
+    """
+    A colored line segment between two pixel positions.
+
+    Attributes:
+        start (tuple[int, int]): The (x, y) of the first end.
+        end (tuple[int, int]): The (x, y) of the second end.
+        color (tuple[int, int, int]): The RGB color.
+
+    Methods:
+        swap_if_steep: Transposes a steep line so it runs along x.
+        get_y_value: Returns the y of the line at an x position.
+    """
+
+    def __init__(self, start, end, color=(255, 255, 255)) -> None:
+        """
+        Args:
+            start (tuple[int, int]): The (x, y) of the first end.
+            end (tuple[int, int]): The (x, y) of the second end.
+            color (tuple[int, int, int], optional): The RGB color. Defaults to
+                white.
+
+        Raises:
+            TypeError: If an end is not an (x, y) pair of numbers.
+            ValueError: If the color is not three integers from 0 to 255.
+        """
+        self.start = _point(start)
+        self.end = _point(end)
+        self.color = _color(color)
+
+    @property
+    def x0(self):
+        return self.start[0]
+
+    @property
+    def y0(self):
+        return self.start[1]
+
+    @property
+    def x1(self):
+        return self.end[0]
+
+    @property
+    def y1(self):
+        return self.end[1]
+
+    def swap_if_steep(self) -> bool:
+        """
+        Transposes a steep line so it runs along x.
+
+        Returns:
+            bool: Whether the line was steeper than 45 degrees and its x and y
+            were swapped.
+        """
+        steep = abs(self.y1 - self.y0) > abs(self.x1 - self.x0)
+        if steep:
+            self.start, self.end = self.start[::-1], self.end[::-1]
+        return steep
+
+    def get_y_value(self, x) -> float:
+        """
+        Returns the y of the line at an x position.
+
+        Args:
+            x (float): The x position.
+
+        Returns:
+            float: The interpolated y, y0 for a vertical line.
+        """
+        if self.x1 == self.x0:
+            return self.y0
+        return self.y0 + (x - self.x0) * (self.y1 - self.y0) / (self.x1 - self.x0)
+
+    def __str__(self) -> str:
+        return (
+            f"Line from ({self.x0}, {self.y0}) to ({self.x1}, {self.y1}) "
+            f"with color {self.color}"
+        )
+
+    def __repr__(self) -> str:
+        return f"Line({self.start}, {self.end}, {self.color})"
@@ -0,0 +1,436 @@
+"""
+Module Summary: Contains batched shaders for the array rasterizer.
+
+Returns:
+    Functions:
+        texture_array: Returns the pixels of a texture as an [x, y] indexed array.
+        sample: Samples a texture at an array of uv coordinates.
+        interpolate: Interpolates per vertex values at fragment barycentrics.
+        normalize_rows: Normalizes an array of vectors.
+        shadow_map: Renders a depth only map of the model as seen from the light.
+    Classes:
+        ObjectIndexedShader: Batched shader base working on the unique vertex buffer.
+        ObjectGouraudShader: Shader lighting every unique vertex once.
+        ObjectPhongShader: Blinn-Phong shader using the diffuse and specular maps.
+        ObjectDepthShader: Vertex only shader for depth passes.
+        ObjectShadowShader: Wraps a batched shader and darkens shadowed fragments.
+        ObjectOcclusionShader: Wraps a batched shader and applies baked occlusion.
+"""
+
+from types import SimpleNamespace
+
+from numpy import (
+    arange,
+    asarray,
+    clip,
+    einsum,
+    empty,
+    float64,
+    floor,
+    full,
+    inf,
+    int64,
+    ndarray,
+    repeat,
+    tile,
+    unique,
+    zeros,
+)
+from numpy.linalg import norm
+
+from engines.rasterizer import rasterize
+from models.geometry.transforms import (
+    as_vector,
+    camera_matrices,
+    projection,
+    transform,
+)
+from models.interfaces.shaders import IBatchShader
+from models.meshes import NORMAL, POSITION, UV, index_vertices, vertex_attributes
+
+SHADOW_SIZE = 512
+SHADOW_PCF = 1
+SHADOW_BIAS = 2.0
+
+
+def texture_array(image) -> ndarray:
+    """
+    Returns the pixels of a texture as an [x, y] indexed array.
+
+    Args:
+        image (ObjectImage): The texture image.
+
+    Returns:
+        ndarray: A (W, H, C) array, or None when the image has no pixels.
+    """
+    pixels = getattr(image, "pixels", image)
+    if pixels is None:
+        return None
+    if isinstance(pixels, ndarray):
+        data = pixels
+    else:
+        # PIL images are stored row major
+        data = asarray(pixels).swapaxes(0, 1)
+    if data.ndim == 2:
+        data = data[..., None]
+    return data
+
+
+def sample(texture: ndarray, uv: ndarray) -> ndarray:
+    """
+    Samples a texture at an array of uv coordinates.
+
+    Args:
+        texture (ndarray): A (W, H, C) texture array.
+        uv (ndarray): A (K, 2) array of uv coordinates in [0, 1].
+
+    Returns:
+        ndarray: The (K, C) nearest texels.
+    """
+    width, height = texture.shape[:2]
+    x = clip((uv[:, 0] * width).astype(int64), 0, width - 1)
+    y = clip((uv[:, 1] * height).astype(int64), 0, height - 1)
+    return texture[x, y]
+
+
+def interpolate(values: ndarray, indices: ndarray, bar: ndarray) -> ndarray:
+    """
+    Interpolates per vertex values at fragment barycentrics.
+
+    Args:
+        values (ndarray): An (N, D) array of per vertex values.
+        indices (ndarray): A (K, 3) array of vertex indices per fragment.
+        bar (ndarray): A (K, 3) array of barycentric coordinates.
+
+    Returns:
+        ndarray: The (K, D) interpolated values.
+    """
+    return einsum("kij,ki->kj", values[indices], bar)
+
+
+def normalize_rows(vectors: ndarray) -> ndarray:
+    """
+    Normalizes an array of vectors.
+
+    Args:
+        vectors (ndarray): An (K, D) array of vectors.
+
+    Returns:
+        ndarray: The vectors scaled to unit length, zero vectors are kept.
+    """
+    lengths = norm(vectors, axis=-1, keepdims=True)
+    lengths[lengths == 0] = 1
+    return vectors / lengths
+
+
+class ObjectIndexedShader(IBatchShader):
+    """
+    Batched shader base working on the unique vertex buffer.
+
+    Assigning faces indexes them into unique (v, vt, vn) vertices, reusing the
+    model's buffer for its own face array. The vertex stage then transforms
+    every unique vertex the requested faces use once and gathers their
+    corners.
+    The attributes interpolated for the last fragment batch are kept as
+    varying, so wrapping shaders can reuse them.
+    """
+
+    frame_state = ("varying",)
+
+    def __init__(self, model, light_dir, faces=None):
+        super().__init__(model, light_dir)
+        self.faces = model.face_array if faces is None else faces
+        self.varying = None
+
+    @property
+    def faces(self) -> ndarray:
+        return self._faces
+
+    @faces.setter
+    def faces(self, faces) -> None:
+        self._faces = asarray(faces)
+        model = self.model
+        shared = getattr(model, "index_array", None) is not None
+        if shared and faces is model.face_array:
+            corners, self.indices = model.corner_array, model.index_array
+        else:
+            corners, self.indices = index_vertices(self._faces)
+        self.attributes = vertex_attributes(model, corners)
+
+    def used_vertices(self, faces) -> tuple:
+        """
+        Returns the unique vertices a batch of faces uses.
+
+        Args:
+            faces (ndarray): The (F,) face ids.
+
+        Returns:
+            tuple[ndarray | slice, ndarray]: The used unique vertex ids, a full
+            slice when every face is requested, and the (F, 3) corners of the
+            faces indexing into them.
+        """
+        corners = self.indices[faces]
+        if len(faces) >= len(self._faces):
+            return slice(None), corners
+        used, inverse = unique(corners, return_inverse=True)
+        return used, inverse.reshape(corners.shape)
+
+    def transform_vertices(self, used) -> ndarray:
+        """Returns the homogeneous screen coordinates of unique vertices."""
+        matrix = self.viewport_matrix @ self.projection_matrix @ self.model_view_matrix
+        return transform(matrix, self.attributes[used, POSITION])
+
+    def vertex(self, faces):
+        used, corners = self.used_vertices(faces)
+        return self.transform_vertices(used)[corners]
+
+    def interpolate_attributes(self, faces, bar) -> ndarray:
+        """Interpolates the vertex attributes of a fragment batch into varying."""
+        self.varying = interpolate(self.attributes, self.indices[faces], bar)
+        return self.varying
+
+
+class ObjectGouraudShader(ObjectIndexedShader):
+    """
+    Shader lighting every unique vertex once.
+
+    The vertex stage computes the diffuse intensity of the vertices it
+    transforms and fragments interpolate it, like the per face ObjectShader
+    but without lighting shared corners again for every face.
+    """
+
+    frame_state = ("varying", "intensity")
+
+    def __init__(self, model, light_dir, faces=None):
+        super().__init__(model, light_dir, faces)
+        self.light = normalize_rows(as_vector(light_dir)[None])[0]
+        self.intensity = zeros(len(self.attributes))
+
+    def vertex(self, faces):
+        used, corners = self.used_vertices(faces)
+        if len(self.intensity) != len(self.attributes):
+            self.intensity = zeros(len(self.attributes))
+        normals = normalize_rows(self.attributes[used, NORMAL])
+        self.intensity[used] = clip(normals @ self.light, 0, None)
+        return self.transform_vertices(used)[corners]
+
+    def fragment(self, faces, bar):
+        intensity = einsum("ki,ki->k", self.intensity[self.indices[faces]], bar)
+        colors = empty((len(bar), 4), dtype="uint8")
+        colors[:, :3] = (255 * clip(intensity, 0, 1))[:, None]
+        colors[:, 3] = 255
+        return colors, zeros(len(bar), dtype=bool)
+
+
+class ObjectPhongShader(ObjectIndexedShader):
+    """
+    Blinn-Phong shader using the diffuse and specular maps.
+
+    Normals, uvs and positions are interpolated per fragment and the diffuse,
+    specular and ambient terms are computed for the whole batch at once. The
+    specular map gives the per texel shininess exponent. Highlights are seen
+    from the render camera unless a fixed eye is given.
+    """
+
+    def __init__(
+        self,
+        model,
+        light_dir,
+        eye=None,
+        ambient: float = 5.0,
+        diffuse: float = 1.0,
+        specular: float = 0.6,
+    ):
+        super().__init__(model, light_dir)
+        self.light = normalize_rows(as_vector(light_dir)[None])[0]
+        self.eye = None if eye is None else as_vector(eye)
+        self.view_eye = as_vector((0, 0, 1)) if eye is None else self.eye
+        self.ambient = ambient
+        self.kd = diffuse
+        self.ks = specular
+        self.diffuse_texture = texture_array(model.diffusemap)
+        self.specular_texture = texture_array(model.specularmap)
+
+    def set_camera(self, camera):
+        if self.eye is None:
+            self.view_eye = as_vector(camera.eye)
+
+    def fragment(self, faces, bar):
+        data = self.interpolate_attributes(faces, bar)
+        position, uv = data[:, POSITION], data[:, UV]
+        n = normalize_rows(data[:, NORMAL])
+        h = normalize_rows(self.light + normalize_rows(self.view_eye - position))
+
+        diff = clip(n @ self.light, 0, None)
+        shininess = 1.0
+        if self.specular_texture is not None:
+            shininess = shininess + sample(self.specular_texture, uv)[:, 0]
+        spec = clip(einsum("kj,kj->k", n, h), 0, None) ** shininess
+        albedo = (
+            sample(self.diffuse_texture, uv)[:, :3].astype(float64)
+            if self.diffuse_texture is not None
+            else 255.0
+        )
+
+        colors = empty((len(bar), 4), dtype="uint8")
+        colors[:, :3] = clip(
+            self.ambient + albedo * (self.kd * diff + self.ks * spec)[:, None], 0, 255
+        )
+        colors[:, 3] = 255
+        return colors, zeros(len(bar), dtype=bool)
+
+
+class ObjectDepthShader(ObjectIndexedShader):
+    """
+    Vertex only shader for depth passes.
+
+    It is meant for rasterize without a shader argument, so no color work is
+    done. Run as a full shader it fills every fragment with opaque white.
+    """
+
+    def __init__(self, model, faces=None):
+        super().__init__(model, None, faces)
+
+    def fragment(self, faces, bar):
+        return full((len(faces), 4), 255, dtype="uint8"), zeros(len(faces), dtype=bool)
+
+
+def shadow_map(
+    model, light_dir, center, width: int, height: int, faces=None
+) -> tuple[ndarray, ndarray]:
+    """
+    Renders a depth only map of the model as seen from the light.
+
+    Args:
+        model (ObjectModel): The model casting the shadows.
+        light_dir (Vector3): The direction towards the light.
+        center (Vector3): The point the light looks at.
+        width (int): The shadow map width.
+        height (int): The shadow map height.
+        faces (ndarray, optional): The face array to render. Defaults to the
+            model's face array.
+
+    Returns:
+        tuple[ndarray, ndarray]: The (W, H) shadow map and the 4x4 matrix taking
+        world positions into shadow map space.
+    """
+    light = normalize_rows(as_vector(light_dir)[None])[0]
+    up = (1.0, 0.0, 0.0) if abs(light[1]) > 0.99 else (0.0, 1.0, 0.0)
+    camera = SimpleNamespace(eye=as_vector(center) + light, center=center, up=up)
+
+    # Directional light, so the perspective term is dropped
+    model_view, _, view = camera_matrices(camera, width, height)
+    shader = ObjectDepthShader(model, faces)
+    shader.set_matrices(model_view, projection(0), view)
+    ids = arange(len(shader.faces))
+    depth = full((width, height), -inf)
+    rasterize(shader.vertex(ids), depth)
+    return depth, view @ projection(0) @ model_view
+
+
+class ObjectShadowShader(IBatchShader):
+    """
+    Wraps a batched shader and darkens fragments hidden from the light.
+
+    Every fragment batch is moved into shadow map space and compared against
+    the stored depths. With pcf > 0 a (2 * pcf + 1) square kernel around each
+    fragment is compared at once and the lit fraction softens the edge.
+    World positions are taken from the wrapped shader's varying when it has
+    them instead of interpolating them again.
+    """
+
+    def __init__(
+        self,
+        shader,
+        shadow: ndarray,
+        light_matrix: ndarray,
+        pcf: int = SHADOW_PCF,
+        bias: float = SHADOW_BIAS,
+        darkness: float = 0.3,
+    ):
+        super().__init__(shader.model, shader.light_dir)
+        self.shader = shader
+        self.faces = shader.faces
+        self.shadow = shadow
+        self.light_matrix = light_matrix
+        self.bias = bias
+        self.darkness = darkness
+        offsets = arange(-pcf, pcf + 1)
+        self.dx = repeat(offsets, len(offsets))
+        self.dy = tile(offsets, len(offsets))
+
+    def set_matrices(self, model_view, projection, viewport):
+        super().set_matrices(model_view, projection, viewport)
+        self.shader.set_matrices(model_view, projection, viewport)
+
+    def set_camera(self, camera):
+        self.shader.set_camera(camera)
+
+    def vertex(self, faces):
+        return self.shader.vertex(faces)
+
+    @property
+    def varying(self) -> ndarray:
+        return getattr(self.shader, "varying", None)
+
+    def visibility(self, positions: ndarray) -> ndarray:
+        """
+        Returns the lit fraction of an array of world positions.
+
+        Args:
+            positions (ndarray): An (K, 3) array of world positions.
+
+        Returns:
+            ndarray: The (K,) fraction of the kernel that sees the light.
+        """
+        light = transform(self.light_matrix, positions)
+        light = light[:, :3] / light[:, 3:]
+        width, height = self.shadow.shape
+        x = clip(floor(light[:, :1]).astype(int64) + self.dx, 0, width - 1)
+        y = clip(floor(light[:, 1:2]).astype(int64) + self.dy, 0, height - 1)
+        return (light[:, 2:3] + self.bias >= self.shadow[x, y]).mean(axis=1)
+
+    def fragment(self, faces, bar):
+        colors, discard = self.shader.fragment(faces, bar)
+        varying = self.varying
+        if varying is not None and len(varying) == len(bar):
+            position = varying[:, POSITION]
+        else:
+            position = interpolate(
+                self.model.vertex_array, self.faces[faces][..., 0], bar
+            )
+        lit = self.darkness + (1 - self.darkness) * self.visibility(position)
+        colors[:, :3] = colors[:, :3] * lit[:, None]
+        return colors, discard
+
+
+class ObjectOcclusionShader(IBatchShader):
+    """
+    Wraps a batched shader and multiplies in baked per vertex occlusion.
+    """
+
+    def __init__(self, shader, occlusion: ndarray):
+        super().__init__(shader.model, shader.light_dir)
+        self.shader = shader
+        self.faces = shader.faces
+        self.occlusion = asarray(occlusion, dtype=float64).reshape(-1, 1)
+
+    def set_matrices(self, model_view, projection, viewport):
+        super().set_matrices(model_view, projection, viewport)
+        self.shader.set_matrices(model_view, projection, viewport)
+
+    def set_camera(self, camera):
+        self.shader.set_camera(camera)
+
+    def vertex(self, faces):
+        return self.shader.vertex(faces)
+
+    @property
+    def varying(self) -> ndarray:
+        return getattr(self.shader, "varying", None)
+
+    def fragment(self, faces, bar):
+        colors, discard = self.shader.fragment(faces, bar)
+        occlusion = interpolate(self.occlusion, self.faces[faces][..., 0], bar)
+        colors[:, :3] = colors[:, :3] * occlusion
+        return colors, discard
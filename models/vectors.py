@@ -2,6 +2,10 @@ from math import sqrt
 
 from numpy import eye
 
+from models.geometry.vectors_2d import Vector2
+from models.geometry.vectors_3d import Vector3
+from models.geometry.vectors_4d import Vector4
+
 
 class Matrix:
     def __init__(self, rows: int, cols: int):
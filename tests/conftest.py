@@ -0,0 +1,29 @@
+"""Shared fixtures for the test modules
+"""
+from types import SimpleNamespace
+
+from numpy import array, full, uint8
+from pytest import fixture
+
+
+@fixture
+def triangle_model():
+    """
+    Factory for a single triangle model facing +z with flat textures.
+
+    Returns:
+    Callable: Builds a SimpleNamespace exposing the array attributes used by
+    shaders, with the given diffuse and specular texel values.
+    """
+
+    def build(diffuse=200, specular=0):
+        return SimpleNamespace(
+            vertex_array=array([[-1.0, -1.0, 0.0], [1.0, -1.0, 0.0], [0.0, 1.0, 0.0]]),
+            uv_array=array([[0.0, 0.0], [1.0, 0.0], [0.5, 1.0]]),
+            normal_array=array([[0.0, 0.0, 1.0]] * 3),
+            face_array=array([[[0, 0, 0], [1, 1, 1], [2, 2, 2]]]),
+            diffusemap=SimpleNamespace(pixels=full((4, 4, 4), diffuse, dtype=uint8)),
+            specularmap=SimpleNamespace(pixels=full((4, 4), specular, dtype=uint8)),
+        )
+
+    return build
@@ -0,0 +1,80 @@
+"""Test module for the bounding volume hierarchy
+"""
+from types import SimpleNamespace
+
+from numpy import arange, inf, isclose, where
+from numpy.random import default_rng
+
+from models.bvh import BVH, mesh_bvh
+from models.cache import MeshCache
+from models.geometry.rays import intersect, triangle_edges
+
+
+def init_soup(count=300, seed=7):
+    """
+    Build a random triangle soup.
+
+    Returns:
+    ndarray: A (count, 3, 3) array of triangle corners.
+    """
+    rng = default_rng(seed)
+    centers = rng.uniform(-1, 1, (count, 1, 3))
+    return centers + rng.normal(scale=0.1, size=(count, 3, 3))
+
+
+def init_rays(count=500, seed=3):
+    """Build rays starting outside the soup aimed through it."""
+    rng = default_rng(seed)
+    origins = rng.normal(size=(count, 3)) * 3
+    return origins, -origins + rng.normal(scale=0.5, size=(count, 3))
+
+
+def test_closest_hit_matches_brute_force():
+    """Closest hits agree with testing every triangle"""
+    triangles = init_soup()
+    origins, directions = init_rays()
+    t, tri, _, _ = BVH(triangles).intersect(origins, directions)
+    brute, _, _ = intersect(
+        origins[:, None], directions[:, None], *triangle_edges(triangles)
+    )
+    assert isclose(t, brute.min(axis=1)).all()
+    hit = tri >= 0
+    assert hit.any()
+    assert (tri[hit] == brute.argmin(axis=1)[hit]).all()
+
+
+def test_any_hit():
+    """Occlusion queries agree with testing every triangle"""
+    triangles = init_soup()
+    origins, directions = init_rays()
+    brute, _, _ = intersect(
+        origins[:, None], directions[:, None], *triangle_edges(triangles), t_max=1.0
+    )
+    occluded = BVH(triangles).occluded(origins, directions, t_max=1.0)
+    assert (occluded == (brute < inf).any(axis=1)).all()
+
+
+def test_query_box_and_point():
+    """Box and point queries return the triangles whose bounds overlap"""
+    triangles = init_soup()
+    bvh = BVH(triangles)
+    lower, upper = triangles.min(axis=1), triangles.max(axis=1)
+    expected = where(((lower <= 0.2) & (upper >= -0.2)).all(axis=1))[0]
+    assert bvh.query_box([-0.2] * 3, [0.2] * 3).tolist() == expected.tolist()
+    point = triangles[5].mean(axis=0)
+    assert 5 in bvh.query_point(point)
+
+
+def test_mesh_bvh_cached(tmp_path):
+    """The node arrays are stored in the mesh cache and reused"""
+    triangles = init_soup(50)
+    model = SimpleNamespace(
+        vertex_array=triangles.reshape(-1, 3),
+        face_array=arange(150).reshape(50, 3, 1).repeat(3, axis=2),
+        cache=MeshCache(str(tmp_path / "soup.obj")),
+    )
+    bvh = mesh_bvh(model)
+    assert model.bvh is bvh and "bvh_order" in model.cache
+    restored = mesh_bvh(model)
+    assert restored is not bvh
+    assert (restored.order == bvh.order).all()
@@ -0,0 +1,133 @@
+"""Test module for the render daemon
+"""
+from types import SimpleNamespace
+
+from numpy import full, uint8
+from PIL import Image
+from pytest import fixture, raises
+
+from engines.daemon import ModelCache, RenderDaemon, send_request
+from models.objects import ObjectImage
+
+
+def fake_renderer(model, request):
+    """Fill the frame with the model's gray level instead of rendering"""
+    size = (request["width"], request["height"])
+    color = full(size + (4,), model.gray, dtype=uint8)
+    depth = full(size, 7, dtype=uint8)
+    return SimpleNamespace(
+        image=ObjectImage(*size, pixels=color),
+        zbuffer=ObjectImage(*size, pixels=depth),
+    )
+
+
+@fixture
+def asset(tmp_path):
+    """A model file and a loader counting how often it is called"""
+    path = tmp_path / "model.obj"
+    path.write_text("v 0 0 0\n")
+    loads = []
+
+    def loader(filename):
+        loads.append(filename)
+        return SimpleNamespace(gray=len(loads))
+
+    return str(path), loader, loads
+
+
+def test_model_cache_lru(tmp_path, asset):
+    """Repeat requests hit the cache and the oldest model is evicted"""
+    path, loader, loads = asset
+    other = tmp_path / "other.obj"
+    other.write_text("v 0 0 0\n")
+    cache = ModelCache(1, loader)
+    assert cache.get(path) is cache.get(path)
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.get(str(other))
+    cache.get(path)
+    assert len(loads) == 3 and len(cache) == 1
+
+
+def test_daemon_unix_socket(tmp_path, asset):
+    """Frames come back as raw bytes and the model stays loaded"""
+    path, loader, loads = asset
+    daemon = RenderDaemon(
+        str(tmp_path / "render.sock"), loader=loader, renderer=fake_renderer
+    )
+    daemon.start()
+    try:
+        request = {"model": path, "width": 4, "height": 2}
+        for _ in range(2):
+            header, payload = send_request(daemon.address, request, timeout=5)
+            assert header["ok"] and header["mode"] == "RGBA"
+            assert payload == bytes([1] * 4 * 4 * 2)
+        assert header["cache"] == {"hits": 1, "misses": 1}
+        assert len(loads) == 1
+    finally:
+        daemon.shutdown()
+
+
+def test_daemon_tcp_output_and_errors(tmp_path, asset):
+    """Frames can be written to a path and failures are reported"""
+    path, loader, _ = asset
+    daemon = RenderDaemon(
+        ("127.0.0.1", 0),
+        loader=loader,
+        renderer=fake_renderer,
+        output_dir=str(tmp_path),
+    )
+    daemon.start()
+    try:
+        output = str(tmp_path / "depth.png")
+        request = {"model": path, "width": 3, "height": 3, "buffer": "depth"}
+        header, payload = send_request(daemon.address, {**request, "output": output})
+        assert header["output"] == output and payload == b""
+        assert Image.open(output).getpixel((1, 1)) == 7
+        header, _ = send_request(daemon.address, {**request, "output": "frame.png"})
+        assert header["ok"] and (tmp_path / "frame.png").exists()
+
+        header, _ = send_request(daemon.address, {"model": str(tmp_path / "missing")})
+        assert not header["ok"] and header["error"]
+    finally:
+        daemon.shutdown()
+
+
+def test_daemon_rejects_outside_output(tmp_path, asset):
+    """Output paths outside the output folder, or without one, are refused"""
+    path, loader, _ = asset
+    request = {"model": path, "width": 3, "height": 3}
+    confined = RenderDaemon(
+        str(tmp_path / "a.sock"),
+        loader=loader,
+        renderer=fake_renderer,
+        output_dir=str(tmp_path / "frames"),
+    )
+    closed = RenderDaemon(
+        str(tmp_path / "b.sock"), loader=loader, renderer=fake_renderer
+    )
+    try:
+        for output in ("../escape.png", str(tmp_path / "escape.png")):
+            with raises(ValueError):
+                confined.render({**request, "output": output})
+        with raises(ValueError):
+            closed.render({**request, "output": "frame.png"})
+        assert not (tmp_path / "escape.png").exists()
+    finally:
+        confined.shutdown()
+        closed.shutdown()
+
+
+def test_daemon_raycast_shared_pool(tmp_path):
+    """Raycast requests trace on the daemon's long lived process pool"""
+    daemon = RenderDaemon(str(tmp_path / "render.sock"))
+    try:
+        request = {"model": "tests/obj/cube.obj", "width": 16, "height": 16}
+        request["engine"] = "raycast"
+        header, traced = daemon.render(request)
+        assert header["ok"] and len(traced) == 16 * 16 * 4
+        assert traced != bytes(len(traced))
+        workers = set(daemon.executor._processes)
+        assert workers and daemon.render(request)[1] == traced
+        assert set(daemon.executor._processes) == workers
+    finally:
+        daemon.shutdown()
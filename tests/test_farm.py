@@ -0,0 +1,169 @@
+"""Test module for the distributed render farm
+"""
+import socket
+import threading
+import time
+
+from pytest import raises
+
+from engines.farm import (
+    RenderFarm,
+    recv_message,
+    render_task,
+    run_worker,
+    send_message,
+    spawn_workers,
+)
+
+
+def fake_render(request):
+    """Return the frame number as a one pixel gray image"""
+    return {"width": 1, "height": 1, "mode": "L"}, bytes([request["frame"]])
+
+
+def slow_render(request):
+    """Render like fake_render after a short delay"""
+    time.sleep(0.05)
+    return fake_render(request)
+
+
+def collect():
+    """A sink storing results by task"""
+    results = {}
+
+    def sink(task, request, header, payload):
+        results[task] = payload
+
+    return results, sink
+
+
+def start_workers(address, count, render=fake_render):
+    """Run workers on threads"""
+    for _ in range(count):
+        threading.Thread(target=run_worker, args=(address, render), daemon=True).start()
+
+
+def test_messages_round_trip():
+    """Headers and payloads survive the framing"""
+    left, right = socket.socketpair()
+    with left, right:
+        send_message(left, {"type": "task", "task": 3}, b"\x00\x01")
+        header, payload = recv_message(right)
+    assert header == {"type": "task", "task": 3, "bytes": 2}
+    assert payload == b"\x00\x01"
+
+
+def test_farm_renders_every_task():
+    """Every frame reaches the sink exactly once"""
+    results, sink = collect()
+    farm = RenderFarm([{"frame": i} for i in range(20)], sink)
+    start_workers(farm.address, 3)
+    stats = farm.run(timeout=10)
+    assert stats["done"] == 20 and not stats["failed"]
+    assert results == {i: bytes([i]) for i in range(20)}
+
+
+def test_farm_requeues_dead_worker_task():
+    """A task lost with its worker is rendered by another worker"""
+    results, sink = collect()
+    farm = RenderFarm([{"frame": 7}], sink, steal=False)
+    farm.start()
+
+    with socket.create_connection(farm.address) as doomed:
+        send_message(doomed, {"type": "ready"})
+        header, _ = recv_message(doomed)
+        assert header["task"] == 0
+    start_workers(farm.address, 1)
+    stats = farm.run(timeout=10)
+    assert results == {0: bytes([7])}
+    assert stats["retries"] == 1
+
+
+def test_farm_gives_up_after_retries():
+    """Tasks failing on every attempt are reported as failed"""
+
+    def broken(request):
+        raise RuntimeError("no such model")
+
+    results, sink = collect()
+    farm = RenderFarm([{"frame": 1}], sink, max_retries=1)
+    start_workers(farm.address, 2, broken)
+    stats = farm.run(timeout=10)
+    assert results == {}
+    assert "no such model" in stats["failed"][0]
+
+
+def test_farm_steals_from_slow_worker():
+    """Idle workers duplicate running tasks once the queue is empty"""
+    results, sink = collect()
+    farm = RenderFarm([{"frame": i} for i in range(3)], sink)
+    start_workers(farm.address, 4, slow_render)
+    stats = farm.run(timeout=10)
+    assert len(results) == 3
+    assert stats["stolen"] >= 1
+
+
+def test_farm_timeout():
+    """run gives up when no worker finishes the batch"""
+    farm = RenderFarm([{"frame": 0}], lambda *args: None)
+    with raises(TimeoutError):
+        farm.run(timeout=0.1)
+
+
+def test_farm_local_processes():
+    """Worker processes on localhost render the batch"""
+    results, sink = collect()
+    farm = RenderFarm([{"frame": i} for i in range(6)], sink)
+    workers = spawn_workers(farm.address, 2, fake_render)
+    stats = farm.run(timeout=30)
+    for worker in workers:
+        worker.join(5)
+    assert stats["done"] == 6 and sorted(results) == list(range(6))
+
+
+def test_render_task_tile_matches_frame():
+    """A tile rendered on its own matches the crop of the whole frame"""
+    request = {"model": "tests/obj/cube.obj", "width": 24, "height": 16}
+    header, frame = render_task(request)
+    header, tile = render_task({**request, "tile": [4, 3, 17, 11]})
+    assert (header["width"], header["height"]) == (13, 8)
+    rows = [frame[(y * 24 + 4) * 4 : (y * 24 + 17) * 4] for y in range(3, 11)]
+    assert tile == b"".join(rows)
+
+
+def test_farm_requeues_silent_worker_task():
+    """A worker that stops answering times out and its task is retried"""
+    results, sink = collect()
+    farm = RenderFarm([{"frame": 4}], sink, steal=False, worker_timeout=0.2)
+    farm.start()
+
+    with socket.create_connection(farm.address) as silent:
+        send_message(silent, {"type": "ready"})
+        header, _ = recv_message(silent)
+        assert header["task"] == 0
+        start_workers(farm.address, 1)
+        stats = farm.run(timeout=10)
+    assert results == {0: bytes([4])}
+    assert stats["retries"] == 1
+
+
+def test_farm_failed_steal_keeps_task():
+    """A stolen copy failing does not count against the running original"""
+
+    def broken(request):
+        raise RuntimeError("stolen copy failed")
+
+    def slower(request):
+        time.sleep(0.5)
+        return fake_render(request)
+
+    results, sink = collect()
+    farm = RenderFarm([{"frame": 5}], sink, max_retries=0)
+    farm.start()
+    start_workers(farm.address, 1, slower)
+    while not farm.assigned.get(0):
+        time.sleep(0.01)
+    start_workers(farm.address, 1, broken)
+    stats = farm.run(timeout=10)
+    assert results == {0: bytes([5])}
+    assert not stats["failed"] and stats["stolen"] >= 1
@@ -0,0 +1,71 @@
+"""Test module for the framebuffer pool
+"""
+from threading import Thread
+
+from numpy import float64, uint8
+from pytest import raises
+
+from models.framebuffers import FramebufferPool
+from utils.generators import frame_buffer
+
+
+def test_pool_reuses_cleared_buffers():
+    """A released buffer is handed out again, cleared to the fill value"""
+    pool = FramebufferPool()
+    buffer = pool.acquire((4, 3, 4), uint8)
+    buffer[...] = 9
+    pool.release(buffer)
+    again = pool.acquire((4, 3, 4), uint8)
+    assert again is buffer and (again == 0).all()
+    assert pool.acquire((4, 3), float64, fill=-1.5).min() == -1.5
+    assert pool.stats()["allocations"] == 2 and pool.stats()["reuses"] == 1
+
+
+def test_pool_keys_and_depth():
+    """Buffers are kept by shape and dtype, at most depth of each"""
+    pool = FramebufferPool(depth=1)
+    first, second = pool.acquire((2, 2), uint8), pool.acquire((2, 2), uint8)
+    pool.release(first)
+    pool.release(second)
+    assert pool.stats()["free"] == 1
+    assert pool.acquire((2, 2), float64) is not first
+    assert pool.acquire((2, 3), uint8) is not first
+    assert pool.acquire((2, 2), uint8) is first
+
+
+def test_pool_rejects_views_and_double_release():
+    """Only whole buffers go back, and only once"""
+    pool = FramebufferPool()
+    buffer = pool.acquire((4, 4), uint8)
+    with raises(ValueError):
+        pool.release(buffer[::2])
+    pool.release(buffer)
+    with raises(ValueError):
+        pool.release(buffer)
+
+
+def test_pool_memory_stays_flat():
+    """A long run of frames on several threads allocates a bounded number"""
+    pool = FramebufferPool()
+
+    def frames():
+        for _ in range(200):
+            with pool.frame((16, 16, 4), uint8) as buffer:
+                buffer[0, 0] = 1
+
+    threads = [Thread(target=frames) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert pool.stats()["allocations"] <= 3
+    assert pool.stats()["reuses"] == 600 - pool.stats()["allocations"]
+
+
+def test_frame_buffer():
+    """Frame buffers are black RGB rows, optionally from a pool"""
+    image = frame_buffer(5, 2)
+    assert image.shape == (2, 5, 3) and not image.any()
+    pool = FramebufferPool()
+    pool.release(image)
+    assert frame_buffer(5, 2, pool) is image
@@ -0,0 +1,150 @@
+"""Test module for the array backed ObjectImage and its views
+"""
+from numpy import arange, asarray, float64, inf, memmap, shares_memory, uint8, zeros
+from PIL import Image
+from pytest import raises
+
+from models.framebuffers import FramebufferPool
+from models.objects import ObjectCamera, ObjectImage
+from models.shaders import ObjectPhongShader
+
+
+def init_image(width=4, height=3):
+    """
+    Build an RGBA image whose pixels encode their own position.
+
+    Returns:
+    ObjectImage: Pixel [x, y] holds x in red, y in green and 9 in blue.
+    """
+    pixels = arange(width * height * 4, dtype=uint8).reshape(width, height, 4)
+    pixels[..., 0] = arange(width)[:, None]
+    pixels[..., 1] = arange(height)
+    pixels[..., 2] = 9
+    return ObjectImage(width, height, pixels=pixels)
+
+
+def test_flips_are_views():
+    """Flipping only changes the view of the one pixel array"""
+    image = init_image()
+    buffer = image.pixels
+    image.flip_vertically()
+    image.flip_horizontally()
+    assert shares_memory(image.pixels, buffer)
+    assert tuple(image.get(0, 0)[:2]) == (3, 2)
+
+
+def test_crop_and_channels_share_memory():
+    """Crops and channel selections write through to the image"""
+    image = init_image()
+    region = image.crop((1, 0, 3, 2))
+    assert (region.get_width(), region.get_height()) == (2, 2)
+    region.set(0, 0, image.color_format(50, 60, 70, 80))
+    assert tuple(image.get(1, 0)) == (50, 60, 70, 80)
+    alpha = image.channels(3)
+    assert alpha.mode == "L" and alpha.get(1, 0) == 80
+    assert image.channels(slice(0, 3)).mode == "RGB"
+
+
+def test_materialize():
+    """Materializing copies the view into a new contiguous array"""
+    image = init_image()
+    image.flip_vertically()
+    view = image.pixels
+    image.materialize()
+    assert not shares_memory(image.pixels, view)
+    assert image.rows().flags.c_contiguous
+    assert (image.pixels == view).all()
+
+
+def test_encode_resolves_view(tmp_path):
+    """Files and raw bytes show the view, top row first"""
+    image = init_image()
+    image.flip_vertically()
+    for name in ("image.tga", "image.png"):
+        image.write_file(str(tmp_path / name))
+        rows = asarray(Image.open(tmp_path / name))
+        assert rows.shape == (3, 4, 4) and rows[0, 0, 1] == 2
+    assert image.tobytes() == image.to_image().tobytes()
+
+
+def test_storage_memory_maps(tmp_path):
+    """Images with storage keep their pixels in anonymous mapped files"""
+    image = ObjectImage(4, 3, storage=str(tmp_path))
+    assert isinstance(image.pixels, memmap) and not list(tmp_path.iterdir())
+    image.set(1, 2, image.color_format(1, 2, 3, 4))
+    image.flip_vertically()
+    image.write_file(str(tmp_path / "image.tga"))
+    assert tuple(asarray(Image.open(tmp_path / "image.tga"))[0, 1]) == (1, 2, 3, 4)
+
+
+def test_frame_buffers_return_to_pool():
+    """Render buffers come from the pool and go back on release_frame"""
+    pool = FramebufferPool()
+    image = ObjectImage(4, 3, pool=pool)
+    buffer = image.frame_buffer("color", (4, 3, 4), uint8)
+    assert not isinstance(image.pixels, memmap) and image.pixels is not buffer
+    image.release_frame()
+    assert image.frame_buffer("color", (4, 3, 4), uint8) is buffer
+    assert pool.stats()["reuses"] == 1
+
+
+def test_frame_buffer_fill():
+    """Buffers are filled on request and handed out as they are with None"""
+    image = ObjectImage(4, 3, pool=FramebufferPool())
+    buffer = image.frame_buffer("depth", (4, 3), float64, -inf)
+    assert (buffer == -inf).all()
+    buffer[...] = 7
+    image.release_frame()
+    assert (image.frame_buffer("depth", (4, 3), float64, None) == 7).all()
+
+
+def test_pooled_render_ignores_stale_buffers(triangle_model):
+    """Render buffers left unfilled by the pool are cleared by the rasterizer"""
+    model = triangle_model()
+    camera = ObjectCamera((0, 0, 3), (0, 0, 0), (0, 1, 0))
+    fresh = ObjectImage(16, 16)
+    fresh.render_model(model, camera, ObjectPhongShader(model, (0, 0, 1)), output=None)
+    pool = FramebufferPool()
+    image = ObjectImage(16, 16, pool=pool)
+    image.render_model(model, camera, ObjectPhongShader(model, (0, 0, 1)), output=None)
+    image.release_frame()
+    for free in pool.free.values():
+        for buffer in free:
+            buffer[...] = 7
+    image.render_model(model, camera, ObjectPhongShader(model, (0, 0, 1)), output=None)
+    assert (image.depth == fresh.depth).all()
+    assert (image.image.rows() == fresh.image.rows()).all()
+
+
+def test_spans_and_scatter():
+    """Runs and scattered pixels are written in one call each"""
+    image = ObjectImage(6, 4)
+    image.set_span(1, 2, 5, image.color_format(1, 2, 3))
+    assert (image.pixels[2:5, 1] == (1, 2, 3, 255)).all()
+    assert not image.pixels[:2, 1].any() and not image.pixels[:, 0].any()
+    colors = arange(12, dtype=uint8).reshape(3, 4)
+    image.scatter([0, 5, 0], [0, 3, 0], colors)
+    assert tuple(image.get(0, 0)) == (8, 9, 10, 11)
+    assert tuple(image.get(5, 3)) == (4, 5, 6, 7)
+    image.flip_vertically()
+    image.scatter([0, 9], [0, -1], colors[:2], clip=True)
+    assert tuple(image.get(0, 0)) == (0, 1, 2, 3)
+    with raises(IndexError):
+        image.scatter([9], [0], colors[0])
+
+
+def test_blit_and_packed():
+    """Masks select the written pixels and packed views share the pixels"""
+    image = ObjectImage(4, 3)
+    mask = zeros((2, 2), dtype=bool)
+    mask[0, 1] = mask[1, 0] = True
+    image.blit(mask, (9, 9, 9, 9), origin=(1, 1))
+    assert image.pixels[..., 0].sum() == 18 and image.get(1, 2)[0] == 9
+    image.blit(mask, [[1, 1, 1, 1], [2, 2, 2, 2]])
+    assert image.get(0, 1)[0] == 1 and image.get(1, 0)[0] == 2
+    packed = image.packed()
+    assert packed.shape == (4, 3) and shares_memory(packed, image.pixels)
+    packed[3, 2] = 0x04030201
+    assert tuple(image.get(3, 2)) == (1, 2, 3, 4)
+    with raises(ValueError):
+        image.channels(0).packed()
@@ -0,0 +1,69 @@
+"""Test module for mesh decimation and level of detail selection
+"""
+from types import SimpleNamespace
+
+from numpy import arange, array, eye, meshgrid, stack, zeros
+
+from models.lod import decimate, detail_levels, screen_size, select_level
+
+
+def init_grid(n=9):
+    """
+    Build a flat n x n vertex grid split into triangles.
+
+    Returns:
+    tuple[ndarray, ndarray]: The vertices and the (F, 3, 3) face array.
+    """
+    x, y = meshgrid(arange(n, dtype=float), arange(n, dtype=float), indexing="ij")
+    vertices = stack((x.ravel(), y.ravel(), zeros(n * n)), axis=1)
+    cell = (arange(n - 1)[:, None] * n + arange(n - 1)).ravel()
+    triangles = stack(
+        (
+            stack((cell, cell + n, cell + 1), axis=1),
+            stack((cell + 1, cell + n, cell + n + 1), axis=1),
+        ),
+        axis=1,
+    ).reshape(-1, 3)
+    return vertices, stack((triangles, triangles, triangles), axis=2)
+
+
+def test_decimate_reaches_target():
+    """Decimation stops at or just below the target face count"""
+    vertices, faces = init_grid()
+    result = decimate(vertices, faces, 64)
+    assert 50 <= len(result) <= 64
+    triangles = result[..., 0]
+    assert (triangles[:, 0] != triangles[:, 1]).all()
+    assert (triangles[:, 1] != triangles[:, 2]).all()
+
+
+def test_decimate_keeps_plane_and_border():
+    """A flat grid stays flat and keeps its corners"""
+    vertices, faces = init_grid()
+    used = vertices[decimate(vertices, faces, 32)[..., 0]]
+    assert (used[..., 2] == 0).all()
+    assert used[..., 0].min() == 0 and used[..., 0].max() == 8
+    assert used[..., 1].min() == 0 and used[..., 1].max() == 8
+
+
+def test_detail_levels():
+    """Detail levels get coarser and are kept on the model"""
+    vertices, faces = init_grid()
+    model = SimpleNamespace(vertex_array=vertices, face_array=faces)
+    levels = detail_levels(model, (0.5, 0.25))
+    assert model.lod_levels is levels
+    assert len(levels[0]) > len(levels[1]) > len(levels[2])
+
+
+def test_select_level():
+    """Small projections pick coarse levels, large ones the full mesh"""
+    levels = [zeros((1000, 3, 3)), zeros((500, 3, 3)), zeros((100, 3, 3))]
+    assert len(select_level(levels, 2000)) == 1000
+    assert len(select_level(levels, 40)) == 500
+    assert len(select_level(levels, 10)) == 100
+
+
+def test_screen_size():
+    """The projected size is the larger side of the bounding rectangle"""
+    points = array([[0.0, 0.0, 0.0], [4.0, 2.0, 1.0]])
+    assert screen_size(eye(4), points) == 4.0
@@ -0,0 +1,116 @@
+"""Test module for the triangle and vertex buffers
+"""
+from types import SimpleNamespace
+
+from numpy import allclose, array, ones, sqrt, uint32
+from numpy.linalg import norm
+
+from models.meshes import (
+    NORMAL,
+    POSITION,
+    UV,
+    index_vertices,
+    mesh_edges,
+    smooth_normals,
+    triangulate,
+    vertex_attributes,
+)
+
+
+def init_faces():
+    """
+    Build two triangles sharing an edge, one shared corner with another normal.
+
+    Returns:
+    ndarray: An (2, 3, 3) face array.
+    """
+    return array(
+        [[[0, 0, 0], [1, 1, 0], [2, 2, 0]], [[2, 2, 0], [1, 1, 1], [3, 3, 0]]]
+    )
+
+
+def test_index_vertices_unique():
+    """Corners sharing all three indices collapse into one vertex"""
+    corners, indices = index_vertices(init_faces())
+    assert len(corners) == 5
+    assert indices.dtype == uint32 and indices.shape == (2, 3)
+    assert (corners[indices] == init_faces()).all()
+
+
+def test_vertex_attributes_packed():
+    """Positions, uvs and normals are packed per unique vertex"""
+    model = SimpleNamespace(
+        vertex_array=array([[0.0, 0, 0], [1, 0, 0], [0, 1, 0], [1, 1, 0]]),
+        uv_array=array([[0.0, 0], [1, 0], [0, 1], [1, 1]]),
+        normal_array=array([[0.0, 0, 1], [0, 1, 0]]),
+    )
+    corners, indices = index_vertices(init_faces())
+    attributes = vertex_attributes(model, corners)
+    assert attributes.shape == (5, 8)
+    assert (attributes[indices[1, 1], POSITION] == [1, 0, 0]).all()
+    assert (attributes[indices[1, 1], UV] == [1, 0]).all()
+    assert (attributes[indices[1, 1], NORMAL] == [0, 1, 0]).all()
+
+
+def test_vertex_attributes_missing_uvs():
+    """Models without uvs get zero uv columns"""
+    model = SimpleNamespace(
+        vertex_array=array([[0.0, 0, 0], [1, 0, 0], [0, 1, 0], [1, 1, 0]]),
+        uv_array=array([]).reshape(0, 2),
+        normal_array=array([[0.0, 0, 1], [0, 1, 0]]),
+    )
+    attributes = vertex_attributes(model, index_vertices(init_faces())[0])
+    assert (attributes[:, UV] == 0).all()
+
+
+def test_triangulate_fans():
+    """Quads and pentagons become fans with a map back to their polygon"""
+    quad = [(i, i, 0) for i in range(4)]
+    pentagon = [(i, 0, 0) for i in range(4, 9)]
+    triangles, polygon = triangulate([quad, [(0, 0, 0), (1, 1, 0)], pentagon])
+    assert triangles.shape == (5, 3, 3)
+    assert polygon.tolist() == [0, 0, 2, 2, 2]
+    assert triangles[:2, :, 0].tolist() == [[0, 1, 2], [0, 2, 3]]
+    assert triangles[4, :, 0].tolist() == [4, 7, 8]
+
+
+def init_cube_corner():
+    """
+    Build three quads meeting at a cube corner, split into triangles.
+
+    Returns:
+    tuple: The (7, 3) positions and (6, 3) vertex indices.
+    """
+    vertices = array(
+        [[0.0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0], [0, 0, 1], [1, 0, 1], [0, 1, 1]]
+    )
+    triangles = array(
+        [[0, 2, 1], [0, 3, 2], [0, 1, 5], [0, 5, 4], [0, 4, 6], [0, 6, 3]]
+    )
+    return vertices, triangles
+
+
+def test_smooth_normals_shared():
+    """Without a crease angle every vertex gets one averaged unit normal"""
+    vertices, triangles = init_cube_corner()
+    normals, indices = smooth_normals(vertices, triangles)
+    assert (indices == triangles).all()
+    assert abs(norm(normals, axis=1) - 1).max() < 1e-9
+    assert allclose(normals[0], -ones(3) / sqrt(3))
+
+
+def test_smooth_normals_crease():
+    """A crease angle keeps the three sides of the corner flat"""
+    vertices, triangles = init_cube_corner()
+    normals, indices = smooth_normals(vertices, triangles, crease_angle=30)
+    assert len(normals) == 3
+    assert allclose(normals[indices[0]], [0, 0, -1])
+    assert allclose(normals[indices[2]], [0, -1, 0])
+    assert allclose(normals[indices[4]], [-1, 0, 0])
+
+
+def test_mesh_edges_unique():
+    """Edges shared by two faces are listed once, smaller index first"""
+    edges = mesh_edges(init_faces()[..., 0])
+    assert edges.tolist() == [[0, 1], [0, 2], [1, 2], [1, 3], [2, 3]]
+    assert mesh_edges(array([[0, 1, 2, 3]])).tolist() == [[0, 1], [0, 3], [1, 2], [2, 3]]
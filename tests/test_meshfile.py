@@ -0,0 +1,57 @@
+"""Test module for the compact binary mesh format
+"""
+from numpy import array, int64, uint64, zeros
+from pytest import raises
+
+from models.meshfile import (
+    decode_mesh,
+    encode_mesh,
+    varint_decode,
+    varint_encode,
+    zigzag_decode,
+    zigzag_encode,
+)
+
+
+def test_varint_round_trip():
+    """Values of every size survive varint packing"""
+    values = array([0, 1, 127, 128, 300, 2**40, 2**64 - 1], dtype=uint64)
+    data = varint_encode(values)
+    assert len(data) == 1 + 1 + 1 + 2 + 2 + 6 + 10
+    assert (varint_decode(data.tobytes()) == values).all()
+
+
+def test_zigzag_round_trip():
+    """Small magnitudes of either sign map to small unsigned values"""
+    values = array([0, -1, 1, -2, 2**62, -(2**62)], dtype=int64)
+    assert zigzag_encode(values)[:4].tolist() == [0, 1, 2, 3]
+    assert (zigzag_decode(zigzag_encode(values)) == values).all()
+
+
+def test_mesh_round_trip():
+    """Indices are exact and attributes are within quantization error"""
+    vertices = array([[-1.0, 0, 2], [3, 1, 2], [0, 5, 2.5], [1, 1, 1]])
+    normals = array([[0.0, 0, 1], [0.6, 0.8, 0]])
+    uvs = array([[0.0, 0], [0.25, 1], [0.5, 0.5]])
+    faces = array(
+        [[[0, 0, 0], [1, 1, 0], [2, 2, 1]], [[3, -1, 1], [2, 2, 1], [1, 1, 0]]]
+    )
+    decoded = decode_mesh(encode_mesh(vertices, normals, uvs, faces))
+    assert abs(decoded[0] - vertices).max() < 1e-4
+    assert abs(decoded[1] - normals).max() < 1e-4
+    assert abs(decoded[2] - uvs).max() < 1e-3
+    assert (decoded[3] == faces).all()
+
+
+def test_mesh_round_trip_large_coordinates():
+    """Vertices on a bound that float32 rounds inward do not wrap around"""
+    vertices = array([[10000.0, 0, 0], [10001.0003, 1, 1], [10000.5, 2, 3]])
+    faces = array([[[0, -1, -1], [1, -1, -1], [2, -1, -1]]])
+    decoded = decode_mesh(encode_mesh(vertices, zeros((0, 3)), zeros((0, 2)), faces))
+    assert abs(decoded[0] - vertices).max() < 1e-3
+
+
+def test_decode_rejects_other_data():
+    """Data without the mesh header is refused"""
+    with raises(ValueError):
+        decode_mesh(b"\0" * 64)
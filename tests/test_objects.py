@@ -1,14 +1,13 @@
 """Test module for objects
     """
 from pytest import raises
-from models.vectors import RGB
 
 from models.primitives import Line
 
 
 def test_line_init():
     """test_line_class"""
-    line = Line((1, 1), (1, 1), RGB())
+    line = Line((0, 2), (1, 3), (255, 0, 0))
     assert line.x0 == 0
     assert line.x1 == 1
     assert line.y0 == 2
@@ -18,7 +17,7 @@ def test_line_init():
 def test_line_init_error():
     """test line init when error raised - Passed str not tuple"""
     with raises(TypeError):
-        Line("(x0, y0)", (1, 1), RGB())
+        Line("(x0, y0)", (1, 1), (255, 0, 0))
 
 
 def test_line_init_error1():
@@ -39,18 +38,22 @@ def test_line_init_error1():
 
 def test_str():
     """test str rep of the line class"""
-    line = Line((1, 1), (1, 1), RGB())
+    line = Line((0, 2), (1, 3), (255, 0, 0))
     assert str(line) == "Line from (0, 2) to (1, 3) with color (255, 0, 0)"
 
 
 def test_swap_if_steep():
     """test steep check func"""
-    line = Line((1, 1), (1, 1), RGB())
+    line = Line((0, 2), (1, 3), (255, 0, 0))
     assert not line.swap_if_steep()
+    steep = Line((0, 0), (1, 4), (255, 0, 0))
+    assert steep.swap_if_steep()
+    assert (steep.start, steep.end) == ((0, 0), (4, 1))
 
 
 def test_get_y_value():
     """test getting y value"""
-    line = Line((1, 1), (1, 1), RGB())
+    line = Line((0, 2), (1, 3), (255, 0, 0))
     y = line.get_y_value(line.x0)
     assert y == 2
+    assert line.get_y_value(0.5) == 2.5
@@ -0,0 +1,88 @@
+"""Test module for the mesh cache and the ambient occlusion baker
+"""
+from types import SimpleNamespace
+
+from numpy import arange, array, concatenate, isfinite
+
+from models.cache import MeshCache
+from models.geometry.rays import hemisphere
+from models.occlusion import ambient_occlusion, bake_occlusion, vertex_normals
+
+
+def init_model(tmp_path=None):
+    """
+    Build a floor triangle covered by a larger roof triangle.
+
+    Returns:
+    SimpleNamespace: A model exposing the array attributes used by the baker.
+    """
+    return SimpleNamespace(
+        vertex_array=array(
+            [
+                [-1.0, -1.0, 0.0],
+                [1.0, -1.0, 0.0],
+                [0.0, 1.0, 0.0],
+                [-4.0, -4.0, 0.2],
+                [4.0, -4.0, 0.2],
+                [0.0, 4.0, 0.2],
+            ]
+        ),
+        normal_array=array([[0.0, 0.0, 1.0]]),
+        face_array=array(
+            [[[0, 0, 0], [1, 0, 0], [2, 0, 0]], [[3, 0, 0], [4, 0, 0], [5, 0, 0]]]
+        ),
+        cache=MeshCache(str(tmp_path / "mesh.obj")) if tmp_path else None,
+    )
+
+
+def test_cache_roundtrip(tmp_path):
+    """Arrays put in the cache are read back by a new cache for the same file"""
+    source = tmp_path / "mesh.obj"
+    source.write_text("v 0 0 0\n")
+    MeshCache(str(source)).put(levels=arange(3))
+    assert MeshCache(str(source)).get("levels").tolist() == [0, 1, 2]
+
+
+def test_cache_invalidated(tmp_path):
+    """Changing the source file drops the cached arrays"""
+    source = tmp_path / "mesh.obj"
+    source.write_text("v 0 0 0\n")
+    MeshCache(str(source)).put(levels=arange(3))
+    source.write_text("v 0 0 0\nv 1 1 1\n")
+    assert MeshCache(str(source)).get("levels") is None
+
+
+def test_bake_occlusion():
+    """Floor vertices under the roof are occluded, roof vertices are open"""
+    occlusion = bake_occlusion(init_model(), samples=32, processes=1)
+    assert (occlusion[:3] < 0.5).all()
+    assert (occlusion[3:] == 1.0).all()
+
+
+def test_ambient_occlusion_cached(tmp_path):
+    """The baked occlusion is stored in the mesh cache and reused"""
+    model = init_model(tmp_path)
+    occlusion = ambient_occlusion(model, samples=8, processes=1)
+    assert model.occlusion_array is occlusion
+    assert (model.cache.get("occlusion") == occlusion).all()
+
+    model.cache.put(occlusion=occlusion * 0)
+    assert (ambient_occlusion(model, samples=8, processes=1) == 0).all()
+
+
+def test_ambient_occlusion_samples_rebake(tmp_path):
+    """Asking for a different sample count bakes the occlusion again"""
+    model = init_model(tmp_path)
+    ambient_occlusion(model, samples=8, processes=1)
+    model.cache.put(occlusion=model.occlusion_array * 0)
+    assert (ambient_occlusion(model, samples=16, processes=1)[3:] == 1).all()
+    assert int(model.cache.get("occlusion_samples")) == 16
+
+
+def test_vertex_normals_unreferenced_vertex():
+    """Vertices no face uses get a fallback normal instead of a zero one"""
+    model = init_model()
+    model.vertex_array = concatenate((model.vertex_array, [[9.0, 9.0, 9.0]]))
+    normals = vertex_normals(model)
+    assert normals[-1].tolist() == [0.0, 0.0, 1.0]
+    assert isfinite(hemisphere(normals, 4)).all()
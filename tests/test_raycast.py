@@ -0,0 +1,66 @@
+"""Test module for the ray casting engine
+"""
+from types import SimpleNamespace
+
+from numpy import arange, array, full, inf, uint8, zeros
+
+from engines.rasterizer import rasterize
+from engines.raycast import primary_rays, raycast, tiles
+from models.shaders import ObjectGouraudShader, ObjectPhongShader
+
+
+
+camera = SimpleNamespace(eye=(0.0, 0.0, 3.0), center=(0.0, 0.0, 0.0), up=(0.0, 1.0, 0.0))
+
+
+def test_tiles_cover_image():
+    """Tiles cover every pixel exactly once"""
+    covered = zeros((70, 50), dtype=int)
+    for x0, y0, x1, y1 in tiles(70, 50, 32):
+        covered[x0:x1, y0:y1] += 1
+    assert (covered == 1).all()
+
+
+def test_primary_rays_center():
+    """The ray through the viewport center points at the camera center"""
+    origins, directions = primary_rays(camera, 64, 64, array([32]), array([32]))
+    assert origins.tolist() == [[0.0, 0.0, 3.0]]
+    assert directions.round(6).tolist() == [[0.0, 0.0, -1.0]]
+
+
+def test_raycast_matches_rasterizer(triangle_model):
+    """Both engines cover the same pixels with close colors
+
+    The rasterizer interpolates in screen space while rays hit the exact
+    surface point, so shading differs slightly.
+    """
+    shader = ObjectPhongShader(triangle_model(), (0, 0, 1))
+    color, depth, face_ids = raycast(shader, camera, 32, 32, tile=16, processes=1)
+
+    faces = arange(1)
+    raster_color = zeros((32, 32, 4), dtype=uint8)
+    raster_depth = full((32, 32), -inf)
+    rasterize(shader.vertex(faces), raster_depth, shader, faces, raster_color)
+
+    covered = depth > -inf
+    assert covered.sum() > 0
+    assert ((face_ids == 0) == covered).all()
+    raster_covered = raster_depth > -inf
+    assert (covered & raster_covered).sum() >= 0.9 * max(covered.sum(), raster_covered.sum())
+    both = covered & raster_covered
+    assert abs(color[both].astype(int) - raster_color[both]).mean() < 8
+
+
+def test_raycast_process_pool(triangle_model):
+    """Tiles rendered on worker processes give the same image"""
+    shader = ObjectPhongShader(triangle_model(), (0, 0, 1))
+    serial, _, _ = raycast(shader, camera, 24, 24, tile=8, processes=1)
+    pooled, _, _ = raycast(shader, camera, 24, 24, tile=8, processes=2)
+    assert (serial == pooled).all()
+
+
+def test_raycast_gouraud(triangle_model):
+    """Vertex lighting is computed before the rays are shaded"""
+    shader = ObjectGouraudShader(triangle_model(), (0, 0, 1))
+    color, depth, _ = raycast(shader, camera, 16, 16, tile=8, processes=1)
+    assert (depth > -inf).any() and (color[depth > -inf][:, :3] == 255).all()
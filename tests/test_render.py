@@ -9,14 +9,23 @@ Returns:
         output file.
         test_render_only_error_offscreen: Test for raising an IndexError when 
         rendering a line off-screen.
+        test_render_only_clip: Test for clipping a line leaving the frame.
         test_writer: Test for writing an image buffer to a file and verifying 
         the output file.
+        test_draw_lines_matches_bresenham: Test for the pixels of a DDA line.
+        test_draw_lines_depth: Test for depth testing overlapping lines.
+        test_draw_lines_clip_and_antialias: Test for clipping and coverage.
+        test_render_wireframe: Test for drawing and hiding the edges of a model.
+        test_render_point_cloud: Test for rendering an OBJ file without faces.
 """
 
 from os import listdir, remove, getcwd
+from types import SimpleNamespace
+from numpy import array, full, inf, uint8, zeros
 from pytest import raises
 from models.primitives import Line
-from engines.renders import render_triangle_outline, file_writer
+from engines.renders import draw_lines, render_triangle_outline, file_writer
+from models.objects import ObjectCamera, ObjectImage, ObjectModel
 from utils.generators import frame_buffer
 cwd = getcwd()
 
@@ -39,6 +48,17 @@ def test_render_only_error_offscreen():
         render_triangle_outline([line])
 
 
+def test_render_only_clip():
+    """
+    Test for clipping a line leaving the frame when asked to.
+    """
+    line = Line((0, 0), (1000, 1000), (255, 0, 0))
+    frame = render_triangle_outline([line], clip=True)
+    drawn = frame[..., 0].nonzero()
+    assert (drawn[0] == drawn[1]).all() and len(drawn[0]) == 600
+    assert not frame[..., 1:].any()
+
+
 def test_writer():
     """
     Test for writing an image buffer to a file and verifying the output file.
@@ -47,3 +67,77 @@ def test_writer():
     file_writer(image, "tests/output/test_writer")
     assert "test_writer.ppm" in listdir("tests/output/")
     remove("tests/output/test_writer.ppm")
+
+
+def test_draw_lines_matches_bresenham():
+    """
+    Test for the pixels of a DDA line, one per step along the major axis.
+    """
+    color = zeros((8, 8), dtype=uint8)
+    assert draw_lines(array([[[0, 0], [6, 3]]]), color, 1) == 7
+    assert sorted(zip(*color.nonzero())) == [
+        (0, 0), (1, 1), (2, 1), (3, 2), (4, 2), (5, 3), (6, 3)
+    ]
+
+
+def test_draw_lines_depth():
+    """
+    Test for depth testing overlapping lines against each other and a buffer.
+    """
+    near = [[0, 2, 5, 1], [7, 2, 5, 1]]
+    far = [[0, 2, 1, 1], [7, 2, 1, 1]]
+    color = zeros((8, 4), dtype=uint8)
+    depth = full((8, 4), -inf)
+    depth[6, 2] = 9
+    draw_lines(array([near, far]), color, array([10, 20], dtype=uint8), depth)
+    assert color[:6, 2].tolist() == [10] * 6 and color[6, 2] == 0
+    assert depth[0, 2] == 5
+    with raises(ValueError):
+        draw_lines(array([[[0, 0], [1, 1]]]), color, 1, depth)
+
+
+def test_draw_lines_clip_and_antialias():
+    """
+    Test for clipping long lines and splitting coverage between two pixels.
+    """
+    color = zeros((4, 4, 3), dtype=uint8)
+    draw_lines(array([[[-1e6, 1], [1e6, 1]]]), color, (9, 9, 9))
+    assert (color[:, 1] == 9).all() and not color[:, 0].any()
+    color = zeros((4, 4), dtype=uint8)
+    draw_lines(array([[[0, 1.25], [3, 1.25]]]), color, 200, antialias=True)
+    assert color[:, 1].tolist() == [150] * 4 and color[:, 2].tolist() == [50] * 4
+
+
+def test_render_wireframe():
+    """
+    Test for drawing the edges of a model and hiding them behind a surface.
+    """
+    model = SimpleNamespace(
+        vertex_array=array([[-1.0, -1.0, 0.0], [1.0, -1.0, 0.0], [0.0, 1.0, 0.0]]),
+        face_array=array([[[0, 0, 0], [1, 1, 1], [2, 2, 2]]]),
+    )
+    camera = ObjectCamera((0, 0, 3), (0, 0, 0), (0, 1, 0))
+    image = ObjectImage(32, 32)
+    assert image.render_wireframe(model, camera) > 0
+    assert image.image.pixels[..., 0].max() == 255
+    hidden = ObjectImage(32, 32)
+    hidden.render_wireframe(model, camera, hidden=True)
+    hidden.image = ObjectImage(32, 32)
+    hidden.depth[...] = 1e9
+    assert hidden.render_wireframe(model, camera, hidden=True) == 0
+
+
+def test_render_point_cloud(tmp_path):
+    """
+    Test for rendering an OBJ file without faces as colored point splats.
+    """
+    path = tmp_path / "scan.obj"
+    path.write_text("v 0 0 0 255 0 0\nv 0.5 0.5 0 0 255 0\n")
+    model = ObjectModel(str(path))
+    assert len(model.face_array) == 0 and model.color_array.max() == 1
+    camera = ObjectCamera((0, 0, 3), (0, 0, 0), (0, 1, 0))
+    image = ObjectImage(32, 32)
+    image.render_model(model, camera, output=None)
+    colors = image.image.rows()[image.image.rows()[..., 3] > 0][:, :3]
+    assert {tuple(color) for color in colors.tolist()} == {(255, 0, 0), (0, 255, 0)}
+    assert len(colors) == 10
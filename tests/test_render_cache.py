@@ -0,0 +1,101 @@
+"""Test module for the content addressed render cache
+"""
+import os
+import threading
+
+from numpy import arange, array, eye, full, inf, uint8, zeros
+
+from models.cache import RenderCache, render_key
+from models.shaders import ObjectGouraudShader, ObjectPhongShader
+
+
+def buffers(size=8):
+    """Returns an empty color and depth buffer pair."""
+    return {
+        "color": zeros((size, size, 4), dtype=uint8),
+        "depth": full((size, size), -inf),
+    }
+
+
+def test_render_key_content(triangle_model):
+    """Equal content gives equal keys whatever the objects are"""
+    shader = ObjectPhongShader(triangle_model(), (0, 0, 1))
+    key = render_key(triangle_model(), shader)
+    same = ObjectPhongShader(triangle_model(), (0, 0, 1))
+    assert key == render_key(triangle_model(), same)
+    moved = triangle_model()
+    moved.vertex_array = moved.vertex_array + 1
+    assert render_key(moved, shader) != key
+    retextured = triangle_model(diffuse=100)
+    assert render_key(retextured, ObjectPhongShader(retextured, (0, 0, 1))) != key
+    relit = ObjectPhongShader(triangle_model(), (1, 0, 1))
+    assert render_key(triangle_model(), relit) != key
+    assert render_key(triangle_model(), shader, size=(8, 8)) != render_key(
+        triangle_model(), shader, size=(8, 9)
+    )
+
+
+def test_render_key_ignores_matrices(triangle_model):
+    """Camera matrices left on the shader by an earlier render do not count"""
+    shader = ObjectPhongShader(triangle_model(), (0, 0, 1))
+    key = render_key(triangle_model(), shader)
+    shader.set_matrices(array([[2.0]]), array([[3.0]]), array([[4.0]]))
+    assert render_key(triangle_model(), shader) == key
+
+
+def test_render_key_ignores_frame_state(triangle_model):
+    """Intensities and varyings left by an earlier frame do not count"""
+    shader = ObjectGouraudShader(triangle_model(), (0, 0, 1))
+    key = render_key(triangle_model(), shader)
+    shader.set_matrices(eye(4), eye(4), eye(4))
+    shader.vertex(arange(1))
+    assert shader.intensity.any() and render_key(triangle_model(), shader) == key
+
+
+def test_render_cache_hit_miss(tmp_path):
+    """Stored buffers are returned and lookups are counted"""
+    cache = RenderCache(str(tmp_path))
+    assert cache.get("a") is None
+    cache.put("a", **buffers())
+    cached = cache.get("a")
+    assert (cached["depth"] == -inf).all() and cached["color"].shape == (8, 8, 4)
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    assert cache.stats()["entries"] == 1
+
+
+def test_render_cache_lru_eviction(tmp_path):
+    """The least recently read entry is evicted first"""
+    cache = RenderCache(str(tmp_path))
+    cache.put("a", **buffers())
+    size = cache.stats()["bytes"]
+    cache.max_bytes = size * 2
+    cache.put("b", **buffers())
+    os.utime(cache.path("a"), ns=(1, 1))
+    os.utime(cache.path("b"), ns=(2, 2))
+    assert cache.get("a") is not None
+    cache.put("c", **buffers())
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.evictions == 1
+
+
+def test_render_cache_corrupt_entry(tmp_path):
+    """A damaged entry counts as a miss and is removed"""
+    cache = RenderCache(str(tmp_path))
+    with open(cache.path("a"), "wb") as file:
+        file.write(b"not an archive")
+    assert cache.get("a") is None and "a" not in cache
+
+
+def test_render_cache_concurrent_puts(tmp_path):
+    """Writers of one key never share a temporary file"""
+    cache = RenderCache(str(tmp_path))
+    threads = [
+        threading.Thread(target=cache.put, args=("a",), kwargs=buffers())
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.get("a") is not None
+    assert os.listdir(tmp_path) == [os.path.basename(cache.path("a"))]
@@ -0,0 +1,181 @@
+"""Test module for the asyncio render scheduler
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pytest import raises
+
+from engines.scheduler import (
+    BATCH,
+    INTERACTIVE,
+    DeadlineExceeded,
+    RenderScheduler,
+    frame_bytes,
+    job_key,
+)
+
+
+class Recorder:
+    """A render function that records its calls and can be held back"""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, request):
+        self.calls.append(request["model"])
+        self.gate.wait(5)
+        return request["model"]
+
+
+def scheduler(render, workers=1, **kwargs):
+    """Build a scheduler on threads instead of processes"""
+    return RenderScheduler(
+        render, workers, executor=ThreadPoolExecutor(workers + 1), **kwargs
+    )
+
+
+async def settle():
+    """Let the dispatcher and executor threads catch up"""
+    for _ in range(5):
+        await asyncio.sleep(0.01)
+
+
+def test_job_key_ignores_output_fields():
+    """Requests differing only in delivery details coalesce"""
+    request = {"model": "a.obj", "width": 10, "height": 20}
+    assert job_key(request) == job_key({**request, "output": "x.tga"})
+    assert job_key(request) != job_key({**request, "width": 11})
+    assert frame_bytes(request) == 10 * 20 * 16
+
+
+def test_duplicate_jobs_coalesce():
+    """Identical requests in flight render once"""
+    render = Recorder()
+
+    async def run():
+        async with scheduler(render) as jobs:
+            results = await asyncio.gather(
+                *(jobs.submit({"model": "a"}) for _ in range(3))
+            )
+            return results, jobs.stats
+
+    results, stats = asyncio.run(run())
+    assert results == ["a"] * 3
+    assert render.calls == ["a"]
+    assert stats["coalesced"] == 2
+
+
+def test_interactive_skips_batch_queue():
+    """A preview runs while batch jobs hold every worker"""
+    render = Recorder()
+    render.gate.clear()
+
+    async def run():
+        async with scheduler(render) as jobs:
+            batch = [
+                asyncio.ensure_future(jobs.submit({"model": name}, BATCH))
+                for name in ("b1", "b2")
+            ]
+            await settle()
+            preview = asyncio.ensure_future(jobs.submit({"model": "p"}, INTERACTIVE))
+            await settle()
+            started = list(render.calls)
+            render.gate.set()
+            await asyncio.gather(preview, *batch)
+            return started
+
+    assert asyncio.run(run()) == ["b1", "p"]
+    assert render.calls == ["b1", "p", "b2"]
+
+
+def test_deadline_expires_queued_job():
+    """A job still queued at its deadline fails and is never rendered"""
+    render = Recorder()
+    render.gate.clear()
+
+    async def run():
+        async with scheduler(render) as jobs:
+            first = asyncio.ensure_future(jobs.submit({"model": "slow"}))
+            await settle()
+            with raises(DeadlineExceeded):
+                await jobs.submit({"model": "late"}, deadline=0.05)
+            await settle()
+            render.gate.set()
+            await first
+            return jobs.stats
+
+    stats = asyncio.run(run())
+    assert render.calls == ["slow"]
+    assert stats["expired"] == 1
+
+
+def test_memory_limit_holds_dispatch():
+    """Jobs wait while running jobs fill the memory budget"""
+    render = Recorder()
+    render.gate.clear()
+    request = {"width": 10, "height": 10}
+
+    async def run():
+        limit = frame_bytes(request) * 3 // 2
+        async with scheduler(render, workers=2, memory_limit=limit) as jobs:
+            pending = [
+                asyncio.ensure_future(jobs.submit({**request, "model": name}))
+                for name in ("a", "b")
+            ]
+            await settle()
+            started = list(render.calls)
+            render.gate.set()
+            await asyncio.gather(*pending)
+            return started
+
+    assert asyncio.run(run()) == ["a"]
+
+
+def test_interactive_ignores_memory_limit():
+    """A preview starts while batch jobs fill the memory budget"""
+    render = Recorder()
+    render.gate.clear()
+    request = {"width": 10, "height": 10}
+
+    async def run():
+        limit = frame_bytes(request) * 3 // 2
+        async with scheduler(render, workers=2, memory_limit=limit) as jobs:
+            batch = [
+                asyncio.ensure_future(jobs.submit({**request, "model": name}, BATCH))
+                for name in ("a", "b")
+            ]
+            await settle()
+            preview = asyncio.ensure_future(
+                jobs.submit({**request, "model": "p"}, INTERACTIVE)
+            )
+            await settle()
+            started = list(render.calls)
+            render.gate.set()
+            await asyncio.gather(preview, *batch)
+            return started
+
+    assert asyncio.run(run()) == ["a", "p"]
+
+
+def test_backpressure_blocks_batch_submit():
+    """Batch submissions wait once the queue is full"""
+    render = Recorder()
+    render.gate.clear()
+
+    async def run():
+        async with scheduler(render, max_pending=1) as jobs:
+            running = asyncio.ensure_future(jobs.submit({"model": "a"}))
+            await settle()
+            queued = asyncio.ensure_future(jobs.submit({"model": "b"}))
+            blocked = asyncio.ensure_future(jobs.submit({"model": "c"}))
+            await settle()
+            waiting = len(jobs.jobs)
+            render.gate.set()
+            await asyncio.gather(running, queued, blocked)
+            return waiting
+
+    assert asyncio.run(run()) == 2
+    assert render.calls == ["a", "b", "c"]
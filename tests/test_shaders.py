@@ -0,0 +1,258 @@
+"""Test module for the batched shaders and the array rasterizer
+"""
+from types import SimpleNamespace
+
+from numpy import arange, array, eye, full, inf, int32, isnan, memmap, uint8, zeros
+
+from engines.rasterizer import (
+    occlusion_query,
+    pick_buffer,
+    range_groups,
+    rasterize,
+    rasterize_tiles,
+    tile_bounds,
+    visible_counts,
+)
+from models.geometry.transforms import viewport
+from models.objects import ObjectCamera, ObjectImage
+from models.shaders import (
+    ObjectDepthShader,
+    ObjectGouraudShader,
+    ObjectPhongShader,
+    ObjectShadowShader,
+    sample,
+    shadow_map,
+    texture_array,
+)
+
+
+def render(shader, size=32):
+    """Rasterize every face of the shader's model into fresh buffers."""
+    shader.set_matrices(eye(4), eye(4), viewport(0, 0, size, size))
+    faces = arange(len(shader.faces))
+    color = zeros((size, size, 4), dtype=uint8)
+    depth = full((size, size), -inf)
+    written = rasterize(shader.vertex(faces), depth, shader, faces, color)
+    return color, depth, written
+
+
+def test_texture_array_grayscale():
+    """Grayscale textures gain a channel axis"""
+    assert texture_array(SimpleNamespace(pixels=zeros((3, 2)))).shape == (3, 2, 1)
+
+
+def test_sample_clamps():
+    """uv coordinates outside [0, 1] are clamped to the edge texels"""
+    texture = arange(4).reshape(2, 2, 1)
+    uv = array([[0.0, 0.0], [1.0, 1.0], [-1.0, 2.0]])
+    assert sample(texture, uv)[:, 0].tolist() == [0, 3, 1]
+
+
+def test_phong_lit_triangle(triangle_model):
+    """A triangle facing the light is shaded with diffuse plus ambient"""
+    color, depth, written = render(ObjectPhongShader(triangle_model(), (0, 0, 1)))
+    assert written > 0
+    assert (depth > -inf).sum() == written
+    lit = color[depth > -inf]
+    assert (lit[:, 3] == 255).all()
+    assert lit[:, 0].min() >= 200
+
+
+def test_phong_back_light(triangle_model):
+    """A light behind the triangle leaves only the ambient term"""
+    shader = ObjectPhongShader(triangle_model(), (0, 0, -1), ambient=5)
+    color, depth, _ = render(shader)
+    assert (color[depth > -inf][:, :3] == 5).all()
+
+
+def test_phong_specular_highlight(triangle_model):
+    """Low shininess spreads the highlight over the whole triangle"""
+    model = triangle_model(100, 0)
+    dull, depth, _ = render(ObjectPhongShader(model, (0, 0, 1), specular=0))
+    shiny, _, _ = render(ObjectPhongShader(model, (0, 0, 1), specular=0.6))
+    mask = depth > -inf
+    assert (shiny[mask][:, 0] > dull[mask][:, 0]).all()
+
+
+def test_vertex_subset(triangle_model):
+    """A subset of faces only transforms the vertices it uses"""
+    model = triangle_model()
+    model.vertex_array = array(
+        [[-1.0, -1.0, 0.0], [1.0, -1.0, 0.0], [0.0, 1.0, 0.0], [0.0, -1.0, 0.5]]
+    )
+    model.face_array = array(
+        [[[0, 0, 0], [1, 1, 1], [2, 2, 2]], [[3, 0, 0], [1, 1, 1], [2, 2, 2]]]
+    )
+    shader = ObjectDepthShader(model)
+    shader.set_matrices(eye(4), eye(4), viewport(0, 0, 16, 16))
+    used, corners = shader.used_vertices(array([1]))
+    assert len(used) == 3 and corners.max() == 2
+    assert (shader.vertex(array([1])) == shader.vertex(arange(2))[1:]).all()
+
+
+def test_depth_shader_fragment(triangle_model):
+    """Depth shaders run as full shaders fill fragments with opaque white"""
+    color, depth, written = render(ObjectDepthShader(triangle_model()))
+    assert written > 0 and (color[depth > -inf] == 255).all()
+    assert not color[depth == -inf].any()
+
+
+def test_gouraud_vertex_lighting(triangle_model):
+    """Gouraud shading lights every unique vertex once and interpolates it"""
+    shader = ObjectGouraudShader(triangle_model(), (0, 0, 1))
+    color, depth, written = render(shader)
+    assert written > 0 and shader.intensity.tolist() == [1.0, 1.0, 1.0]
+    assert (color[depth > -inf][:, :3] == 255).all()
+
+
+def test_phong_eye_from_camera(triangle_model):
+    """Without a fixed eye the highlight is seen from the render camera"""
+    camera = SimpleNamespace(eye=(0.0, 4.0, 3.0))
+    shader = ObjectPhongShader(triangle_model(), (0, 0, 1))
+    shader.set_camera(camera)
+    assert shader.view_eye.tolist() == [0.0, 4.0, 3.0]
+    fixed = ObjectPhongShader(triangle_model(), (0, 0, 1), eye=(0, 0, 1))
+    fixed.set_camera(camera)
+    assert fixed.view_eye.tolist() == [0.0, 0.0, 1.0]
+
+
+def test_rasterize_depth_only(triangle_model):
+    """Without a shader only the depth buffer is written"""
+    shader = ObjectPhongShader(triangle_model(), (0, 0, 1))
+    shader.set_matrices(eye(4), eye(4), viewport(0, 0, 16, 16))
+    depth = full((16, 16), -inf)
+    assert rasterize(shader.vertex(arange(1)), depth) == (depth > -inf).sum() > 0
+
+
+def test_shadow_map_occluder(triangle_model):
+    """A small triangle between the light and a large one casts a shadow"""
+    model = triangle_model()
+    model.vertex_array = array(
+        [
+            [-1.0, -1.0, 0.0],
+            [1.0, -1.0, 0.0],
+            [0.0, 1.0, 0.0],
+            [-0.2, -0.4, 0.5],
+            [0.2, -0.4, 0.5],
+            [0.0, 0.0, 0.5],
+        ]
+    )
+    model.face_array = array(
+        [[[0, 0, 0], [1, 1, 1], [2, 2, 2]], [[3, 0, 0], [4, 1, 1], [5, 2, 2]]]
+    )
+    shadow, light_matrix = shadow_map(model, (0, 0, 1), (0, 0, 0), 32, 32)
+    assert (shadow > -inf).any()
+
+    shader = ObjectShadowShader(
+        ObjectPhongShader(model, (0, 0, 1)), shadow, light_matrix, pcf=0
+    )
+    visible = shader.visibility(array([[0.0, -0.2, 0.0], [0.0, 0.8, 0.0]]))
+    assert visible.tolist() == [0.0, 1.0]
+
+
+def test_shadow_shader_reuses_varying(triangle_model):
+    """Shadow lookups reuse the positions the wrapped shader interpolated"""
+    model = triangle_model()
+    shadow, light_matrix = shadow_map(model, (0, 0, 1), (0, 0, 0), 16, 16)
+    phong = ObjectPhongShader(model, (0, 0, 1))
+    shader = ObjectShadowShader(phong, shadow, light_matrix, pcf=0)
+    color, depth, written = render(shader)
+    assert written > 0 and shader.varying is phong.varying
+    plain, _, _ = render(ObjectPhongShader(model, (0, 0, 1)))
+    assert (color == plain).all()
+
+
+def test_pick_buffer(triangle_model):
+    """Face ids and barycentrics are resolved for many pixels at once"""
+    shader = ObjectPhongShader(triangle_model(), (0, 0, 1))
+    shader.set_matrices(eye(4), eye(4), viewport(0, 0, 32, 32))
+    faces = arange(1)
+    screen = shader.vertex(faces)
+    depth = full((32, 32), -inf)
+    face_ids = full((32, 32), -1, dtype=int32)
+    color = zeros((32, 32, 4), dtype=uint8)
+    rasterize(screen, depth, shader, faces, color, face_ids=face_ids)
+    assert ((face_ids == 0) == (depth > -inf)).all()
+
+    ids, bar = pick_buffer(face_ids, screen, array([16, 0, 99]), array([16, 31, 5]))
+    assert ids.tolist() == [0, -1, -1]
+    assert abs(bar[0].sum() - 1) < 1e-9 and (bar[0] >= 0).all()
+    assert isnan(bar[1:]).all()
+
+
+def test_visible_counts_groups():
+    """Visible pixels are counted per face group, skipping ungrouped faces"""
+    face_ids = array([[0, 1, -1], [2, 2, 3]])
+    groups = range_groups([(0, 2), (2, 3)], 4)
+    assert groups.tolist() == [0, 0, 1, -1]
+    assert visible_counts(face_ids).tolist() == [1, 1, 2, 1]
+    assert visible_counts(face_ids, groups, 3).tolist() == [2, 2, 0]
+
+
+def test_occlusion_query_hidden_face(triangle_model):
+    """A face behind another one has no visible pixels"""
+    model = triangle_model()
+    model.vertex_array = array(
+        [[-1.0, -1.0, 0.5], [1.0, -1.0, 0.5], [0.0, 1.0, 0.5]]
+        + [[-0.5, -0.5, 0.0], [0.5, -0.5, 0.0], [0.0, 0.5, 0.0]]
+    )
+    model.face_array = array(
+        [[[0, 0, 0], [1, 1, 1], [2, 2, 2]], [[3, 0, 0], [4, 1, 1], [5, 2, 2]]]
+    )
+    shader = ObjectDepthShader(model)
+    shader.set_matrices(eye(4), eye(4), viewport(0, 0, 32, 32))
+    screen = shader.vertex(arange(2))
+    counts = occlusion_query(screen, 32, 32, array([0, 1]), 2)
+    assert counts[0] > 0 and counts[1] == 0
+
+
+def test_visibility_counts_hidden_trailing_faces(triangle_model):
+    """Hidden faces and groups at the end still get a zero count"""
+    model = triangle_model()
+    model.vertex_array = array(
+        [[-1.0, -1.0, 0.5], [1.0, -1.0, 0.5], [0.0, 1.0, 0.5]]
+        + [[-0.5, -0.5, 0.0], [0.5, -0.5, 0.0], [0.0, 0.5, 0.0]]
+    )
+    model.face_array = array(
+        [[[0, 0, 0], [1, 1, 1], [2, 2, 2]], [[3, 0, 0], [4, 1, 1], [5, 2, 2]]]
+    )
+    camera = ObjectCamera((0, 0, 3), (0, 0, 0), (0, 1, 0))
+    image = ObjectImage(32, 32)
+    counts = image.query_visibility(model, camera)
+    assert len(counts) == len(model.face_array)
+    assert counts[0] > 0 and counts[1] == 0
+    groups = array([0, 1])
+    shader = ObjectPhongShader(model, (0, 0, 1))
+    rendered = image.render_model(model, camera, shader, groups=groups, output=None)
+    assert rendered.tolist() == image.query_visibility(model, camera, groups).tolist()
+
+
+def test_tile_bounds_cover():
+    """Tiles cover every pixel once, clipped to the buffer"""
+    covered = zeros((10, 7), dtype=int32)
+    for x0, y0, x1, y1 in tile_bounds(10, 7, 4):
+        covered[x0:x1, y0:y1] += 1
+    assert (covered == 1).all()
+    assert tile_bounds(10, 7, 4)[:2] == [(0, 0, 4, 4), (0, 4, 4, 7)]
+
+
+def test_rasterize_tiles_memmap(tmp_path, triangle_model):
+    """Tiles rendered into stale memory mapped buffers match a whole render"""
+    shader = ObjectPhongShader(triangle_model(), (0, 0, 1))
+    color, depth, written = render(shader)
+    faces = arange(1)
+    mapped = {
+        name: memmap(str(tmp_path / name), dtype, "w+", shape=shape)
+        for name, dtype, shape in (
+            ("color", uint8, (32, 32, 4)),
+            ("depth", float, (32, 32)),
+            ("face_ids", int32, (32, 32)),
+        )
+    }
+    for buffer in mapped.values():
+        buffer[...] = 7
+    screen = shader.vertex(faces)
+    count = rasterize_tiles(screen, shader=shader, faces=faces, size=5, **mapped)
+    assert count == written
+    assert (mapped["color"] == color).all() and (mapped["depth"] == depth).all()
+    assert ((mapped["face_ids"] == 0) == (depth > -inf)).all()
@@ -0,0 +1,35 @@
+"""Test module for the point cloud splatting renderer
+"""
+from numpy import array, full, inf, uint8, zeros
+from pytest import raises
+
+from engines.splats import splat, splat_offsets
+
+
+def test_splat_offsets_disc():
+    """Discs cover the pixels within their radius"""
+    assert splat_offsets(0).tolist() == [[0, 0]]
+    assert len(splat_offsets(1)) == 5 and len(splat_offsets(1.5)) == 9
+    assert (abs(splat_offsets(3)).max(axis=0) == 3).all()
+
+
+def test_splat_nearest_wins():
+    """Overlapping splats keep the closest point whatever the order"""
+    screen = array([[4.0, 4.0, 1.0, 1.0], [4.2, 3.9, 6.0, 1.0], [5.0, 4.0, 3.0, 1.0]])
+    depth = full((8, 8), -inf)
+    color = zeros((8, 8, 4), dtype=uint8)
+    colors = array([[1, 1, 1, 1], [2, 2, 2, 2], [3, 3, 3, 3]], dtype=uint8)
+    splat(screen, depth, color, colors, radius=1)
+    assert depth[4, 4] == 6 and color[4, 4, 0] == 2
+    assert depth[6, 4] == 3 and color[6, 4, 0] == 3
+    assert (depth > -inf).sum() == 8
+
+
+def test_splat_homogeneous_and_bounds():
+    """Points are divided by w, clipped to the buffer and nan points skipped"""
+    screen = array([[6.0, 2.0, 4.0, 2.0], [0.0, 0.0, 1.0, 1.0], [1.0, 1.0, 1.0, 0.0]])
+    depth = full((4, 4), -inf)
+    assert splat(screen, depth, radius=1) == 7
+    assert depth[3, 1] == 2 and depth[0, 0] == 1
+    with raises(ValueError):
+        splat(screen, full((4, 4), -inf).T)
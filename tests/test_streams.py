@@ -0,0 +1,49 @@
+"""Test module for transparent decompression of asset files
+"""
+import bz2
+import gzip
+import lzma
+
+from pytest import mark
+
+from utils.streams import compression, find_asset, open_stream, strip_compression
+
+TEXT = "v 0 0 0\nv 1 0 0\nf 1 2 1\n"
+
+
+@mark.parametrize("suffix, module", [(".gz", gzip), (".bz2", bz2), (".xz", lzma)])
+def test_open_stream_compressed(tmp_path, suffix, module):
+    """Compressed files read back line by line as text"""
+    path = str(tmp_path / f"mesh.obj{suffix}")
+    with module.open(path, "wt") as file:
+        file.write(TEXT)
+    with open_stream(path) as stream:
+        assert list(stream) == TEXT.splitlines(keepends=True)
+    with open_stream(path, "rb") as stream:
+        assert stream.read() == TEXT.encode()
+
+
+def test_open_stream_plain(tmp_path):
+    """Plain files are opened unchanged"""
+    path = tmp_path / "mesh.obj"
+    path.write_text(TEXT)
+    with open_stream(str(path)) as stream:
+        assert stream.read() == TEXT
+
+
+def test_compression_suffix():
+    """Only known compression suffixes are recognised and stripped"""
+    assert compression("head.obj.GZ") == ".gz"
+    assert compression("head.obj") == ""
+    assert strip_compression("head.rmesh.xz") == "head.rmesh"
+    assert strip_compression("head.tga") == "head.tga"
+
+
+def test_find_asset(tmp_path):
+    """The plain file wins, otherwise the first compressed variant is used"""
+    base = tmp_path / "head_diffuse.tga"
+    assert find_asset(str(base)) == str(base)
+    (tmp_path / "head_diffuse.tga.bz2").write_bytes(b"")
+    assert find_asset(str(base)) == str(base) + ".bz2"
+    base.write_bytes(b"")
+    assert find_asset(str(base)) == str(base)
@@ -0,0 +1,83 @@
+"""Test module for the NumPy TGA codec
+"""
+from io import BytesIO
+
+from numpy import arange, array, asarray, empty, uint8, zeros
+from PIL import Image
+from pytest import raises
+
+from utils.tga import HEADER, decode_tga, encode_tga, read_header, read_tga, write_tga
+
+
+def init_pixels(channels=3, height=5, width=300):
+    """
+    Build an image mixing long runs, short runs and single pixels.
+
+    Returns:
+    ndarray: An (H, W, C) uint8 array, (H, W) for a single channel.
+    """
+    pixels = zeros((height, width, channels), dtype=uint8)
+    pixels[:, 150:] = 7
+    pixels[1, :40, 0] = arange(40)
+    pixels[3, 200:203] = 9
+    return pixels[..., 0] if channels == 1 else pixels
+
+
+def test_round_trip():
+    """Raw and run length encoded images decode back to the same pixels"""
+    for channels in (1, 3, 4):
+        pixels = init_pixels(channels)
+        for rle in (False, True):
+            assert (decode_tga(encode_tga(pixels, rle)) == pixels).all()
+
+
+def test_matches_pil():
+    """PIL reads what the codec writes and the other way round"""
+    pixels = init_pixels(4)
+    for rle in (False, True):
+        assert (asarray(Image.open(BytesIO(encode_tga(pixels, rle)))) == pixels).all()
+        buffer = BytesIO()
+        compression = "tga_rle" if rle else None
+        Image.fromarray(pixels).save(buffer, "TGA", compression=compression)
+        assert (decode_tga(buffer.getvalue()) == pixels).all()
+
+
+def test_origin_bit():
+    """Rows are returned in the asked order whatever order they were stored in"""
+    pixels = init_pixels(3)
+    bottom_first = encode_tga(pixels[::-1], bottom_up=True)
+    assert not read_header(bottom_first)["top_down"]
+    assert (decode_tga(bottom_first) == pixels).all()
+    assert (decode_tga(encode_tga(pixels), bottom_up=True) == pixels[::-1]).all()
+
+
+def test_decode_into(tmp_path):
+    """Files decode into a preallocated array of the right shape only"""
+    pixels = init_pixels(1)
+    path = str(tmp_path / "image.tga")
+    write_tga(path, pixels, rle=True)
+    out = empty(pixels.shape, dtype=uint8)
+    assert read_tga(path, out) is out and (out == pixels).all()
+    with raises(ValueError):
+        read_tga(path, empty((2, 2), dtype=uint8))
+
+
+def test_invalid_data():
+    """Unsupported and truncated files raise a ValueError"""
+    colormapped = HEADER.pack(0, 1, 1, 0, 0, 0, 0, 0, 2, 2, 8, 0)
+    with raises(ValueError):
+        decode_tga(colormapped)
+    with raises(ValueError):
+        decode_tga(encode_tga(init_pixels(3), rle=True)[:100])
+    with raises(ValueError):
+        encode_tga(array([[[1, 2]]], dtype=uint8))
+
+
+def test_write_streams_blocks(tmp_path):
+    """Files written a few rows at a time equal the encoded bytes"""
+    pixels = init_pixels(4)
+    path = str(tmp_path / "image.tga")
+    for rle in (False, True):
+        write_tga(path, pixels[::-1], rle, bottom_up=True, chunk_bytes=1000)
+        with open(path, "rb") as file:
+            assert file.read() == encode_tga(pixels[::-1], rle, bottom_up=True)
@@ -9,19 +9,26 @@ Returns:
 
 """
 
-from models.vectors import RGB
+from numpy import ndarray, uint8, zeros
 
+WIDTH = 800
+HEIGHT = 600
 
-def frame_buffer(width: int = WIDTH, height: int = HEIGHT):
+
+def frame_buffer(width: int = WIDTH, height: int = HEIGHT, pool=None) -> ndarray:
     """
     Generates a frame buffer for image initialization.
 
     Args:
         width (int, optional): The width of the image. Defaults to 800.
         height (int, optional): The height of the image. Defaults to 600.
+        pool (FramebufferPool, optional): Take the buffer from this pool
+            instead of allocating it. Release it to the pool when done.
 
     Returns:
-        List[List[List[int]]]: A frame buffer representing the image with initial white color.
+        ndarray: A (height, width, 3) uint8 RGB buffer, top row first, cleared
+        to black.
     """
-
-    return [[RGB(0, 0, 0) for _ in range(width)] for _ in range(height)]
+    if pool is not None:
+        return pool.acquire((height, width, 3), uint8)
+    return zeros((height, width, 3), dtype=uint8)
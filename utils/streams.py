@@ -0,0 +1,91 @@
+"""
+Module Summary: Contains transparent decompression for asset files.
+
+Assets may be stored gzip, bz2 or xz compressed. They are decompressed as a
+stream behind a large read buffer, so parsers consume them line by line without
+the whole file ever being expanded in memory or on disk.
+
+Returns:
+    Functions:
+        compression: Returns the compression suffix of a filename.
+        strip_compression: Returns a filename without its compression suffix.
+        open_stream: Opens a plain or compressed file for buffered reading.
+        find_asset: Returns the existing plain or compressed variant of a file.
+"""
+
+import bz2
+import gzip
+import lzma
+import os
+from io import BufferedReader, TextIOWrapper
+
+BUFFER_SIZE = 1 << 20
+
+OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open, ".lzma": lzma.open}
+
+
+def compression(filename: str) -> str:
+    """
+    Returns the compression suffix of a filename.
+
+    Args:
+        filename (str): The file name.
+
+    Returns:
+        str: The suffix, e.g. ".gz", or an empty string for plain files.
+    """
+    suffix = os.path.splitext(filename)[1].lower()
+    return suffix if suffix in OPENERS else ""
+
+
+def strip_compression(filename: str) -> str:
+    """
+    Returns a filename without its compression suffix.
+
+    Args:
+        filename (str): The file name.
+
+    Returns:
+        str: The name of the decompressed file.
+    """
+    suffix = compression(filename)
+    return filename[: -len(suffix)] if suffix else filename
+
+
+def open_stream(filename: str, mode: str = "r", buffer_size: int = BUFFER_SIZE):
+    """
+    Opens a plain or compressed file for buffered reading.
+
+    Args:
+        filename (str): The file, compressed when it ends in .gz, .bz2, .xz or
+            .lzma.
+        mode (str, optional): "r" for text or "rb" for bytes. Defaults to "r".
+        buffer_size (int, optional): The read buffer size. Defaults to 1 MiB.
+
+    Returns:
+        IO: A readable file object.
+    """
+    opener = OPENERS.get(compression(filename))
+    if opener is None:
+        if "b" in mode:
+            return open(filename, "rb", buffering=buffer_size)
+        return open(filename, "r", buffering=buffer_size, encoding="utf-8")
+    stream = BufferedReader(opener(filename, "rb"), buffer_size)
+    return stream if "b" in mode else TextIOWrapper(stream, encoding="utf-8")
+
+
+def find_asset(filename: str) -> str:
+    """
+    Returns the existing plain or compressed variant of a file.
+
+    Args:
+        filename (str): The uncompressed file name.
+
+    Returns:
+        str: The first of filename, filename.gz, filename.bz2, ... that exists,
+        or filename itself when none do.
+    """
+    for suffix in ("",) + tuple(OPENERS):
+        if os.path.exists(filename + suffix):
+            return filename + suffix
+    return filename
@@ -0,0 +1,330 @@
+"""
+Module Summary: Contains a TGA codec working directly on NumPy buffers.
+
+Uncompressed and run length encoded true color and grayscale images are read
+into (H, W, C) uint8 arrays, 8 bit grayscale as (H, W), in either row order.
+The origin bits of the file decide how its rows are walked, so an image is
+never flipped after decoding. Writing takes any strided view of the pixels and
+records its row order in the origin bit instead of reordering the rows.
+
+Returns:
+    Functions:
+        read_header: Returns the shape and layout of an encoded image.
+        decode_tga: Decodes TGA bytes into an array.
+        encode_tga: Encodes an array as TGA bytes.
+        read_tga: Reads a TGA file into an array.
+        write_tga: Writes an array to a TGA file.
+"""
+
+from struct import Struct
+
+from numpy import (
+    arange,
+    array,
+    ascontiguousarray,
+    concatenate,
+    cumsum,
+    diff,
+    empty,
+    flatnonzero,
+    frombuffer,
+    insert,
+    int64,
+    maximum,
+    minimum,
+    ndarray,
+    repeat,
+    searchsorted,
+    uint8,
+    uint32,
+    where,
+    zeros,
+)
+
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.streams import open_stream
+
+HEADER = Struct("<BBBHHBHHHHBB")
+FOOTER = b"\0" * 8 + b"TRUEVISION-XFILE.\0"
+
+TRUECOLOR = 2
+GRAYSCALE = 3
+RLE = 8
+
+TOP_ORIGIN = 0x20
+RIGHT_ORIGIN = 0x10
+
+MAX_PACKET = 128
+WRITE_CHUNK = 1 << 26
+
+
+def read_header(data) -> dict:
+    """
+    Returns the shape and layout of an encoded image.
+
+    Args:
+        data (bytes): The TGA file contents.
+
+    Returns:
+        dict: The width, height and channels, the rle flag, the top_down and
+        right_to_left pixel orders and the offset of the pixel data.
+
+    Raises:
+        ValueError: If the data is not an 8 bit grayscale or a 24 or 32 bit
+            true color TGA.
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("truncated TGA header")
+    fields = HEADER.unpack_from(data)
+    id_length, colormap, kind, _, colors, color_depth = fields[:6]
+    width, height, depth, descriptor = fields[8:]
+    base = kind & ~RLE
+    if colormap or base not in (TRUECOLOR, GRAYSCALE):
+        raise ValueError(f"unsupported TGA image type {kind}")
+    if depth not in ((8,) if base == GRAYSCALE else (24, 32)):
+        raise ValueError(f"unsupported TGA pixel depth {depth}")
+    return {
+        "width": width,
+        "height": height,
+        "channels": depth // 8,
+        "rle": bool(kind & RLE),
+        "top_down": bool(descriptor & TOP_ORIGIN),
+        "right_to_left": bool(descriptor & RIGHT_ORIGIN),
+        "offset": HEADER.size + id_length + colors * ((color_depth + 7) // 8),
+    }
+
+
+def _ranges(starts: ndarray, counts: ndarray) -> ndarray:
+    """Returns the ranges start, start + 1, ... of every count, concatenated."""
+    ends = cumsum(counts)
+    total = int(ends[-1]) if len(ends) else 0
+    return repeat(starts - ends + counts, counts) + arange(total)
+
+
+def _packet_heads(data, offset: int, channels: int) -> ndarray:
+    """Returns the position of every run length packet header from offset on."""
+    spans = [
+        1 + channels * (1 if header & 0x80 else (header & 0x7F) + 1)
+        for header in range(256)
+    ]
+    heads = []
+    add = heads.append
+    position, size = offset, len(data)
+    # Every header is only known once the previous packet is, so this walk is
+    # the one serial step, everything else is done on whole arrays
+    while position < size:
+        add(position)
+        position += spans[data[position]]
+    return array(heads, dtype=int64)
+
+
+def _decode_rle(data, offset: int, count: int, channels: int) -> ndarray:
+    """Expands run length packets into a (count, channels) pixel array."""
+    buffer = frombuffer(data, dtype=uint8)
+    heads = _packet_heads(data, offset, channels)
+    headers = buffer[heads].astype(int64)
+    counts = (headers & 0x7F) + 1
+    used = int(searchsorted(cumsum(counts), count)) + 1
+    if used > len(heads):
+        raise ValueError("truncated TGA pixel data")
+    heads, headers, counts = heads[:used], headers[:used], counts[:used]
+    end = heads[-1] + 1 + channels * (1 if headers[-1] & 0x80 else counts[-1])
+    if end > len(buffer):
+        raise ValueError("truncated TGA pixel data")
+    # Source offsets advance by 0 inside a run and by a pixel inside a raw
+    # packet, jumping to the next payload at every packet start
+    steps = where(headers & 0x80, 0, channels)
+    first = heads + 1
+    last = first + (counts - 1) * steps
+    offsets = repeat(steps, counts)
+    offsets[cumsum(counts) - counts] = first - concatenate(([0], last[:-1]))
+    source = cumsum(offsets)[:count]
+    # Every pixel is one row of a sliding view, gathered with a single take
+    return sliding_window_view(buffer, channels)[source]
+
+
+def decode_tga(data, out: ndarray = None, bottom_up: bool = False) -> ndarray:
+    """
+    Decodes TGA bytes into an array.
+
+    Args:
+        data (bytes): The TGA file contents.
+        out (ndarray, optional): A preallocated (H, W, C) or, for grayscale,
+            (H, W) uint8 array to decode into.
+        bottom_up (bool, optional): Return the bottom row first, as the
+            rasterizer's y axis points up. Defaults to the top row first.
+
+    Returns:
+        ndarray: The RGB(A) or grayscale pixels, out when it was given.
+
+    Raises:
+        ValueError: If the image is unsupported, truncated or does not fit out.
+    """
+    info = read_header(data)
+    width, height, channels = info["width"], info["height"], info["channels"]
+    count = width * height
+    if info["rle"]:
+        pixels = _decode_rle(data, info["offset"], count, channels)
+    else:
+        if len(data) < info["offset"] + count * channels:
+            raise ValueError("truncated TGA pixel data")
+        pixels = frombuffer(data, uint8, count * channels, info["offset"])
+    rows = pixels.reshape(height, width, channels)
+    if info["top_down"] != (not bottom_up):
+        rows = rows[::-1]
+    if info["right_to_left"]:
+        rows = rows[:, ::-1]
+
+    shape = (height, width) if channels == 1 else (height, width, channels)
+    if out is None:
+        out = empty(shape, dtype=uint8)
+    elif out.shape != shape:
+        raise ValueError(f"cannot decode a {shape} image into {out.shape}")
+    if channels == 1:
+        out[...] = rows[..., 0]
+    else:
+        # Stored as BGR(A), copied channel by channel without a temporary
+        for channel, stored in enumerate((2, 1, 0, 3)[:channels]):
+            out[..., channel] = rows[..., stored]
+    return out
+
+
+def _encode_rle(pixels: ndarray, width: int) -> ndarray:
+    """Packs (N, C) pixels of rows width long into run length packets."""
+    count, channels = pixels.shape
+    packed = pixels[:, 0].astype(uint32)
+    for channel in range(1, channels):
+        packed |= pixels[:, channel].astype(uint32) << (8 * channel)
+    same = packed[1:] == packed[:-1]
+    # Packets never cross a row
+    same[width - 1 :: width] = False
+    run_starts = flatnonzero(concatenate(([True], ~same)))
+    run_lengths = diff(concatenate((run_starts, [count])))
+
+    # Runs longer than a packet are split into chunks
+    starts, lengths = run_starts, run_lengths
+    if len(lengths) and lengths.max() > MAX_PACKET:
+        pieces = (run_lengths + MAX_PACKET - 1) // MAX_PACKET
+        offsets = _ranges(pieces * 0, pieces) * MAX_PACKET
+        starts = repeat(run_starts, pieces) + offsets
+        lengths = minimum(repeat(run_lengths, pieces) - offsets, MAX_PACKET)
+
+    # Consecutive single pixels of a row are grouped into raw packets
+    single = lengths == 1
+    row_start = zeros(count, dtype=bool)
+    row_start[::width] = True
+    row_start = row_start[starts]
+    follows = concatenate(([False], single[:-1])) & ~row_start
+    index = arange(len(starts))
+    first = maximum.accumulate(where(single & ~follows, index, 0))
+    opens = ~single | ((index - first) & (MAX_PACKET - 1) == 0)
+    packets = flatnonzero(opens)
+    sizes = diff(concatenate((packets, [len(starts)])))
+    repeats = ~single[packets]
+
+    # A run packet stores its first pixel and a raw packet all of its single
+    # pixel chunks, so the payload is exactly the first pixel of every chunk
+    headers = where(repeats, 0x80 | (lengths[packets] - 1), sizes - 1)
+    payload = pixels.take(starts, axis=0).ravel()
+    return insert(payload, packets * channels, headers.astype(uint8))
+
+
+def _pixel_rows(pixels: ndarray) -> ndarray:
+    """Returns (H, W, C) rows of 1, 3 or 4 channels."""
+    pixels = pixels[..., None] if pixels.ndim == 2 else pixels
+    if pixels.shape[2] not in (1, 3, 4):
+        raise ValueError(f"cannot encode {pixels.shape[2]} channel pixels as TGA")
+    return pixels
+
+
+def _encode_header(rows: ndarray, rle: bool, bottom_up: bool) -> bytes:
+    """Returns the TGA header of (H, W, C) rows."""
+    height, width, channels = rows.shape
+    kind = (GRAYSCALE if channels == 1 else TRUECOLOR) | (RLE if rle else 0)
+    descriptor = (0 if bottom_up else TOP_ORIGIN) | (8 if channels == 4 else 0)
+    return HEADER.pack(
+        0, 0, kind, 0, 0, 0, 0, 0, width, height, channels * 8, descriptor
+    )
+
+
+def _encode_rows(rows: ndarray, rle: bool) -> ndarray:
+    """Returns the pixel data of (H, W, C) rows, packets never cross a row."""
+    height, width, channels = rows.shape
+    if channels == 1:
+        stored = ascontiguousarray(rows, dtype=uint8)
+    else:
+        # The one copy of the pixels, reordered to BGR(A) on the way
+        stored = empty((height, width, channels), dtype=uint8)
+        for channel, source in enumerate((2, 1, 0, 3)[:channels]):
+            stored[..., channel] = rows[..., source]
+    stored = stored.reshape(-1, channels)
+    return _encode_rle(stored, width) if rle and len(stored) else stored
+
+
+def encode_tga(pixels: ndarray, rle: bool = False, bottom_up: bool = False) -> bytes:
+    """
+    Encodes an array as TGA bytes.
+
+    Args:
+        pixels (ndarray): An (H, W, C) RGB(A) or (H, W) grayscale uint8 array,
+            any strided view of it included.
+        rle (bool, optional): Run length encode the pixels.
+        bottom_up (bool, optional): The first row is the bottom of the image.
+            Stored as the origin bit, the rows are written as they are.
+
+    Returns:
+        bytes: The encoded image.
+
+    Raises:
+        ValueError: If the array is not grayscale, RGB or RGBA.
+    """
+    rows = _pixel_rows(pixels)
+    header = _encode_header(rows, rle, bottom_up)
+    return b"".join((header, _encode_rows(rows, rle).data, FOOTER))
+
+
+def read_tga(filename: str, out: ndarray = None, bottom_up: bool = False) -> ndarray:
+    """
+    Reads a TGA file into an array.
+
+    Args:
+        filename (str): The image file, optionally gzip, bz2 or xz compressed.
+        out (ndarray, optional): A preallocated array to decode into.
+        bottom_up (bool, optional): Return the bottom row first.
+
+    Returns:
+        ndarray: The pixels, see decode_tga.
+    """
+    with open_stream(filename, "rb") as file:
+        return decode_tga(file.read(), out, bottom_up)
+
+
+def write_tga(
+    filename: str,
+    pixels: ndarray,
+    rle: bool = False,
+    bottom_up: bool = False,
+    chunk_bytes: int = WRITE_CHUNK,
+) -> None:
+    """
+    Writes an array to a TGA file.
+
+    The rows are encoded and written a block at a time, so a memory mapped
+    image is streamed to the file without ever being loaded as a whole.
+
+    Args:
+        filename (str): The destination file.
+        pixels (ndarray): The pixels, see encode_tga.
+        rle (bool, optional): Run length encode the pixels.
+        bottom_up (bool, optional): The first row is the bottom of the image.
+        chunk_bytes (int, optional): The pixel bytes encoded per block.
+    """
+    rows = _pixel_rows(pixels)
+    height, width, channels = rows.shape
+    block = max(1, chunk_bytes // max(1, width * channels))
+    with open(filename, "wb") as file:
+        file.write(_encode_header(rows, rle, bottom_up))
+        for start in range(0, height, block):
+            file.write(_encode_rows(rows[start : start + block], rle).data)
+        file.write(FOOTER)